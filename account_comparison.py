@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+Cross-account comparison over every portfolio history in /csvfiles.
+
+Each report page (A1P1–A5P2, D1L1, D1P2, D2L1, D2P1, N1L1, ...) downloads and
+analyzes its own alpaca_portfolio_history_*.csv, and comparing two accounts
+means two pages and two downloads. This builds the comparison once:
+
+  * every account's Equity and Cash Flow are aligned on one union date index
+    (portfolio_analytics.align) and derive_metrics() runs on the whole matrix;
+  * the return correlation matrix uses pairwise-complete days, computed for
+    all pairs at once from masked sums (a few matrix products over the
+    aligned returns), so the cost grows with rows, not with pairs of files;
+  * rolling Sharpe comes from windowed cumulative sums, drawdown straight
+    from derive_metrics(), both as per-account overlays on the shared dates;
+  * beta, correlation and alpha against spydata.csv use the SPY close returns
+    on the days each account has a return.
+
+The result is one compact JSON dataset (dates, per-account summary,
+correlation matrix, overlay series with nulls for missing days).
+
+Usage:
+    python account_comparison.py                          # csvfiles/ -> csvfiles/account-comparison.json
+    python account_comparison.py csvfiles/ --window 63 --out /tmp/comparison.json
+"""
+
+import argparse
+import csv
+import glob
+import json
+import os
+import re
+
+import numpy as np
+
+from date_util import iso_date
+from portfolio_analytics import CSV_DIR, TRADING_DAYS, align, derive_metrics, history_path, load_accounts
+
+WORKSPACE = os.path.dirname(os.path.abspath(__file__))
+SPY_CSV = "spydata.csv"
+OUT_NAME = "account-comparison.json"
+ROLLING_WINDOW = 63       # about one quarter of trading days
+MIN_OVERLAP = 20          # fewer shared return days than this -> no correlation or beta
+
+DISPLAY_NAME_RE = re.compile(r"var strategyDisplayName = '([^']+)';")
+CSV_PATH_RE = re.compile(r"var csvPath = '/csvfiles/([^']+)';")
+
+
+# ── loading ─────────────────────────────────────────────────────────────
+
+def load_spy(path):
+    """(dates, close) from spydata.csv; Close column, else the fifth field as the chart pages read it."""
+    dates, close = [], []
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        reader = csv.reader(f)
+        header = [h.strip().replace('"', "") for h in next(reader)]
+        idx = header.index("Close") if "Close" in header else 4
+        for record in reader:
+            try:
+                dates.append(iso_date(record[0]))
+                close.append(float(record[idx].replace(",", "")))
+            except (IndexError, ValueError):
+                continue
+    dates = np.array(dates, dtype="datetime64[D]")
+    order = np.argsort(dates, kind="stable")
+    return dates[order], np.array(close)[order]
+
+
+def display_names(pages_dir):
+    """{account: page label} from the chart pages (strategyDisplayName next to its csvPath)."""
+    names = {}
+    for path in sorted(glob.glob(os.path.join(pages_dir, "*.html"))):
+        with open(path, "r", encoding="utf-8") as f:
+            html = f.read()
+        label, csv_path = DISPLAY_NAME_RE.search(html), CSV_PATH_RE.search(html)
+        if label and csv_path:
+            account = os.path.splitext(csv_path.group(1))[0].replace("alpaca_portfolio_history_", "")
+            names.setdefault(account, label.group(1))
+    return names
+
+
+# ── vectorized statistics ───────────────────────────────────────────────
+
+def daily_returns(equity, cash_flow):
+    """(T x accounts) daily returns, NaN where an account has no return (absent, or its first row)."""
+    r = derive_metrics(equity, cash_flow)["Daily %"] / 100.0
+    valid = ~np.isnan(equity)
+    first = np.argmax(valid, axis=0)
+    r[first, np.arange(r.shape[1])] = np.nan
+    return r
+
+
+def correlation_matrix(returns, min_overlap=MIN_OVERLAP):
+    """Pairwise-complete Pearson correlation of every column pair, from masked matrix products."""
+    m = (~np.isnan(returns)).astype(float)
+    x = np.nan_to_num(returns)
+    n = m.T @ m                      # shared days per pair
+    sx = x.T @ m                     # sum of column i over days column j also has
+    sxx = (x * x).T @ m
+    sxy = x.T @ x
+    with np.errstate(invalid="ignore", divide="ignore"):
+        cov = n * sxy - sx * sx.T
+        var = (n * sxx - sx * sx) * (n * sxx - sx * sx).T
+        corr = cov / np.sqrt(var)
+    corr[(n < min_overlap) | ~(var > 0)] = np.nan
+    return np.clip(corr, -1.0, 1.0), n.astype(int)
+
+
+def rolling_sharpe(returns, window=ROLLING_WINDOW):
+    """Annualized Sharpe over each account's trailing window rows of the shared index (NaN until full)."""
+    m = ~np.isnan(returns)
+    x = np.nan_to_num(returns)
+
+    def trailing(a):
+        c = np.vstack([np.zeros((1, a.shape[1])), np.cumsum(a, axis=0)])
+        return c[window:] - c[:-window] if len(a) >= window else np.zeros((0, a.shape[1]))
+
+    out = np.full(returns.shape, np.nan)
+    n, s1, s2 = trailing(m.astype(float)), trailing(x), trailing(x * x)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = s1 / n
+        sd = np.sqrt(np.maximum(s2 - n * mean * mean, 0.0) / (n - 1))
+        sharpe = np.where(sd > 0, mean / sd * np.sqrt(TRADING_DAYS), np.nan)
+    sharpe[n < window // 2] = np.nan
+    out[window - 1:] = sharpe
+    out[~m] = np.nan
+    return out
+
+
+def spy_returns(dates, spy_dates, spy_close):
+    """SPY close-to-close returns on the shared date index (NaN where SPY did not trade)."""
+    r = np.full(len(dates), np.nan)
+    ret = spy_close[1:] / spy_close[:-1] - 1.0
+    pos = np.searchsorted(spy_dates[1:], dates)
+    hit = (pos < len(ret)) & (spy_dates[1:][np.minimum(pos, len(ret) - 1)] == dates)
+    r[hit] = ret[pos[hit]]
+    return r
+
+
+def market_stats(returns, market, min_overlap=MIN_OVERLAP):
+    """Per-account beta, correlation and annualized alpha versus one market return series."""
+    m = ~np.isnan(returns) & ~np.isnan(market)[:, None]
+    n = m.sum(axis=0)
+    x = np.where(m, market[:, None], 0.0)
+    y = np.where(m, returns, 0.0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mx, my = x.sum(axis=0) / n, y.sum(axis=0) / n
+        cov = (x * y).sum(axis=0) / n - mx * my
+        vx = (x * x).sum(axis=0) / n - mx * mx
+        vy = (y * y).sum(axis=0) / n - my * my
+        beta = cov / vx
+        corr = cov / np.sqrt(vx * vy)
+        alpha = (my - beta * mx) * TRADING_DAYS
+    short = n < min_overlap
+    for a in (beta, corr, alpha):
+        a[short] = np.nan
+    return beta, corr, alpha, n
+
+
+# ── dataset ─────────────────────────────────────────────────────────────
+
+def _round(values, digits):
+    """Floats rounded for JSON, NaN as null."""
+    return [None if np.isnan(v) else round(float(v), digits) for v in values]
+
+
+def compare(histories, spy=None, window=ROLLING_WINDOW, labels=None):
+    """The comparison dataset for {account: history} and optional (spy dates, spy close)."""
+    dates, names, equity = align(histories, "Equity")
+    _, _, cash_flow = align(histories, "Cash Flow")
+    metrics = derive_metrics(equity, cash_flow)
+    returns = daily_returns(equity, cash_flow)
+    corr, overlap = correlation_matrix(returns)
+    sharpe = rolling_sharpe(returns, window)
+    if spy is not None:
+        beta, spy_corr, alpha, spy_days = market_stats(returns, spy_returns(dates, *spy))
+    else:
+        beta = spy_corr = alpha = np.full(len(names), np.nan)
+        spy_days = np.zeros(len(names), dtype=int)
+
+    labels = labels or {}
+    accounts = []
+    for j, name in enumerate(names):
+        rows = np.flatnonzero(~np.isnan(equity[:, j]))
+        if not len(rows):
+            continue
+        last = rows[-1]
+        accounts.append({
+            "account": name,
+            "label": labels.get(name, name),
+            "start": str(dates[rows[0]]),
+            "end": str(dates[last]),
+            "days": int(len(rows)),
+            "equity": round(float(equity[last, j]), 2),
+            "cumulative_pct": round(float(metrics["Cumulative %"][last, j]), 2),
+            "annualized_pct": round(float(metrics["Annualized %"][last, j]), 2),
+            "sharpe": round(float(metrics["Sharpe Ratio"][last, j]), 3),
+            "volatility_pct": round(float(metrics["Volatility %"][last, j]), 2),
+            "max_drawdown_pct": round(float(metrics["Max Drawdown %"][last, j]), 2),
+            "beta": _round([beta[j]], 3)[0],
+            "spy_correlation": _round([spy_corr[j]], 3)[0],
+            "alpha_pct": _round([alpha[j] * 100.0], 2)[0],
+            "spy_days": int(spy_days[j]),
+        })
+    return {
+        "dates": [str(d) for d in dates],
+        "window": window,
+        "accounts": accounts,
+        "correlation": {
+            "accounts": names,
+            "matrix": [_round(row, 3) for row in corr],
+            "overlap": overlap.tolist(),
+        },
+        "series": {
+            "cumulative_pct": {n: _round(metrics["Cumulative %"][:, j], 2) for j, n in enumerate(names)},
+            "drawdown_pct": {n: _round(metrics["Drawdown %"][:, j], 2) for j, n in enumerate(names)},
+            "rolling_sharpe": {n: _round(sharpe[:, j], 2) for j, n in enumerate(names)},
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare every account's portfolio history in one pass.")
+    parser.add_argument("csv_dir", nargs="?", default=CSV_DIR)
+    parser.add_argument("--spy", help=f"SPY CSV (default: <csv_dir>/{SPY_CSV})")
+    parser.add_argument("--window", type=int, default=ROLLING_WINDOW, help="rolling Sharpe window in rows")
+    parser.add_argument("--pages", default=os.path.join(WORKSPACE, "charts"),
+                        help="chart pages to read account labels from")
+    parser.add_argument("--out", help=f"output JSON (default: <csv_dir>/{OUT_NAME})")
+    args = parser.parse_args()
+
+    histories = load_accounts(args.csv_dir)
+    if not histories:
+        parser.error(f"no {os.path.basename(history_path(args.csv_dir, '*'))} files in {args.csv_dir}")
+    spy_path = args.spy or os.path.join(args.csv_dir, SPY_CSV)
+    spy = load_spy(spy_path) if os.path.exists(spy_path) else None
+    if spy is None:
+        print(f"  {spy_path} not found; beta and alpha left empty")
+
+    data = compare(histories, spy, args.window, display_names(args.pages))
+    print(f"Compared {len(data['accounts'])} accounts over {len(data['dates'])} dates.\n")
+    for a in data["accounts"]:
+        beta = "  n/a" if a["beta"] is None else f"{a['beta']:>5.2f}"
+        print(f"  {a['label']:<10} {a['account']:<16} {a['end']}  cum {a['cumulative_pct']:>7.2f}%  "
+              f"sharpe {a['sharpe']:>5.2f}  maxDD {a['max_drawdown_pct']:>7.2f}%  beta {beta}")
+
+    out = args.out or os.path.join(args.csv_dir, OUT_NAME)
+    tmp = out + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, separators=(",", ":"))
+    os.replace(tmp, out)
+    print(f"\nDone! Wrote {out} ({os.path.getsize(out):,} bytes)")
+
+
+if __name__ == "__main__":
+    main()
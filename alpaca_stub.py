@@ -0,0 +1,567 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the Alpaca trading and market-data APIs, driven by a
+replayed market, for load-testing the trading flows.
+
+The Bear Call / Bear Put Spread, FAANG, Crypto and Bitcoin ETF Portfolio flows
+talk to Alpaca through the node-red-contrib-alpaca nodes (alpaca-account,
+alpaca-position-query, alpaca-order, alpaca-query-order, alpaca-orders-close,
+alpaca-data-last-quote / -last-trade / -crypto-last-trade,
+alpaca-data-options-fetch-contracts, alpaca-data-account-activities,
+alpaca-range-bars). This server implements the REST endpoints behind them on
+one port, so a flow's paper-api and data-api base URLs can both point at it:
+
+    GET    /v2/account
+    GET    /v2/positions, /v2/positions/{symbol}
+    DELETE /v2/positions, /v2/positions/{symbol}
+    POST   /v2/orders          GET /v2/orders, /v2/orders/{id}, /v2/orders:by_client_order_id
+    DELETE /v2/orders, /v2/orders/{id}
+    GET    /v2/account/activities[/{type}]
+    GET    /v2/options/contracts           (page_token / next_page_token paging)
+    GET    /v2/stocks/{symbol}/quotes/latest, /trades/latest, /bars
+    GET    /v2/stocks/quotes/latest, /v2/stocks/trades/latest   (?symbols=)
+    GET    /v1beta3/crypto/us/latest/trades, /latest/quotes      (?symbols=BTC/USD)
+    GET    /_stub/metrics                  per-endpoint request rate and latency
+
+Prices come from MarketReplay: either a recorded tick CSV
+(timestamp,symbol,price[,bid,ask]) or a seeded synthetic random walk for any
+symbol that is asked for, played back at --speed times real time. Market
+orders fill immediately at the replayed ask/bid; crypto pairs are held as
+BTCUSD the way Alpaca reports them.
+
+Usage:
+    python alpaca_stub.py --port 8092 --speed 60
+    python alpaca_stub.py --ticks recorded_ticks.csv --speed 10 --contracts fixtures/contracts
+"""
+
+import argparse
+import asyncio
+import bisect
+import csv
+import json
+import math
+import os
+import random
+import time
+import uuid
+from collections import deque
+from datetime import date, datetime, timedelta, timezone
+
+from option_chain_cache import FixtureContractsFetcher
+from options_backtester import occ_symbol, parse_occ
+from http_util import read_request, send
+
+WORKSPACE = os.path.dirname(os.path.abspath(__file__))
+
+STARTING_CASH = 100000.0
+CONTRACTS_PAGE_SIZE = 100
+TICK_SECONDS = 1.0          # synthetic tick spacing in market time
+SPREAD_BPS = 2.0            # synthetic bid/ask half-spread
+LATENCY_SAMPLES = 1000      # recent latency samples kept per endpoint
+DEFAULT_PRICES = {"SPY": 580.0, "QQQ": 510.0, "XLK": 230.0, "AAPL": 225.0, "AMZN": 200.0,
+                  "META": 580.0, "NFLX": 700.0, "GOOGL": 170.0, "BTC/USD": 95000.0, "ETH/USD": 3400.0}
+
+
+def utc_iso(ts):
+    return datetime.fromtimestamp(ts, timezone.utc).isoformat().replace("+00:00", "Z")
+
+
+def is_crypto(symbol):
+    return "/" in symbol
+
+
+def format_qty(qty):
+    """Quantity string without float noise or rounding (Alpaca takes up to 9 decimals for crypto)."""
+    text = f"{float(qty):.9f}".rstrip("0").rstrip(".")
+    return "0" if text in ("", "-0") else text
+
+
+def position_symbol(symbol):
+    """Alpaca reports crypto positions without the slash (BTC/USD -> BTCUSD)."""
+    return symbol.replace("/", "")
+
+
+# ── replayed market ─────────────────────────────────────────────────────
+
+class MarketReplay:
+    """Market clock running at speed x real time, with a price path per symbol."""
+
+    def __init__(self, start=None, speed=1.0, seed=0, clock=time.monotonic):
+        self.speed = speed
+        self.clock = clock
+        self.t0 = clock()
+        self.start = start if start is not None else time.time()
+        self.seed = seed
+        self.ticks = {}        # symbol -> (timestamps, prices, bids, asks) for recorded data
+        self.walks = {}        # symbol -> synthetic prices, one per TICK_SECONDS
+        self._rngs = {}        # symbol -> random.Random extending that path
+
+    def now(self):
+        """Current market time (unix seconds)."""
+        return self.start + (self.clock() - self.t0) * self.speed
+
+    def load_ticks(self, path):
+        """Recorded ticks: CSV with timestamp,symbol,price and optional bid,ask columns."""
+        rows = {}
+        with open(path, "r", encoding="utf-8", newline="") as f:
+            for row in csv.DictReader(f):
+                ts = row["timestamp"]
+                ts = float(ts) if ts.replace(".", "").isdigit() else datetime.fromisoformat(
+                    ts.replace("Z", "+00:00")).timestamp()
+                price = float(row["price"])
+                bid = float(row.get("bid") or price)
+                ask = float(row.get("ask") or price)
+                rows.setdefault(row["symbol"], []).append((ts, price, bid, ask))
+        for symbol, series in rows.items():
+            series.sort()
+            self.ticks[symbol] = tuple(list(col) for col in zip(*series))
+        if rows:
+            self.start = min(s[0][0] for s in self.ticks.values())
+            self.t0 = self.clock()
+        return len(rows)
+
+    def _walk(self, symbol, step):
+        path = self.walks.get(symbol)
+        if path is None:
+            rng = self._rngs[symbol] = random.Random(f"{self.seed}:{symbol}")
+            path = self.walks[symbol] = [DEFAULT_PRICES.get(symbol) or rng.uniform(20, 400)]
+        rng = self._rngs[symbol]
+        vol = 0.0004 if not is_crypto(symbol) else 0.0008
+        while len(path) <= step:
+            path.append(path[-1] * math.exp(rng.gauss(0.0, vol)))
+        return path[step]
+
+    def quote(self, symbol, ts=None):
+        """(timestamp, last, bid, ask) at market time ts (default: now)."""
+        ts = self.now() if ts is None else ts
+        if symbol in self.ticks:
+            stamps, prices, bids, asks = self.ticks[symbol]
+            i = max(bisect.bisect_right(stamps, ts) - 1, 0)
+            return stamps[i], prices[i], bids[i], asks[i]
+        if len(symbol) > 15 and symbol[-9] in "CP":
+            return ts, *self.option_quote(symbol, ts)
+        step = max(int((ts - self.start) / TICK_SECONDS), 0)
+        price = self._walk(symbol, step)
+        half = price * SPREAD_BPS / 10000
+        return self.start + step * TICK_SECONDS, price, price - half, price + half
+
+    def option_quote(self, symbol, ts):
+        """Crude (last, bid, ask) for an OCC symbol: intrinsic value plus a square-root-of-time premium."""
+        underlying, expiry, option_type, strike = parse_occ(symbol)
+        spot = self.quote(underlying, ts)[1]
+        days = max((date.fromisoformat(expiry) - datetime.fromtimestamp(ts, timezone.utc).date()).days, 0)
+        intrinsic = max(spot - strike, 0.0) if option_type == "call" else max(strike - spot, 0.0)
+        premium = spot * 0.02 * math.sqrt((days + 1) / 30) * math.exp(-abs(spot - strike) / (spot * 0.05))
+        mid = round(max(intrinsic + premium, 0.01), 2)
+        return mid, max(round(mid - 0.05, 2), 0.0), round(mid + 0.05, 2)
+
+    def bars(self, symbol, start, end, seconds):
+        """OHLCV bars of the given width between two market times, built from the replayed path."""
+        out = []
+        t = start - start % seconds
+        while t < end and len(out) < 10000:
+            prices = [self.quote(symbol, t + k * seconds / 4)[1] for k in range(5)]
+            out.append({"t": utc_iso(t), "o": prices[0], "h": max(prices), "l": min(prices), "c": prices[-1],
+                        "v": 1000 * len(prices), "n": len(prices), "vw": sum(prices) / len(prices)})
+            t += seconds
+        return out
+
+
+# ── broker state ────────────────────────────────────────────────────────
+
+class Broker:
+    """Account, positions, orders and fill activities of one paper account."""
+
+    def __init__(self, market, cash=STARTING_CASH):
+        self.market = market
+        self.cash = cash
+        self.positions = {}     # symbol -> {"qty", "avg_entry_price", "asset_class", "symbol"}
+        self.orders = {}        # id -> order
+        self.activities = []
+
+    def _position_json(self, pos):
+        qty = pos["qty"]
+        price = self.market.quote(pos["source_symbol"])[1]
+        multiplier = 100 if pos["asset_class"] == "us_option" else 1
+        market_value = qty * price * multiplier
+        cost = qty * pos["avg_entry_price"] * multiplier
+        return {
+            "asset_id": pos["asset_id"], "symbol": pos["symbol"], "exchange": "STUB",
+            "asset_class": pos["asset_class"], "qty": format_qty(qty), "qty_available": format_qty(qty),
+            "side": "long" if qty >= 0 else "short", "avg_entry_price": f"{pos['avg_entry_price']:.4f}",
+            "market_value": f"{market_value:.2f}", "cost_basis": f"{cost:.2f}",
+            "unrealized_pl": f"{market_value - cost:.2f}",
+            "unrealized_plpc": f"{(market_value - cost) / abs(cost) if cost else 0.0:.4f}",
+            "current_price": f"{price:.4f}",
+        }
+
+    def account(self):
+        values = [float(self._position_json(p)["market_value"]) for p in self.positions.values()]
+        long_value = sum(v for v in values if v > 0)
+        short_value = sum(v for v in values if v < 0)
+        equity = self.cash + long_value + short_value
+        return {
+            "id": "stub-account", "account_number": "PASTUB0001", "status": "ACTIVE", "currency": "USD",
+            "cash": f"{self.cash:.2f}", "equity": f"{equity:.2f}", "last_equity": f"{equity:.2f}",
+            "portfolio_value": f"{equity:.2f}", "long_market_value": f"{long_value:.2f}",
+            "short_market_value": f"{short_value:.2f}",
+            "buying_power": f"{max(self.cash, 0) * 2:.2f}", "options_buying_power": f"{max(self.cash, 0):.2f}",
+            "pattern_day_trader": False, "trading_blocked": False, "crypto_status": "ACTIVE",
+            "options_trading_level": 3,
+        }
+
+    def positions_json(self):
+        return [self._position_json(p) for p in self.positions.values()]
+
+    def position(self, symbol):
+        pos = self.positions.get(position_symbol(symbol))
+        return None if pos is None else self._position_json(pos)
+
+    def submit(self, payload):
+        """Create an order; market orders and marketable limits fill at once. Returns (status, body)."""
+        if not isinstance(payload, dict):
+            return 422, {"code": 40010001, "message": "request body must be a JSON object"}
+        symbol = payload.get("symbol")
+        side = payload.get("side")
+        qty = payload.get("qty")
+        notional = payload.get("notional")
+        if not symbol or side not in ("buy", "sell") or (qty is None and notional is None):
+            return 422, {"code": 42210000, "message": "symbol, side and qty or notional are required"}
+        for field in ("qty", "notional", "limit_price"):
+            value = payload.get(field)
+            if value is None:
+                continue
+            try:
+                number = float(value)
+            except (TypeError, ValueError):
+                number = float("nan")
+            if not number > 0 or math.isinf(number):
+                return 422, {"code": 40010001, "message": f"{field} must be > 0"}
+        client_id = payload.get("client_order_id") or uuid.uuid4().hex
+        if any(o["client_order_id"] == client_id for o in self.orders.values()):
+            return 422, {"code": 40010001, "message": "client_order_id must be unique"}
+        now = self.market.now()
+        _, last, bid, ask = self.market.quote(symbol)
+        if qty is None:
+            qty = float(notional) / ask
+        order = {
+            "id": str(uuid.uuid4()), "client_order_id": client_id, "symbol": symbol,
+            "asset_class": "crypto" if is_crypto(symbol) else ("us_option" if len(symbol) > 15 else "us_equity"),
+            "qty": qty.strip() if isinstance(qty, str) else format_qty(qty), "filled_qty": "0", "filled_avg_price": None,
+            "side": side, "type": payload.get("type", "market"), "time_in_force": payload.get("time_in_force", "day"),
+            "limit_price": payload.get("limit_price"), "status": "new",
+            "created_at": utc_iso(now), "submitted_at": utc_iso(now), "filled_at": None,
+        }
+        self.orders[order["id"]] = order
+        price = ask if side == "buy" else bid
+        limit = order["limit_price"]
+        if order["type"] == "market" or (limit is not None and (
+                (side == "buy" and float(limit) >= ask) or (side == "sell" and float(limit) <= bid))):
+            self._fill(order, price, now)
+        return 200, order
+
+    def _fill(self, order, price, now):
+        qty = float(order["qty"])
+        signed = qty if order["side"] == "buy" else -qty
+        multiplier = 100 if order["asset_class"] == "us_option" else 1
+        key = position_symbol(order["symbol"])
+        pos = self.positions.get(key)
+        if pos is None:
+            pos = self.positions[key] = {"symbol": key, "source_symbol": order["symbol"], "qty": 0.0,
+                                         "avg_entry_price": 0.0, "asset_class": order["asset_class"],
+                                         "asset_id": str(uuid.uuid5(uuid.NAMESPACE_OID, key))}
+        new_qty = pos["qty"] + signed
+        if pos["qty"] == 0 or (pos["qty"] > 0) == (signed > 0):
+            pos["avg_entry_price"] = (pos["avg_entry_price"] * abs(pos["qty"]) + price * qty) / abs(new_qty)
+        elif new_qty and (new_qty > 0) != (pos["qty"] > 0):
+            pos["avg_entry_price"] = price
+        pos["qty"] = new_qty
+        if abs(new_qty) < 1e-9:
+            del self.positions[key]
+        self.cash -= signed * price * multiplier
+        order.update(status="filled", filled_qty=order["qty"], filled_avg_price=f"{price:.4f}", filled_at=utc_iso(now))
+        self.activities.append({
+            "id": f"{int(now * 1000)}::{uuid.uuid4()}", "activity_type": "FILL", "transaction_time": utc_iso(now),
+            "type": "fill", "price": f"{price:.4f}", "qty": order["qty"], "side": order["side"],
+            "symbol": key, "leaves_qty": "0", "order_id": order["id"], "cum_qty": order["qty"],
+            "order_status": "filled",
+        })
+
+    def cancel(self, order_id=None):
+        """Cancel one open order, or all of them; returns the cancelled orders."""
+        targets = [self.orders[order_id]] if order_id in self.orders else (
+            [] if order_id else list(self.orders.values()))
+        cancelled = []
+        for order in targets:
+            if order["status"] in ("new", "accepted", "partially_filled"):
+                order["status"] = "canceled"
+                cancelled.append(order)
+        return cancelled
+
+    def close(self, symbol=None):
+        """Market-close one position or all of them; returns the closing orders."""
+        keys = [position_symbol(symbol)] if symbol else list(self.positions)
+        closing = []
+        for key in keys:
+            pos = self.positions.get(key)
+            if pos is None:
+                continue
+            side = "sell" if pos["qty"] > 0 else "buy"
+            closing.append(self.submit({"symbol": pos["source_symbol"], "qty": abs(pos["qty"]), "side": side})[1])
+        return closing
+
+
+# ── options contracts ───────────────────────────────────────────────────
+
+def synthetic_contracts(market, underlying, weeks=8):
+    """Weekly Friday expiries and strikes within ±20% of spot, with seeded open interest."""
+    spot = market.quote(underlying)[1]
+    step = 1.0 if spot < 200 else 5.0
+    today = datetime.fromtimestamp(market.now(), timezone.utc).date()
+    friday = today + timedelta(days=(4 - today.weekday()) % 7)
+    rng = random.Random(f"{market.seed}:{underlying}:oi")
+    contracts = []
+    for w in range(weeks):
+        expiry = (friday + timedelta(weeks=w)).isoformat()
+        strike = math.floor(spot * 0.8 / step) * step
+        while strike <= spot * 1.2:
+            for option_type in ("call", "put"):
+                distance = abs(strike - spot) / spot
+                contracts.append({
+                    "id": str(uuid.uuid5(uuid.NAMESPACE_OID, f"{underlying}{expiry}{option_type}{strike}")),
+                    "symbol": occ_symbol(underlying, expiry, option_type, strike),
+                    "name": f"{underlying} {expiry} {option_type} {strike:g}", "status": "active", "tradable": True,
+                    "expiration_date": expiry, "root_symbol": underlying, "underlying_symbol": underlying,
+                    "type": option_type, "style": "american", "strike_price": f"{strike:g}", "size": "100",
+                    "open_interest": str(int(rng.expovariate(1.0) * 5000 * math.exp(-distance * 20))),
+                    "close_price": f"{market.option_quote(occ_symbol(underlying, expiry, option_type, strike), market.now())[0]:.2f}",
+                })
+            strike += step
+    return contracts
+
+
+# ── metrics ─────────────────────────────────────────────────────────────
+
+class EndpointMetrics:
+    """Request counts and the most recent latency samples per (method, route)."""
+
+    def __init__(self, clock=time.monotonic, max_samples=LATENCY_SAMPLES):
+        self.clock = clock
+        self.started = clock()
+        self.max_samples = max_samples
+        self.counts = {}
+        self.samples = {}
+
+    def record(self, endpoint, seconds):
+        self.counts[endpoint] = self.counts.get(endpoint, 0) + 1
+        self.samples.setdefault(endpoint, deque(maxlen=self.max_samples)).append(seconds)
+
+    def report(self):
+        elapsed = max(self.clock() - self.started, 1e-9)
+        out = {}
+        for endpoint, samples in sorted(self.samples.items()):
+            s = sorted(samples)
+
+            def pct(p):
+                return s[min(int(p * len(s)), len(s) - 1)] * 1000
+
+            count = self.counts[endpoint]
+            out[endpoint] = {"requests": count, "per_second": count / elapsed, "p50_ms": pct(0.5),
+                             "p95_ms": pct(0.95), "p99_ms": pct(0.99), "max_ms": s[-1] * 1000}
+        return {"uptime_s": elapsed, "endpoints": out}
+
+
+# ── server ──────────────────────────────────────────────────────────────
+
+class AlpacaStub:
+    """HTTP front end routing Alpaca REST paths to the Broker and MarketReplay."""
+
+    def __init__(self, market, broker=None, contracts_dir=None, require_auth=True):
+        self.market = market
+        self.broker = broker or Broker(market)
+        self.contracts = FixtureContractsFetcher(contracts_dir, CONTRACTS_PAGE_SIZE) if contracts_dir else None
+        self.require_auth = require_auth
+        self.metrics = EndpointMetrics()
+
+    def _contracts_page(self, params):
+        underlying = params.get("underlying_symbols", [""])[0].split(",")[0]
+        gte = params.get("expiration_date_gte", [None])[0]
+        lte = params.get("expiration_date_lte", [None])[0]
+        token = params.get("page_token", [None])[0]
+        if self.contracts:
+            return self.contracts.fetch_page(underlying, gte, lte, token)
+        contracts = [c for c in synthetic_contracts(self.market, underlying)
+                     if (not gte or c["expiration_date"] >= gte) and (not lte or c["expiration_date"] <= lte)]
+        limit = int(params.get("limit", [CONTRACTS_PAGE_SIZE])[0])
+        start = int(token or 0)
+        end = start + min(limit, 10000)
+        return {"option_contracts": contracts[start:end], "next_page_token": str(end) if end < len(contracts) else None}
+
+    def _quote_json(self, symbol):
+        ts, _, bid, ask = self.market.quote(symbol)
+        return {"t": utc_iso(ts), "ax": "V", "ap": round(ask, 4), "as": 1, "bx": "V", "bp": round(bid, 4), "bs": 1,
+                "c": ["R"], "z": "A"}
+
+    def _trade_json(self, symbol):
+        ts, last, _, _ = self.market.quote(symbol)
+        return {"t": utc_iso(ts), "x": "V", "p": round(last, 4), "s": 100, "c": ["@"], "i": 1, "z": "A"}
+
+    def dispatch(self, method, path, params, body):
+        """(endpoint label, status, JSON-able body) for one request."""
+        parts = [p for p in path.split("/") if p]
+        b = self.broker
+
+        if parts == ["_stub", "metrics"]:
+            return "GET /_stub/metrics", 200, self.metrics.report()
+        if parts[:1] == ["v2"] and parts[1:2] == ["account"] and len(parts) == 2:
+            return "GET /v2/account", 200, b.account()
+        if parts[:3] == ["v2", "account", "activities"]:
+            types = parts[3:4] or params.get("activity_types", [""])[0].split(",")
+            acts = [a for a in b.activities if not types[0] or a["activity_type"] in types]
+            if params.get("direction", ["desc"])[0] == "desc":
+                acts = acts[::-1]
+            size = int(params.get("page_size", [100])[0])
+            return "GET /v2/account/activities", 200, acts[:size]
+        if parts[:2] == ["v2", "positions"]:
+            if method == "GET":
+                if len(parts) == 2:
+                    return "GET /v2/positions", 200, b.positions_json()
+                pos = b.position("/".join(parts[2:]))
+                return "GET /v2/positions/{symbol}", (200, 404)[pos is None], pos or {
+                    "code": 40410000, "message": "position does not exist"}
+            if method == "DELETE":
+                if len(parts) == 2:
+                    return "DELETE /v2/positions", 207, [{"symbol": o["symbol"], "status": 200, "body": o}
+                                                         for o in b.close()]
+                orders = b.close("/".join(parts[2:]))
+                return "DELETE /v2/positions/{symbol}", (200, 404)[not orders], orders[0] if orders else {
+                    "code": 40410000, "message": "position does not exist"}
+        if parts and parts[0] == "v2" and parts[1:2] and parts[1].startswith("orders"):
+            if parts[1] == "orders:by_client_order_id":
+                cid = params.get("client_order_id", [""])[0]
+                order = next((o for o in b.orders.values() if o["client_order_id"] == cid), None)
+                return "GET /v2/orders:by_client_order_id", (200, 404)[order is None], order or {"message": "not found"}
+            if method == "POST" and len(parts) == 2:
+                status, order = b.submit(json.loads(body or b"{}"))
+                return "POST /v2/orders", status, order
+            if method == "DELETE":
+                if len(parts) > 2 and parts[2] not in b.orders:
+                    return "DELETE /v2/orders/{id}", 404, {"code": 40410000, "message": "order not found"}
+                cancelled = b.cancel(parts[2] if len(parts) > 2 else None)
+                label = "DELETE /v2/orders" + ("/{id}" if len(parts) > 2 else "")
+                return label, 207 if len(parts) == 2 else 204, [{"id": o["id"], "status": 200} for o in cancelled]
+            if len(parts) > 2:
+                order = b.orders.get(parts[2])
+                return "GET /v2/orders/{id}", (200, 404)[order is None], order or {"message": "order not found"}
+            status_filter = params.get("status", ["open"])[0]
+            orders = [o for o in b.orders.values() if status_filter == "all"
+                      or (status_filter == "open") == (o["status"] in ("new", "accepted", "partially_filled"))]
+            return "GET /v2/orders", 200, orders[::-1][:int(params.get("limit", [50])[0])]
+        if parts[:3] == ["v2", "options", "contracts"]:
+            return "GET /v2/options/contracts", 200, self._contracts_page(params)
+
+        if parts[:2] == ["v2", "stocks"]:
+            if len(parts) == 4 and parts[2] in ("quotes", "trades") and parts[3] == "latest":
+                symbols = params.get("symbols", [""])[0].split(",")
+                key, fn = ("quotes", self._quote_json) if parts[2] == "quotes" else ("trades", self._trade_json)
+                return f"GET /v2/stocks/{key}/latest", 200, {key: {s: fn(s) for s in symbols if s}}
+            if len(parts) == 5 and parts[4] == "latest":
+                symbol = parts[2]
+                if parts[3] == "quotes":
+                    return "GET /v2/stocks/{symbol}/quotes/latest", 200, {"symbol": symbol, "quote": self._quote_json(symbol)}
+                return "GET /v2/stocks/{symbol}/trades/latest", 200, {"symbol": symbol, "trade": self._trade_json(symbol)}
+            if len(parts) == 4 and parts[3] == "bars":
+                symbol = parts[2]
+                seconds = {"1Min": 60, "5Min": 300, "15Min": 900, "1Hour": 3600, "1Day": 86400,
+                           "1Month": 86400 * 30}.get(params.get("timeframe", ["1Day"])[0], 86400)
+                end = params.get("end", [None])[0]
+                # Never replay past the market clock
+                end_ts = min(datetime.fromisoformat(end.replace("Z", "+00:00")).timestamp() if end else math.inf,
+                             self.market.now())
+                start = params.get("start", [None])[0]
+                start_ts = datetime.fromisoformat(start.replace("Z", "+00:00")).timestamp() if start else end_ts - 30 * seconds
+                return "GET /v2/stocks/{symbol}/bars", 200, {
+                    "symbol": symbol, "bars": self.market.bars(symbol, start_ts, end_ts, seconds), "next_page_token": None}
+        if parts[:4] == ["v1beta3", "crypto", "us", "latest"] and len(parts) == 5:
+            symbols = params.get("symbols", [""])[0].split(",")
+            key, fn = ("quotes", self._quote_json) if parts[4] == "quotes" else ("trades", self._trade_json)
+            return f"GET /v1beta3/crypto/us/latest/{key}", 200, {key: {s: fn(s) for s in symbols if s}}
+        return f"{method} (unmatched)", 404, {"code": 40410000, "message": "endpoint not found"}
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                request = await read_request(reader)
+                if request is None:
+                    break
+                method, path, params, headers = request
+                length = int(headers.get("content-length") or 0)
+                body = await reader.readexactly(length) if length else b""
+                started = time.perf_counter()
+                if self.require_auth and not path.startswith("/_stub") and not headers.get("apca-api-key-id"):
+                    label, status, payload = f"{method} (unauthorized)", 401, {"message": "unauthorized."}
+                else:
+                    try:
+                        label, status, payload = self.dispatch(method, path, params, body)
+                    except (ValueError, KeyError, TypeError, AttributeError) as exc:
+                        label, status, payload = f"{method} (bad request)", 422, {"message": str(exc)}
+                    except Exception as exc:
+                        print(f"  {method} {path}: {exc!r}")
+                        label, status, payload = f"{method} (error)", 500, {"message": "internal error"}
+                data = b"" if status == 204 else json.dumps(payload).encode("utf-8")
+                self.metrics.record(label, time.perf_counter() - started)
+                await send(writer, status, data, {"Content-Type": "application/json"})
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+
+def print_metrics(report):
+    print(f"\n  {'endpoint':<44} {'requests':>9} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for endpoint, m in report["endpoints"].items():
+        print(f"  {endpoint:<44} {m['requests']:>9} {m['per_second']:>8.1f} "
+              f"{m['p50_ms']:>8.3f} {m['p95_ms']:>8.3f} {m['p99_ms']:>8.3f}")
+
+
+async def serve(args):
+    market = MarketReplay(speed=args.speed, seed=args.seed)
+    if args.start:
+        market.start = datetime.fromisoformat(args.start).replace(tzinfo=timezone.utc).timestamp()
+    if args.ticks:
+        print(f"Loaded recorded ticks for {market.load_ticks(args.ticks)} symbols from {args.ticks}")
+    stub = AlpacaStub(market, Broker(market, args.cash), args.contracts, require_auth=not args.no_auth)
+    server = await asyncio.start_server(stub.handle, args.host, args.port)
+    print(f"Alpaca stand-in on http://{args.host}:{args.port} (market time {utc_iso(market.now())}, "
+          f"{args.speed:g}x real time)")
+    try:
+        async with server:
+            while True:
+                await asyncio.sleep(args.report_every)
+                if stub.metrics.samples:
+                    print_metrics(stub.metrics.report())
+    finally:
+        print_metrics(stub.metrics.report())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local Alpaca API stand-in with market-data replay.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8092)
+    parser.add_argument("--speed", type=float, default=1.0, help="market seconds per real second")
+    parser.add_argument("--start", help="market start time (ISO, UTC) for synthetic data")
+    parser.add_argument("--ticks", help="recorded tick CSV (timestamp,symbol,price[,bid,ask])")
+    parser.add_argument("--contracts", help="directory of <UNDERLYING>.json contract fixtures")
+    parser.add_argument("--cash", type=float, default=STARTING_CASH)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-auth", action="store_true", help="accept requests without APCA-API-KEY-ID")
+    parser.add_argument("--report-every", type=float, default=60.0, help="seconds between metrics printouts")
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
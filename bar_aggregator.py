@@ -0,0 +1,336 @@
+#!/usr/bin/env python3
+"""
+Streaming time, range, volume and dollar bars from trades or minute bars.
+
+The flows fetch ready-made bars (alpaca-range-bars is Alpaca's bars endpoint
+over a start/end range) and anything else is aggregated ad hoc in function
+nodes. BarAggregator turns a trade or minute-bar stream into bars for any
+number of symbols at once:
+
+  * time:   one bar per `size`-second bucket, aligned to UTC epoch multiples;
+  * range:  a bar closes once its high - low reaches `size` (price units);
+  * volume: a bar closes once cumulative volume crosses the next multiple of
+    `size`; dollar: the same on cumulative price * volume (VWAP * volume for
+    minute bars). Boundaries stay on those multiples, so a large print that
+    overshoots does not shift every later bar.
+
+Each symbol holds only its open bar plus an optional bounded history, so
+memory stays flat however long the stream runs. update() returns the bars a
+tick completes (live mode); close_due(now) closes time bars whose bucket has
+ended even if the symbol stopped trading. aggregate() does a whole history
+in batch, vectorized for time, volume and dollar bars, and gives the same
+bars as feeding it through update() (see --check).
+
+A minute bar counts as one tick with its own open/high/low/close, so range bars
+built from minute data can only close on minute boundaries.
+
+Usage:
+    python bar_aggregator.py trades.csv --rule range --size 0.5 --out bars.csv
+    python bar_aggregator.py minute_bars.csv --rule time --size 300
+    python bar_aggregator.py --check --symbols 2000 --ticks-count 500000 --rule dollar --size 1e6
+"""
+
+import argparse
+import csv
+import math
+import time
+from collections import deque
+from datetime import datetime, timezone
+
+import numpy as np
+
+from date_util import parse_time
+
+RULES = ("time", "range", "volume", "dollar")
+BAR_FIELDS = ("symbol", "start", "end", "open", "high", "low", "close", "volume", "dollar", "vwap", "ticks")
+
+
+def utc_iso(ts):
+    return datetime.fromtimestamp(ts, timezone.utc).isoformat().replace("+00:00", "Z")
+
+
+# ── live ────────────────────────────────────────────────────────────────
+
+class _OpenBar:
+    __slots__ = ("key", "start", "end", "open", "high", "low", "close", "volume", "dollar", "ticks")
+
+    def __init__(self, key, start, open_):
+        self.key = key
+        self.start = start
+        self.end = start
+        self.open = self.high = self.low = self.close = open_
+        self.volume = self.dollar = 0.0
+        self.ticks = 0
+
+    def as_dict(self, symbol):
+        return {"symbol": symbol, "start": self.start, "end": self.end, "open": self.open, "high": self.high,
+                "low": self.low, "close": self.close, "volume": self.volume, "dollar": self.dollar,
+                "vwap": self.dollar / self.volume if self.volume else self.close, "ticks": self.ticks}
+
+
+class BarAggregator:
+    """One bar rule over many symbols; update() per tick returns the bars it completed."""
+
+    def __init__(self, rule, size, history=0):
+        if rule not in RULES:
+            raise ValueError(f"rule must be one of {', '.join(RULES)}")
+        if size <= 0:
+            raise ValueError("size must be positive")
+        self.rule = rule
+        self.size = float(size)
+        self.history = history
+        self.open = {}          # symbol -> _OpenBar
+        self.cum = {}           # symbol -> cumulative volume or dollars (volume / dollar rules)
+        self.closed = {}        # symbol -> deque of the last `history` bars
+        self._due = {}          # time rule: bucket end -> symbols with a bar open in that bucket
+
+    def _emit(self, symbol, bar):
+        done = bar.as_dict(symbol)
+        if self.rule == "time":
+            done["start"] = bar.key * self.size
+            end = (bar.key + 1) * self.size
+            waiting = self._due.get(end)
+            if waiting is not None:
+                waiting.discard(symbol)
+                if not waiting:
+                    del self._due[end]
+        if self.history:
+            self.closed.setdefault(symbol, deque(maxlen=self.history)).append(done)
+        return done
+
+    def update(self, symbol, ts, price, volume=0.0, high=None, low=None, open_=None, vwap=None):
+        """Add one trade (or one minute bar with its open/high/low/vwap); returns the completed bars."""
+        high = price if high is None else high
+        low = price if low is None else low
+        dollar = (price if vwap is None else vwap) * volume
+        done = []
+        bar = self.open.get(symbol)
+
+        if self.rule == "time":
+            key = math.floor(ts / self.size)
+        elif self.rule in ("volume", "dollar"):
+            before = self.cum.get(symbol, 0.0)
+            key = math.floor(before / self.size)
+            self.cum[symbol] = before + (volume if self.rule == "volume" else dollar)
+        else:
+            key = bar.key if bar is not None else 0
+
+        if bar is not None and bar.key != key:
+            done.append(self._emit(symbol, bar))
+            bar = None
+        if bar is None:
+            bar = self.open[symbol] = _OpenBar(key, ts, price if open_ is None else open_)
+            if self.rule == "time":
+                self._due.setdefault((key + 1) * self.size, set()).add(symbol)
+        bar.end = ts
+        bar.high = max(bar.high, high)
+        bar.low = min(bar.low, low)
+        bar.close = price
+        bar.volume += volume
+        bar.dollar += dollar
+        bar.ticks += 1
+
+        if (self.rule == "range" and bar.high - bar.low >= self.size) or (
+                self.rule in ("volume", "dollar") and math.floor(self.cum[symbol] / self.size) > key):
+            done.append(self._emit(symbol, bar))
+            del self.open[symbol]
+        return done
+
+    def update_bar(self, symbol, bar):
+        """update() with an Alpaca bar object ({"t", "o", "h", "l", "c", "v", "vw"})."""
+        return self.update(symbol, parse_time(bar["t"]), bar["c"], bar.get("v", 0.0), bar["h"], bar["l"], bar["o"],
+                           bar.get("vw"))
+
+    def close_due(self, now):
+        """Time rule: close every bar whose bucket ended at or before now; returns them."""
+        done = []
+        for end in sorted(e for e in self._due if e <= now):
+            for symbol in sorted(self._due.pop(end)):
+                bar = self.open.pop(symbol, None)
+                if bar is not None:
+                    done.append(self._emit(symbol, bar))
+        return done
+
+    def flush(self):
+        """Close every open bar (end of the stream); returns them."""
+        done = [self._emit(symbol, bar) for symbol, bar in sorted(self.open.items())]
+        self.open.clear()
+        self._due.clear()
+        return done
+
+
+# ── batch ───────────────────────────────────────────────────────────────
+
+def _range_keys(high, low, size):
+    """Bar number per tick for one symbol's range bars (inherently sequential)."""
+    keys = np.empty(len(high), dtype=np.int64)
+    key, hi, lo = 0, -math.inf, math.inf
+    for i in range(len(high)):
+        hi = max(hi, high[i])
+        lo = min(lo, low[i])
+        keys[i] = key
+        if hi - lo >= size:
+            key, hi, lo = key + 1, -math.inf, math.inf
+    return keys
+
+
+def aggregate(ts, symbols, price, volume, rule, size, high=None, low=None, open_=None, vwap=None):
+    """All bars for a history of ticks (any order), as a dict of arrays keyed like BAR_FIELDS.
+
+    Every bar is closed, including each symbol's last, partial one.
+    """
+    ts = np.asarray(ts, dtype=float)
+    price = np.asarray(price, dtype=float)
+    volume = np.asarray(volume, dtype=float)
+    high = price if high is None else np.asarray(high, dtype=float)
+    low = price if low is None else np.asarray(low, dtype=float)
+    open_ = price if open_ is None else np.asarray(open_, dtype=float)
+    dollar = (price if vwap is None else np.asarray(vwap, dtype=float)) * volume
+    names, codes = np.unique(np.asarray(symbols), return_inverse=True)
+
+    order = np.lexsort((ts, codes))
+    ts, codes, price, volume, high, low, open_, dollar = (
+        a[order] for a in (ts, codes, price, volume, high, low, open_, dollar))
+    seg = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1], True])
+
+    if rule == "time":
+        keys = np.floor(ts / size).astype(np.int64)
+    elif rule in ("volume", "dollar"):
+        measure = volume if rule == "volume" else dollar
+        keys = np.empty(len(ts), dtype=np.int64)
+        for s, e in zip(seg[:-1], seg[1:]):
+            # cumulative per symbol, summed in the same order update() adds them; the tick that
+            # crosses a boundary closes its bar, so the next tick's running total starts the next one
+            before = np.r_[0.0, np.cumsum(measure[s:e])[:-1]]
+            keys[s:e] = np.floor(before / size)
+    elif rule == "range":
+        keys = np.empty(len(ts), dtype=np.int64)
+        for s, e in zip(seg[:-1], seg[1:]):
+            keys[s:e] = _range_keys(high[s:e], low[s:e], size)
+    else:
+        raise ValueError(f"rule must be one of {', '.join(RULES)}")
+
+    starts = np.flatnonzero(np.r_[True, (codes[1:] != codes[:-1]) | (keys[1:] != keys[:-1])])
+    ends = np.r_[starts[1:], len(ts)] - 1
+    vol = np.add.reduceat(volume, starts)
+    dol = np.add.reduceat(dollar, starts)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        vw = np.where(vol > 0, dol / np.where(vol > 0, vol, 1.0), price[ends])
+    return {
+        "symbol": names[codes[starts]],
+        "start": keys[starts] * size if rule == "time" else ts[starts],
+        "end": ts[ends],
+        "open": open_[starts],
+        "high": np.maximum.reduceat(high, starts),
+        "low": np.minimum.reduceat(low, starts),
+        "close": price[ends],
+        "volume": vol,
+        "dollar": dol,
+        "vwap": vw,
+        "ticks": np.diff(np.r_[starts, len(ts)]),
+    }
+
+
+# ── CLI ─────────────────────────────────────────────────────────────────
+
+def load_ticks(path):
+    """Columns from a trades CSV (timestamp,symbol,price[,size]) or a minute-bar CSV
+    (timestamp|t,symbol,open,high,low,close,volume[,vwap])."""
+    cols = {k: [] for k in ("ts", "symbol", "price", "volume", "high", "low", "open", "vwap")}
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        for row in csv.DictReader(f):
+            stamp = row.get("timestamp") or row.get("t") or row.get("date")
+            close = row.get("price") or row.get("close") or row.get("c")
+            if not stamp or not close:
+                continue
+            cols["ts"].append(parse_time(stamp))
+            cols["symbol"].append(row["symbol"])
+            cols["price"].append(float(close))
+            cols["volume"].append(float(row.get("size") or row.get("volume") or row.get("v") or 0.0))
+            for key, alt in (("high", "h"), ("low", "l"), ("open", "o"), ("vwap", "vw")):
+                value = row.get(key) or row.get(alt)
+                cols[key].append(float(value) if value else float(close))
+    return {k: np.array(v) for k, v in cols.items()}
+
+
+def synthetic_ticks(n_ticks, n_symbols, seed=0):
+    rng = np.random.default_rng(seed)
+    symbols = np.array([f"S{i:04d}" for i in range(n_symbols)])
+    which = rng.integers(0, n_symbols, n_ticks)
+    ts = 1_760_000_000.0 + np.sort(rng.uniform(0, 6.5 * 3600, n_ticks))
+    base = rng.uniform(5, 500, n_symbols)
+    steps = rng.normal(0, 0.0005, n_ticks)
+    price = np.empty(n_ticks)
+    for j in range(n_symbols):
+        idx = np.flatnonzero(which == j)
+        price[idx] = base[j] * np.exp(np.cumsum(steps[idx]))
+    volume = rng.integers(1, 20, n_ticks) * 100.0
+    return {"ts": ts, "symbol": symbols[which], "price": np.round(price, 4), "volume": volume}
+
+
+def stream(ticks, rule, size):
+    """aggregate() via the live path: every tick through update(), then flush()."""
+    agg = BarAggregator(rule, size)
+    bars = []
+    has_ohlc = "high" in ticks
+    for i in range(len(ticks["ts"])):
+        if has_ohlc:
+            bars += agg.update(ticks["symbol"][i], ticks["ts"][i], ticks["price"][i], ticks["volume"][i],
+                               ticks["high"][i], ticks["low"][i], ticks["open"][i], ticks["vwap"][i])
+        else:
+            bars += agg.update(ticks["symbol"][i], ticks["ts"][i], ticks["price"][i], ticks["volume"][i])
+    return bars + agg.flush()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Aggregate trades or minute bars into time, range, volume or dollar bars.")
+    parser.add_argument("ticks", nargs="?", help="trades or minute-bar CSV")
+    parser.add_argument("--rule", choices=RULES, default="time")
+    parser.add_argument("--size", type=float, default=60.0,
+                        help="seconds (time), price range (range), shares (volume) or dollars (dollar)")
+    parser.add_argument("--out", help="write the bars as CSV")
+    parser.add_argument("--check", action="store_true", help="compare batch and live on synthetic trades")
+    parser.add_argument("--symbols", type=int, default=1000, help="synthetic symbols (--check)")
+    parser.add_argument("--ticks-count", dest="n_ticks", type=int, default=200_000, help="synthetic trades (--check)")
+    args = parser.parse_args()
+
+    if args.check:
+        ticks = synthetic_ticks(args.n_ticks, args.symbols)
+    elif args.ticks:
+        ticks = load_ticks(args.ticks)
+    else:
+        parser.error("a ticks file is required unless --check is given")
+
+    started = time.perf_counter()
+    ohlc = {k: ticks[k] for k in ("high", "low", "open", "vwap") if k in ticks}
+    bars = aggregate(ticks["ts"], ticks["symbol"], ticks["price"], ticks["volume"], args.rule, args.size,
+                     ohlc.get("high"), ohlc.get("low"), ohlc.get("open"), ohlc.get("vwap"))
+    batch_s = time.perf_counter() - started
+    n_bars = len(bars["symbol"])
+    print(f"  {len(ticks['ts'])} ticks for {len(set(ticks['symbol']))} symbols -> {n_bars} {args.rule} bars "
+          f"in {batch_s * 1000:.0f} ms (batch)")
+
+    if args.check:
+        started = time.perf_counter()
+        live = stream(ticks, args.rule, args.size)
+        live_s = time.perf_counter() - started
+        live.sort(key=lambda b: (b["symbol"], b["end"]))
+        same = len(live) == n_bars and all(
+            live[i]["symbol"] == bars["symbol"][i] and live[i]["ticks"] == bars["ticks"][i]
+            and math.isclose(live[i]["close"], bars["close"][i]) and math.isclose(live[i]["volume"], bars["volume"][i])
+            for i in range(n_bars))
+        print(f"  live: {len(live)} bars in {live_s * 1000:.0f} ms ({live_s / len(ticks['ts']) * 1e6:.1f} us per tick); "
+              f"{'identical to' if same else 'DIFFERENT from'} batch")
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8", newline="") as f:
+            w = csv.writer(f)
+            w.writerow(BAR_FIELDS)
+            for i in range(n_bars):
+                w.writerow([bars["symbol"][i], utc_iso(bars["start"][i]), utc_iso(bars["end"][i])]
+                           + [repr(float(bars[k][i])) for k in BAR_FIELDS[3:-1]] + [int(bars["ticks"][i])])
+    print(f"\nDone! {n_bars} bars.")
+
+
+if __name__ == "__main__":
+    main()
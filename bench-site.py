@@ -0,0 +1,400 @@
+#!/usr/bin/env python3
+"""
+HTTP load and latency benchmark for the served site.
+
+Crawls the site from a base URL (the nginx container, or the repo served by a
+local static server with --serve), groups every URL by page type (flow page,
+learn article, report, chart, other page, JSON, CSV, image, CSS/JS) and then
+replays page views at a fixed concurrency: each view requests one page, picked
+with the --mix weights, followed by the assets it references, the way a
+browser with an empty cache would.
+
+Every run is repeated for the requested encodings (identity / gzip) and cache
+modes (cold = plain GETs, warm = conditional GETs with the crawl's ETag and
+Last-Modified validators), so one invocation answers "what did the nginx
+change do" with throughput, p50/p95/p99 latency and bytes on the wire per page
+type. --json-out saves the numbers for comparing two configurations.
+
+Usage:
+    python bench-site.py http://localhost:8080 --duration 20 --concurrency 32
+    python bench-site.py --serve . --encodings identity,gzip --cache cold,warm --json-out before.json
+"""
+
+import argparse
+import asyncio
+import functools
+import gzip
+import http.server
+import json
+import random
+import re
+import ssl
+import threading
+import time
+import urllib.parse
+
+PAGE_TYPES = ("flow", "learn", "report", "chart", "page", "json", "csv", "image", "asset")
+DEFAULT_MIX = {"flow": 2, "learn": 4, "report": 2, "chart": 1, "page": 3}
+IMAGE_EXT = (".png", ".jpg", ".jpeg", ".gif", ".svg", ".webp", ".ico", ".avif")
+
+LINK_RE = re.compile(r'''(?:href|src)\s*=\s*["']([^"'#]+)''', re.I)
+FETCH_RE = re.compile(r'''fetch\(\s*["'`]([^"'`$]+)["'`]''')
+REDIRECTS = (301, 302, 307, 308)
+MAX_REDIRECTS = 5
+
+PATH_VAR_RE = re.compile(r'''(?:csvPath|spyCsvPath|seriesPath)\s*=\s*["']([^"']+)["']''')
+
+
+def classify(path):
+    """Page type of a site path."""
+    p = urllib.parse.unquote(path.split("?", 1)[0]).lower()
+    if p.endswith(".json"):
+        return "json"
+    if p.endswith(".csv") or p.startswith("/csvfiles/"):
+        return "csv"
+    if p.endswith(IMAGE_EXT):
+        return "image"
+    if p.endswith((".css", ".js", ".woff", ".woff2")):
+        return "asset"
+    if p.startswith("/trading-flows/"):
+        return "flow"
+    if p.startswith("/learn-articles/"):
+        return "learn"
+    if p.startswith("/reports/"):
+        return "report"
+    if p.startswith("/charts/"):
+        return "chart"
+    return "page"
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(int(p * len(sorted_values)), len(sorted_values) - 1)]
+
+
+# ── minimal keep-alive HTTP/1.1 client ──────────────────────────────────
+
+class Connection:
+    """One keep-alive connection; reconnects transparently when the server closes it."""
+
+    def __init__(self, host, port, use_tls):
+        self.host, self.port = host, port
+        self.ssl = ssl.create_default_context() if use_tls else None
+        self.reader = self.writer = None
+
+    async def _connect(self):
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.port, ssl=self.ssl)
+
+    def close(self):
+        if self.writer:
+            self.writer.close()
+        self.reader = self.writer = None
+
+    async def request(self, path, headers=None):
+        """(status, response headers, body, bytes on the wire) for one GET."""
+        for attempt in (0, 1):
+            if self.writer is None:
+                await self._connect()
+            head = f"GET {path} HTTP/1.1\r\nHost: {self.host}\r\nUser-Agent: bench-site\r\n"
+            head += "".join(f"{k}: {v}\r\n" for k, v in (headers or {}).items())
+            try:
+                self.writer.write((head + "\r\n").encode("latin-1"))
+                await self.writer.drain()
+                return await self._read_response()
+            except (ConnectionError, asyncio.IncompleteReadError):
+                # Stale keep-alive connection: retry once on a fresh one
+                self.close()
+                if attempt:
+                    raise
+
+    async def _read_response(self):
+        line = await self.reader.readuntil(b"\r\n")
+        wire = len(line)
+        status = int(line.split()[1])
+        headers = {}
+        while True:
+            line = await self.reader.readuntil(b"\r\n")
+            wire += len(line)
+            if line == b"\r\n":
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        if status in (204, 304) or 100 <= status < 200:
+            body = b""
+        elif "content-length" in headers:
+            body = await self.reader.readexactly(int(headers["content-length"]))
+        elif headers.get("transfer-encoding", "").lower() == "chunked":
+            chunks = []
+            while True:
+                size_line = await self.reader.readuntil(b"\r\n")
+                wire += len(size_line)
+                size = int(size_line.split(b";")[0], 16)
+                chunk = await self.reader.readexactly(size + 2)
+                wire += size + 2
+                if size == 0:
+                    break
+                chunks.append(chunk[:-2])
+            body = b"".join(chunks)
+            wire -= len(body)
+        else:
+            body = await self.reader.read()
+            self.close()
+        if headers.get("connection", "").lower() == "close":
+            self.close()
+        return status, headers, body, wire + len(body)
+
+
+def decode_body(headers, body):
+    if headers.get("content-encoding") == "gzip":
+        body = gzip.decompress(body)
+    return body.decode("utf-8", "replace")
+
+
+# ── crawl ───────────────────────────────────────────────────────────────
+
+def resolve(base_path, link):
+    """Same-site absolute path for a link found on base_path, or None."""
+    if link.startswith(("mailto:", "tel:", "javascript:", "data:")):
+        return None
+    parsed = urllib.parse.urlparse(link)
+    if parsed.scheme or parsed.netloc:
+        return None
+    return urllib.parse.urljoin(base_path, link)
+
+
+def redirect_target(conn, path, headers):
+    """Same-site path a redirect response points to, or None (no Location, or another host)."""
+    location = headers.get("location")
+    if not location:
+        return None
+    parsed = urllib.parse.urlparse(location)
+    if parsed.netloc and parsed.hostname != conn.host:
+        return None
+    target = urllib.parse.urljoin(path, parsed.path or "/")
+    return target + ("?" + parsed.query if parsed.query else "")
+
+
+async def follow(conn, path, headers=None):
+    """(final path, status, headers, body) after following 301/302/307/308 on the same site."""
+    for _ in range(MAX_REDIRECTS + 1):
+        status, response_headers, body, _ = await conn.request(path, headers)
+        target = redirect_target(conn, path, response_headers) if status in REDIRECTS else None
+        if target is None or target == path:
+            break
+        path = target
+    return path, status, response_headers, body
+
+
+async def crawl(conn, start="/", max_urls=2000):
+    """BFS over HTML pages -> {path: {"type", "assets", "etag", "last_modified", "status"}}.
+
+    nginx 301s every *.html link to its clean URL, so redirects are followed:
+    the linked path is recorded as a "redirect" entry pointing at the final URL,
+    which is what gets crawled, benchmarked and listed as an asset.
+    """
+    site = {}
+    queue = [start]
+    while queue and len(site) < max_urls:
+        path = queue.pop(0)
+        if path in site:
+            continue
+        final, status, headers, body = await follow(conn, path, {"Accept-Encoding": "gzip"})
+        if final != path:
+            site[path] = {"type": "redirect", "location": final, "assets": [], "status": status,
+                          "etag": None, "last_modified": None}
+            if final in site:
+                continue
+            path = final
+        entry = site[path] = {"type": classify(path), "assets": [], "status": status,
+                              "etag": headers.get("etag"), "last_modified": headers.get("last-modified")}
+        if status != 200 or "html" not in headers.get("content-type", ""):
+            if entry["type"] == "page" and status == 200:
+                entry["type"] = "asset"
+            continue
+        html = decode_body(headers, body)
+        links = LINK_RE.findall(html) + FETCH_RE.findall(html) + PATH_VAR_RE.findall(html)
+        for link in links:
+            target = resolve(path, link.strip())
+            if target is None:
+                continue
+            kind = classify(target)
+            if kind in ("json", "csv", "image", "asset") and target not in entry["assets"]:
+                entry["assets"].append(target)
+            if target not in site and target not in queue:
+                queue.append(target)
+    # Replay the assets at the URLs they finally resolved to
+    for entry in site.values():
+        entry["assets"] = list(dict.fromkeys(
+            site[a]["location"] if site.get(a, {}).get("type") == "redirect" else a for a in entry["assets"]))
+    return site
+
+
+# ── load ────────────────────────────────────────────────────────────────
+
+class Results:
+    def __init__(self):
+        self.samples = {}     # type -> [(latency, wire bytes, status)]
+        self.errors = 0
+        self.elapsed = 0.0
+
+    def add(self, kind, latency, wire, status):
+        self.samples.setdefault(kind, []).append((latency, wire, status))
+
+    def summary(self):
+        out = {}
+        for kind in PAGE_TYPES:
+            rows = self.samples.get(kind)
+            if not rows:
+                continue
+            lat = sorted(r[0] for r in rows)
+            statuses = {}
+            for r in rows:
+                statuses[str(r[2])] = statuses.get(str(r[2]), 0) + 1
+            out[kind] = {
+                "requests": len(rows),
+                "per_second": len(rows) / max(self.elapsed, 1e-9),
+                "p50_ms": percentile(lat, 0.50) * 1000,
+                "p95_ms": percentile(lat, 0.95) * 1000,
+                "p99_ms": percentile(lat, 0.99) * 1000,
+                "avg_bytes": sum(r[1] for r in rows) / len(rows),
+                "statuses": statuses,
+            }
+        total = sum(len(v) for v in self.samples.values())
+        return {"requests": total, "per_second": total / max(self.elapsed, 1e-9), "errors": self.errors,
+                "elapsed_s": self.elapsed, "types": out}
+
+
+def request_headers(site, path, encoding, cache):
+    headers = {"Accept-Encoding": "gzip" if encoding == "gzip" else "identity"}
+    if cache == "warm":
+        entry = site.get(path) or {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+    return headers
+
+
+async def run_load(host, port, use_tls, site, mix, encoding, cache, concurrency, duration, seed=0):
+    """Replay page views for duration seconds with concurrency workers."""
+    pages = {kind: [p for p, e in site.items() if e["type"] == kind and e["status"] == 200] for kind in mix}
+    kinds = [k for k in mix if pages.get(k)]
+    if not kinds:
+        raise SystemExit("No crawled pages match the requested mix.")
+    weights = [mix[k] for k in kinds]
+    results = Results()
+    deadline = time.perf_counter() + duration
+
+    async def worker(i):
+        rng = random.Random(seed * 1000 + i)
+        conn = Connection(host, port, use_tls)
+        try:
+            while time.perf_counter() < deadline:
+                page = rng.choice(pages[rng.choices(kinds, weights)[0]])
+                for path in [page] + site[page]["assets"]:
+                    started = time.perf_counter()
+                    try:
+                        status, _, _, wire = await conn.request(path, request_headers(site, path, encoding, cache))
+                    except (OSError, asyncio.IncompleteReadError, ValueError):
+                        results.errors += 1
+                        conn.close()
+                        continue
+                    kind = site[path]["type"] if path in site else classify(path)
+                    results.add(kind, time.perf_counter() - started, wire, status)
+        finally:
+            conn.close()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(concurrency)))
+    results.elapsed = time.perf_counter() - started
+    return results.summary()
+
+
+def print_summary(label, summary):
+    print(f"\n  {label}: {summary['requests']} requests in {summary['elapsed_s']:.1f}s "
+          f"({summary['per_second']:.0f} req/s, {summary['errors']} errors)")
+    print(f"    {'type':<8} {'requests':>9} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'avg bytes':>10}  statuses")
+    for kind, m in summary["types"].items():
+        statuses = " ".join(f"{k}:{v}" for k, v in sorted(m["statuses"].items()))
+        print(f"    {kind:<8} {m['requests']:>9} {m['per_second']:>8.0f} {m['p50_ms']:>8.2f} "
+              f"{m['p95_ms']:>8.2f} {m['p99_ms']:>8.2f} {m['avg_bytes']:>10.0f}  {statuses}")
+
+
+def start_static_server(directory):
+    """Serve a directory on an ephemeral localhost port in a background thread."""
+    class QuietHandler(http.server.SimpleHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+    handler = functools.partial(QuietHandler, directory=directory)
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(","):
+        kind, _, weight = part.partition("=")
+        if kind not in PAGE_TYPES:
+            raise argparse.ArgumentTypeError(f"unknown page type: {kind}")
+        mix[kind] = float(weight or 1)
+    return mix
+
+
+async def bench(args):
+    base = args.base_url or start_static_server(args.serve)
+    parsed = urllib.parse.urlparse(base)
+    use_tls = parsed.scheme == "https"
+    host, port = parsed.hostname, parsed.port or (443 if use_tls else 80)
+    start = parsed.path or "/"
+
+    conn = Connection(host, port, use_tls)
+    site = await crawl(conn, start, args.max_urls)
+    conn.close()
+    counts = {}
+    for entry in site.values():
+        counts[entry["type"]] = counts.get(entry["type"], 0) + 1
+    print(f"Crawled {len(site)} URLs from {base}: " + ", ".join(f"{k} {v}" for k, v in sorted(counts.items())))
+
+    runs = {}
+    for encoding in args.encodings.split(","):
+        for cache in args.cache.split(","):
+            label = f"{encoding}/{cache}"
+            runs[label] = await run_load(host, port, use_tls, site, args.mix, encoding, cache,
+                                         args.concurrency, args.duration, args.seed)
+            print_summary(label, runs[label])
+
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf-8") as f:
+            json.dump({"base_url": base, "concurrency": args.concurrency, "duration": args.duration,
+                       "mix": args.mix, "runs": runs}, f, indent=1)
+        print(f"\nResults written to {args.json_out}")
+    print("\nDone!")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HTTP load and latency benchmark for the site.")
+    parser.add_argument("base_url", nargs="?", help="site root, e.g. http://localhost:8080")
+    parser.add_argument("--serve", help="serve this directory locally instead of using base_url")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per run")
+    parser.add_argument("--mix", type=parse_mix, default=DEFAULT_MIX,
+                        help="page-view weights, e.g. flow=2,learn=4,report=2,chart=1,page=3")
+    parser.add_argument("--encodings", default="identity,gzip", help="comma list of identity,gzip")
+    parser.add_argument("--cache", default="cold,warm", help="comma list of cold,warm")
+    parser.add_argument("--max-urls", type=int, default=2000, help="crawl limit")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json-out", help="write all runs as JSON")
+    args = parser.parse_args()
+    if not args.base_url and not args.serve:
+        parser.error("give a base_url or --serve DIR")
+    asyncio.run(bench(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+Precompute the strategy-vs-SPY series shown on charts/*.html.
+
+Each chart page fetches its strategy CSV and spydata.csv, merges them by date,
+normalizes SPY to the strategy's first day and re-filters the result on every
+period change. This script does that work once per build: it reads csvPath and
+spyCsvPath from every chart page, merges and normalizes the series exactly as
+the page does, builds the end-of-week and end-of-month tiers behind the period
+buttons, downsamples every tier with largest-triangle-three-buckets (LTTB) to
+at most --max-points, and writes one pre-aligned payload per chart to
+csvfiles/charts/<page>.json. The page loads that payload when it exists and
+falls back to the CSVs otherwise.
+
+Usage:
+    python build-chart-series.py
+    python build-chart-series.py --csv-dir /srv/csvfiles --max-points 800
+"""
+
+import argparse
+import csv
+import glob
+import json
+import os
+import re
+from datetime import date
+
+from date_util import iso_date
+
+WORKSPACE = os.path.dirname(os.path.abspath(__file__))
+CHARTS_DIR = os.path.join(WORKSPACE, "charts")
+CSV_DIR = os.path.join(WORKSPACE, "csvfiles")
+SERIES_SUBDIR = "charts"
+
+MAX_POINTS = 1000
+PERIODS = ("1D", "1W", "1M")    # period buttons with their own tier; "ALL" shows the 1D tier
+DECIMALS = 6
+
+CSV_PATH_RE = re.compile(r"var csvPath = '/csvfiles/([^']+)';")
+SPY_PATH_RE = re.compile(r"var spyCsvPath = '/csvfiles/([^']+)';")
+
+
+def chart_sources(page_path):
+    """(strategy CSV name, SPY CSV name) declared in a chart page, or None."""
+    with open(page_path, "r", encoding="utf-8") as f:
+        html = f.read()
+    strategy, spy = CSV_PATH_RE.search(html), SPY_PATH_RE.search(html)
+    if not strategy or not spy:
+        return None
+    return strategy.group(1), spy.group(1)
+
+
+def read_column(path, column, fallback_index, scale=1.0):
+    """{ISO date: float} for one CSV column, skipping blank and non-numeric cells.
+
+    Dates are normalized so M/D/YYYY and ISO files merge, sort and bucket alike.
+    """
+    values = {}
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        reader = csv.reader(f)
+        header = [h.strip().replace('"', "") for h in next(reader)]
+        idx = header.index(column) if column in header else fallback_index
+        for record in reader:
+            if not record or not record[0].strip():
+                continue
+            try:
+                values[iso_date(record[0])] = float(record[idx]) * scale
+            except (IndexError, ValueError):
+                continue
+    return values
+
+
+def merge_series(strategy, spy):
+    """[(date, strategy, spy)] with SPY normalized to the strategy's first date, as loadComparisonData() does."""
+    dates = sorted(strategy)
+    if not dates or not spy:
+        return []
+    base = spy.get(dates[0])
+    if not base:
+        earlier = [d for d in sorted(spy) if d <= dates[0]]
+        base = spy[earlier[-1]] if earlier else spy[min(spy)]
+    return [(d, strategy[d], (spy[d] - base) / base) for d in dates if spy.get(d)]
+
+
+def _calendar(day):
+    return date(int(day[:4]), int(day[5:7]), int(day[8:10]))
+
+
+def end_of_period(points, key):
+    """Last point of every run of points sharing key(date)."""
+    out = []
+    for i, point in enumerate(points):
+        if i + 1 == len(points) or key(points[i + 1][0]) != key(point[0]):
+            out.append(point)
+    return out
+
+
+def week_key(day):
+    # filterEndOfWeek() pairs the ISO week number with the calendar year
+    d = _calendar(day)
+    return d.year, d.isocalendar()[1]
+
+
+def month_key(day):
+    return day[:7]
+
+
+def lttb_indices(values, threshold):
+    """Indices kept by largest-triangle-three-buckets over evenly spaced x."""
+    n = len(values)
+    if threshold >= n or threshold < 3:
+        return list(range(n))
+    kept = [0]
+    bucket = (n - 2) / (threshold - 2)
+    a = 0
+    for i in range(threshold - 2):
+        start = int(i * bucket) + 1
+        end = int((i + 1) * bucket) + 1
+        next_start, next_end = end, min(int((i + 2) * bucket) + 1, n)
+        avg_x = (next_start + next_end - 1) / 2
+        avg_y = sum(values[next_start:next_end]) / (next_end - next_start)
+        ax, ay = a, values[a]
+        best, best_area = start, -1.0
+        for j in range(start, end):
+            area = abs((ax - avg_x) * (values[j] - ay) - (ax - j) * (avg_y - ay))
+            if area > best_area:
+                best, best_area = j, area
+        kept.append(best)
+        a = best
+    kept.append(n - 1)
+    return kept
+
+
+def downsample(points, max_points):
+    """LTTB on both lines; the union of kept indices keeps the two series aligned."""
+    if len(points) <= max_points:
+        return points
+    # Half the budget per line so the union stays near max_points
+    half = max(max_points // 2, 3)
+    keep = set(lttb_indices([p[1] for p in points], half))
+    keep.update(lttb_indices([p[2] for p in points], half))
+    return [points[i] for i in sorted(keep)]
+
+
+def build_tiers(points, max_points=MAX_POINTS):
+    """{period: {"date": [...], "strategy": [...], "spy": [...]}} matching filterDataByPeriod()."""
+    tiers = {
+        "1D": downsample(points, max_points),
+        "1W": downsample(end_of_period(points, week_key), max_points),
+        "1M": downsample(end_of_period(points, month_key), max_points),
+    }
+    return {
+        period: {
+            "date": [p[0] for p in tier],
+            "strategy": [round(p[1], DECIMALS) for p in tier],
+            "spy": [round(p[2], DECIMALS) for p in tier],
+        }
+        for period, tier in tiers.items()
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute multi-resolution series for charts/*.html.")
+    parser.add_argument("--csv-dir", default=CSV_DIR, help="directory holding the CSVs served under /csvfiles")
+    parser.add_argument("--out", help=f"output directory (default: <csv-dir>/{SERIES_SUBDIR})")
+    parser.add_argument("--max-points", type=int, default=MAX_POINTS, help="points per period tier")
+    args = parser.parse_args()
+
+    out_dir = args.out or os.path.join(args.csv_dir, SERIES_SUBDIR)
+    os.makedirs(out_dir, exist_ok=True)
+    pages = sorted(glob.glob(os.path.join(CHARTS_DIR, "*.html")))
+    print(f"Found {len(pages)} chart pages.\n")
+
+    written = 0
+    for page in pages:
+        name = os.path.splitext(os.path.basename(page))[0]
+        sources = chart_sources(page)
+        if sources is None:
+            print(f"  Skipped: {name} (no csvPath/spyCsvPath)")
+            continue
+        strategy_path, spy_path = (os.path.join(args.csv_dir, s) for s in sources)
+        if not os.path.exists(strategy_path) or not os.path.exists(spy_path):
+            print(f"  Skipped: {name} (missing {sources[0]} or {sources[1]})")
+            continue
+        # Same columns and fallbacks as the page: Cumulative % (index 7) and Close (index 4)
+        points = merge_series(read_column(strategy_path, "Cumulative %", 7, 0.01),
+                              read_column(spy_path, "Close", 4))
+        if not points:
+            print(f"  Skipped: {name} (no overlapping dates)")
+            continue
+        payload = {"chart": name, "strategy_csv": sources[0], "spy_csv": sources[1],
+                   "periods": build_tiers(points, args.max_points)}
+        tmp = os.path.join(out_dir, f"{name}.json.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(payload, f, separators=(",", ":"))
+        os.replace(tmp, os.path.join(out_dir, f"{name}.json"))
+        sizes = ", ".join(f"{p} {len(payload['periods'][p]['date'])}" for p in PERIODS)
+        print(f"  Built: {name} - {len(points)} merged points ({sizes})")
+        written += 1
+
+    print(f"\nDone! Wrote {written} chart series to {out_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+Embed headline metrics and an inline SVG sparkline into every strategy card on
+data-center.html.
+
+All portfolio histories are read and aligned once (portfolio_analytics), the
+metrics for every account come out of a single vectorized pass, and each card
+that links to a report or chart page gets a static summary block: total and
+annualized return, Sharpe ratio, max drawdown and the cumulative-return curve.
+Total, annual, Sharpe and the curve are taken from the CSV's own Cumulative %,
+Annualized % and Sharpe Ratio columns, so the cards match the report pages they
+link to; they are recomputed only for CSVs without those columns. Max drawdown
+is not in the CSVs and is always recomputed.
+The overview then renders with no data fetches. Re-running replaces the blocks
+in place; cards whose CSV is missing keep whatever they had.
+
+Usage:
+    python build-data-center.py
+    python build-data-center.py --csv-dir /srv/csvfiles
+"""
+
+import argparse
+import html
+import json
+import os
+import re
+
+import numpy as np
+
+import portfolio_analytics as pa
+
+WORKSPACE = os.path.dirname(os.path.abspath(__file__))
+PAGE_PATH = os.path.join(WORKSPACE, "data-center.html")
+ACCOUNTS_PATH = os.path.join(WORKSPACE, "reports", "accounts.json")
+CHARTS_DIR = os.path.join(WORKSPACE, "charts")
+
+SPARK_WIDTH, SPARK_HEIGHT = 120, 32
+SPARK_POINTS = 60
+POSITIVE_COLOR, NEGATIVE_COLOR = "#4dbd90", "#f87171"
+
+CARD_RE = re.compile(r'(<a href="(reports|charts)/([\w-]+)\.html"[^>]*>)(.*?)(\n\s*</a>)', re.S)
+SUMMARY_RE = re.compile(r"\n\s*<!-- summary:start -->.*?<!-- summary:end -->", re.S)
+CSV_PATH_RE = re.compile(r"var csvPath = '/csvfiles/([^']+)';")
+REPORTED_COLUMNS = ("Cumulative %", "Annualized %", "Sharpe Ratio")
+
+
+def card_sources():
+    """{("reports" | "charts", page): CSV file name} for every page a card can link to."""
+    sources = {}
+    with open(ACCOUNTS_PATH, "r", encoding="utf-8") as f:
+        for account in json.load(f):
+            sources[("reports", account["page"])] = account["csv"]
+    for name in os.listdir(CHARTS_DIR):
+        if not name.endswith(".html"):
+            continue
+        with open(os.path.join(CHARTS_DIR, name), "r", encoding="utf-8") as f:
+            match = CSV_PATH_RE.search(f.read())
+        if match:
+            sources[("charts", name[:-5])] = match.group(1)
+    return sources
+
+
+def _last(values):
+    values = values[~np.isnan(values)]
+    return float(values[-1]) if len(values) else None
+
+
+def account_summaries(histories):
+    """{account: {metrics..., "curve": cumulative % series}} from one aligned pass over all accounts.
+
+    Report columns loaded with the histories (REPORTED_COLUMNS) override the
+    recomputed values where the CSV fills them in.
+    """
+    dates, names, equity = pa.align(histories, "Equity")
+    _, _, cash_flow = pa.align(histories, "Cash Flow")
+    m = pa.derive_metrics(equity, cash_flow)
+    out = {}
+    for j, name in enumerate(names):
+        rows = np.nonzero(~np.isnan(equity[:, j]))[0]
+        if not len(rows):
+            continue
+        last = rows[-1]
+        out[name] = {
+            "start": str(dates[rows[0]]),
+            "end": str(dates[last]),
+            "total": float(m["Cumulative %"][last, j]),
+            "annualized": float(m["Annualized %"][last, j]),
+            "sharpe": float(m["Sharpe Ratio"][last, j]),
+            "max_drawdown": float(m["Max Drawdown %"][last, j]),
+            "curve": m["Cumulative %"][rows, j],
+        }
+        columns = histories[name]
+        for key, col in (("total", "Cumulative %"), ("annualized", "Annualized %"), ("sharpe", "Sharpe Ratio")):
+            value = _last(columns[col]) if col in columns else None
+            if value is not None:
+                out[name][key] = value
+        curve = columns.get("Cumulative %")
+        if curve is not None and not np.isnan(curve).all():
+            out[name]["curve"] = curve[~np.isnan(curve)]
+    return out
+
+
+def sparkline(curve, width=SPARK_WIDTH, height=SPARK_HEIGHT, points=SPARK_POINTS):
+    """Inline <svg> polyline of a series, with a dashed zero line when it crosses zero."""
+    curve = np.asarray(curve, dtype=float)
+    if len(curve) > points:
+        curve = curve[np.linspace(0, len(curve) - 1, points).round().astype(int)]
+    lo, hi = min(curve.min(), 0.0), max(curve.max(), 0.0)
+    span = hi - lo or 1.0
+    xs = np.linspace(0, width, len(curve)) if len(curve) > 1 else np.array([0.0, width])
+    ys = height - 1 - (curve - lo) / span * (height - 2)
+    if len(curve) == 1:
+        ys = np.repeat(ys, 2)
+    coords = " ".join(f"{x:.1f},{y:.1f}" for x, y in zip(xs, ys))
+    color = POSITIVE_COLOR if curve[-1] >= 0 else NEGATIVE_COLOR
+    zero_y = height - 1 - (0.0 - lo) / span * (height - 2)
+    zero = ""
+    if lo < 0 < hi:
+        zero = (f'<line x1="0" y1="{zero_y:.1f}" x2="{width}" y2="{zero_y:.1f}" '
+                f'stroke="rgba(255,255,255,0.15)" stroke-dasharray="2 2" />')
+    return (f'<svg width="{width}" height="{height}" viewBox="0 0 {width} {height}" '
+            f'class="mx-auto" aria-hidden="true">{zero}<polyline fill="none" stroke="{color}" '
+            f'stroke-width="1.5" points="{coords}" /></svg>')
+
+
+def _pct(value):
+    cls = "text-mt-green" if value >= 0 else "text-red-400"
+    return f'<span class="{cls}">{value:+.2f}%</span>'
+
+
+def summary_block(summary, indent):
+    pad = " " * indent
+    title = html.escape(f"{summary['start']} to {summary['end']}")
+    return "\n".join([
+        f"{pad}<!-- summary:start -->",
+        f'{pad}<div class="mt-3 pt-3 border-t border-white/5" title="{title}">',
+        f"{pad}  {sparkline(summary['curve'])}",
+        f'{pad}  <div class="grid grid-cols-2 gap-x-3 gap-y-0.5 text-xs text-gray-500 mt-2">',
+        f"{pad}    <span>Total {_pct(summary['total'])}</span><span>Annual {_pct(summary['annualized'])}</span>",
+        f'{pad}    <span>Sharpe <span class="text-gray-300">{summary["sharpe"]:.2f}</span></span>'
+        f"<span>Max DD {_pct(summary['max_drawdown'])}</span>",
+        f"{pad}  </div>",
+        f'{pad}  <p class="text-[10px] text-gray-600 mt-1">as of {html.escape(summary["end"])}</p>',
+        f"{pad}</div>",
+        f"{pad}<!-- summary:end -->",
+    ])
+
+
+def embed(page, summaries, sources):
+    """Replace or insert the summary block in every card with data; returns (page, cards updated)."""
+    updated = 0
+
+    def replace(match):
+        nonlocal updated
+        opening, kind, name, body, closing = match.groups()
+        csv_name = sources.get((kind, name))
+        summary = summaries.get(pa.account_name(csv_name)) if csv_name else None
+        if summary is None:
+            return match.group(0)
+        body = SUMMARY_RE.sub("", body)
+        indent = re.match(r"\s*?\n( *)", body)
+        updated += 1
+        return opening + body + "\n" + summary_block(summary, len(indent.group(1)) if indent else 12) + closing
+
+    return CARD_RE.sub(replace, page), updated
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Embed strategy summaries and sparklines into data-center.html.")
+    parser.add_argument("--csv-dir", default=pa.CSV_DIR, help="directory holding alpaca_portfolio_history_*.csv")
+    args = parser.parse_args()
+
+    histories = pa.load_accounts(args.csv_dir, extra=REPORTED_COLUMNS)
+    print(f"Loaded {len(histories)} account histories from {args.csv_dir}.")
+    summaries = account_summaries(histories)
+
+    with open(PAGE_PATH, "r", encoding="utf-8") as f:
+        page = f.read()
+    page, updated = embed(page, summaries, card_sources())
+    with open(PAGE_PATH, "w", encoding="utf-8") as f:
+        f.write(page)
+
+    print(f"\nDone! Embedded summaries in {updated} cards on data-center.html.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+Build date-sharded, columnar JSON feeds from the CSV files served under /csvfiles.
+
+Every alpaca_portfolio_history_*.csv and spydata.csv becomes one feed: rows
+are grouped by year (or month), each group is written as a compact file with
+one typed array per column, and csvfiles/feeds/manifest.json lists every
+shard with its date range, row count and SHA-256. Shard file names carry a
+hash prefix, so a closed year never changes URL and can be cached as
+immutable. A page then fetches the manifest plus only the shards that
+overlap the period it shows (see js/feeds.js), and its load time no longer
+grows with the length of the history.
+
+Unchanged source CSVs (same SHA-256 as in the previous manifest) are skipped.
+
+Usage:
+    python build-data-feeds.py                          # ./csvfiles -> ./csvfiles/feeds
+    python build-data-feeds.py --csv-dir /srv/csvfiles --shard-by month
+"""
+
+import argparse
+import csv
+import glob
+import hashlib
+import json
+import os
+
+from date_util import iso_date
+
+WORKSPACE = os.path.dirname(os.path.abspath(__file__))
+CSV_DIR = os.path.join(WORKSPACE, "csvfiles")
+FEEDS_SUBDIR = "feeds"
+MANIFEST_NAME = "manifest.json"
+
+FEED_PATTERNS = ["alpaca_portfolio_history_*.csv", "spydata.csv"]
+SHARD_KEY_LENGTH = {"year": 4, "month": 7}
+MANIFEST_VERSION = 1
+
+
+def sha256_bytes(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def parse_number(value):
+    value = value.strip().strip('"').replace(",", "")
+    if value == "":
+        return None
+    num = float(value)
+    # JSON numbers are untyped on the client, so 0.00 is written as 0
+    return int(num) if num.is_integer() and abs(num) < 2 ** 53 else num
+
+
+def read_columns(path):
+    """CSV -> (column names, list of rows with Date as ISO string and other fields typed)."""
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        reader = csv.reader(f)
+        header = [h.strip().replace('"', "") for h in next(reader)]
+        rows = []
+        for record in reader:
+            if not record or not record[0].strip():
+                continue
+            record += [""] * (len(header) - len(record))
+            row = [iso_date(record[0])]
+            for value in record[1:len(header)]:
+                try:
+                    row.append(parse_number(value))
+                except ValueError:
+                    row.append(value.strip())
+            rows.append(row)
+    rows.sort(key=lambda r: r[0])
+    # Last row wins for a repeated date, as in the chart pages' de-duplication
+    unique = {}
+    for row in rows:
+        unique[row[0]] = row
+    return header, list(unique.values())
+
+
+def shard_rows(rows, shard_by="year"):
+    """Group date-sorted rows into (period, rows) by the date prefix."""
+    n = SHARD_KEY_LENGTH[shard_by]
+    shards = []
+    for row in rows:
+        period = row[0][:n]
+        if not shards or shards[-1][0] != period:
+            shards.append((period, []))
+        shards[-1][1].append(row)
+    return shards
+
+
+def encode_shard(feed, period, header, rows):
+    """Column-major JSON: {"feed", "period", "columns", "data": [[col0...], [col1...], ...]}."""
+    data = [list(col) for col in zip(*rows)] if rows else [[] for _ in header]
+    doc = {"feed": feed, "period": period, "columns": header, "data": data}
+    return json.dumps(doc, separators=(",", ":")).encode("utf-8")
+
+
+def feed_name(path):
+    return os.path.splitext(os.path.basename(path))[0]
+
+
+def build_feed(path, feeds_dir, shard_by="year"):
+    """Write the shards for one CSV and return its manifest entry."""
+    name = feed_name(path)
+    header, rows = read_columns(path)
+    out_dir = os.path.join(feeds_dir, name)
+    os.makedirs(out_dir, exist_ok=True)
+
+    shards = []
+    keep = set()
+    for period, group in shard_rows(rows, shard_by):
+        payload = encode_shard(name, period, header, group)
+        digest = sha256_bytes(payload)
+        filename = f"{period}.{digest[:12]}.json"
+        keep.add(filename)
+        target = os.path.join(out_dir, filename)
+        if not os.path.exists(target):
+            with open(target, "wb") as f:
+                f.write(payload)
+        shards.append({
+            "period": period,
+            "file": f"{name}/{filename}",
+            "rows": len(group),
+            "first": group[0][0],
+            "last": group[-1][0],
+            "bytes": len(payload),
+            "sha256": digest,
+        })
+
+    # Drop shards superseded by this build
+    for stale in glob.glob(os.path.join(out_dir, "*.json")):
+        if os.path.basename(stale) not in keep:
+            os.remove(stale)
+
+    return {
+        "columns": header,
+        "rows": len(rows),
+        "first": rows[0][0] if rows else None,
+        "last": rows[-1][0] if rows else None,
+        "shards": shards,
+    }
+
+
+def load_manifest(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def write_manifest(path, manifest):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+        f.write("\n")
+    os.replace(tmp, path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build date-sharded columnar feeds from /csvfiles.")
+    parser.add_argument("--csv-dir", default=CSV_DIR, help="directory holding the source CSV files")
+    parser.add_argument("--out", help=f"output directory (default: <csv-dir>/{FEEDS_SUBDIR})")
+    parser.add_argument("--shard-by", choices=sorted(SHARD_KEY_LENGTH), default="year")
+    parser.add_argument("--force", action="store_true", help="rebuild feeds whose source CSV is unchanged")
+    args = parser.parse_args()
+
+    feeds_dir = args.out or os.path.join(args.csv_dir, FEEDS_SUBDIR)
+    os.makedirs(feeds_dir, exist_ok=True)
+    manifest_path = os.path.join(feeds_dir, MANIFEST_NAME)
+    previous = load_manifest(manifest_path)
+    same_layout = previous.get("shard_by") == args.shard_by and previous.get("version") == MANIFEST_VERSION
+    old_feeds = previous.get("feeds", {}) if same_layout else {}
+
+    sources = sorted({p for pattern in FEED_PATTERNS for p in glob.glob(os.path.join(args.csv_dir, pattern))})
+    print(f"Found {len(sources)} CSV files in {args.csv_dir}.\n")
+
+    feeds = {}
+    for path in sources:
+        name = feed_name(path)
+        with open(path, "rb") as f:
+            source_hash = sha256_bytes(f.read())
+        old = old_feeds.get(name)
+        if old and old.get("source_sha256") == source_hash and not args.force:
+            feeds[name] = old
+            print(f"  Unchanged: {name}")
+            continue
+        entry = build_feed(path, feeds_dir, args.shard_by)
+        entry["source"] = os.path.basename(path)
+        entry["source_sha256"] = source_hash
+        feeds[name] = entry
+        print(f"  Built: {name} - {entry['rows']} rows in {len(entry['shards'])} shards")
+
+    write_manifest(manifest_path, {"version": MANIFEST_VERSION, "shard_by": args.shard_by, "feeds": feeds})
+    print(f"\nDone! Manifest written to {manifest_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Render every reports/<page>.html from reports/_template.html and the one-line
+per-account entries in reports/accounts.json.
+
+When the account's portfolio-history CSV is available locally, the stat cards
+and the most recent rows of the table are rendered into the page at build time,
+so first paint does not wait on fetching and parsing the CSV; the page then
+fetches only rows after the build's last date and refreshes the stats, and older
+rows are fetched only when the visitor asks for them. Without a CSV the page falls back
+to loading everything client-side, as before.
+
+Usage:
+    python build-report-pages.py                     # CSVs from ./csvfiles
+    python build-report-pages.py --csv-dir /srv/csvfiles --rows 60
+"""
+
+import argparse
+import csv
+import html
+import json
+import os
+
+from date_util import iso_date
+
+WORKSPACE = os.path.dirname(os.path.abspath(__file__))
+REPORTS_DIR = os.path.join(WORKSPACE, "reports")
+TEMPLATE_PATH = os.path.join(REPORTS_DIR, "_template.html")
+ACCOUNTS_PATH = os.path.join(REPORTS_DIR, "accounts.json")
+CSV_DIR = os.path.join(WORKSPACE, "csvfiles")
+
+RECENT_ROWS = 30
+
+LOADING_STATS = '''        <div class="stat-card-dark" style="grid-column:1/-1;text-align:center;">
+          <h3>Loading...</h3>
+          <p style="font-size:1rem;">Fetching latest portfolio data...</p>
+        </div>'''
+
+
+def load_accounts(path=ACCOUNTS_PATH):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def read_rows(path):
+    """CSV rows as dicts of raw strings, like parseCSV() in the report page."""
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        return [row for row in csv.DictReader(f) if row.get("Date")]
+
+
+# ── formatting (mirrors the report page's JS helpers) ───────────────────
+
+def _num(value):
+    return float(value)
+
+
+def format_currency(value):
+    if not value:
+        return "-"
+    return f"${_num(value):,.2f}"
+
+
+def format_percentage(value):
+    if not value:
+        return "-"
+    return f"{_num(value):.2f}%"
+
+
+def value_class(value):
+    if not value:
+        return "neutral"
+    num = _num(value)
+    if num > 0:
+        return "positive"
+    if num < 0:
+        return "negative"
+    return "neutral"
+
+
+def format_value_with_class(value, is_percentage=False, is_currency=False):
+    if not value:
+        return '<span class="neutral">-</span>'
+    if is_currency:
+        formatted = format_currency(value)
+    elif is_percentage:
+        formatted = format_percentage(value)
+    else:
+        formatted = f"{_num(value):.2f}"
+    return f'<span class="{value_class(value)}">{formatted}</span>'
+
+
+def render_row(row):
+    """One <tr>, identical to buildRow() in the template."""
+    cash_flow = row.get("Cash Flow", "")
+    cls = ' class="highlight-row"' if cash_flow else ""
+    return (
+        f"<tr{cls}>"
+        f"<td>{html.escape(row['Date'])}</td>"
+        f"<td>{format_currency(row.get('Equity', ''))}</td>"
+        f"<td>{format_currency(cash_flow) if cash_flow else '-'}</td>"
+        f"<td>{format_value_with_class(row.get('Daily P/L', ''), is_currency=True)}</td>"
+        f"<td>{format_value_with_class(row.get('Daily %', ''), is_percentage=True)}</td>"
+        f"<td>{format_value_with_class(row.get('Cumulative Profit', ''), is_currency=True)}</td>"
+        f"<td>{format_value_with_class(row.get('Cumulative %', ''), is_percentage=True)}</td>"
+        f"<td>{format_value_with_class(row.get('Annualized %', ''), is_percentage=True)}</td>"
+        f"<td>{format_value_with_class(row.get('Sharpe Ratio', ''))}</td>"
+        "</tr>"
+    )
+
+
+def render_stats(latest):
+    """The five stat cards, identical to displayStats() in the template."""
+    def card(title, body, value=None):
+        cls = "" if value is None else (" positive" if value >= 0 else " negative")
+        return f'        <div class="stat-card-dark{cls}"><h3>{title}</h3><p>{body}</p></div>'
+
+    def num(key):
+        try:
+            return _num(latest.get(key, ""))
+        except ValueError:
+            return 0.0
+
+    cum_profit, cum_pct = num("Cumulative Profit"), num("Cumulative %")
+    ann, sharpe = num("Annualized %"), num("Sharpe Ratio")
+    return "\n".join([
+        card("Current Equity", format_currency(latest.get("Equity", ""))),
+        card("Total Profit", format_currency(latest.get("Cumulative Profit", "")), cum_profit),
+        card("Total Return", format_percentage(latest.get("Cumulative %", "")), cum_pct),
+        card("Annualized Return", format_percentage(latest.get("Annualized %", "")), ann),
+        card("Sharpe Ratio", f"{sharpe:.2f}", sharpe),
+    ])
+
+
+def render_page(template, account, rows=None, recent=RECENT_ROWS):
+    """Fill the template for one account; rows=None leaves all loading to the client."""
+    recent_rows = rows[-recent:] if rows else []
+    older = bool(rows) and len(rows) > len(recent_rows)
+    replacements = {
+        "__TITLE_SHORT__": html.escape(account["code"]),
+        "__H1_TEXT__": html.escape(account["h1"]),
+        "__SUBTITLE__": html.escape(account["subtitle"]),
+        "__CSV_PATH__": f"/csvfiles/{account['csv']}",
+        "__STATS_HTML__": render_stats(rows[-1]) if rows else LOADING_STATS,
+        "__TABLE_ROWS__": "".join(render_row(r) for r in recent_rows),
+        "__LAST_UPDATE__": html.escape(rows[-1]["Date"]) if rows else "",
+        "__PRERENDERED_ROWS__": str(len(recent_rows)),
+        "__FIRST_DATE__": iso_date(recent_rows[0]["Date"]) if recent_rows else "",
+        "__LAST_DATE__": iso_date(rows[-1]["Date"]) if rows else "",
+        "__EARLIER_CLASS__": "" if older else " hidden",
+    }
+    page = template
+    for key, value in replacements.items():
+        page = page.replace(key, value)
+    return page
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate reports/*.html from the report template.")
+    parser.add_argument("--csv-dir", default=CSV_DIR, help="directory holding alpaca_portfolio_history_*.csv")
+    parser.add_argument("--rows", type=int, default=RECENT_ROWS, help="recent table rows to pre-render")
+    args = parser.parse_args()
+
+    with open(TEMPLATE_PATH, "r", encoding="utf-8") as f:
+        template = f.read()
+    accounts = load_accounts()
+    print(f"Found {len(accounts)} accounts in {os.path.relpath(ACCOUNTS_PATH, WORKSPACE)}.\n")
+
+    for account in accounts:
+        csv_path = os.path.join(args.csv_dir, account["csv"])
+        rows = read_rows(csv_path) if os.path.exists(csv_path) else None
+        page = render_page(template, account, rows, args.rows)
+        out_path = os.path.join(REPORTS_DIR, f"{account['page']}.html")
+        with open(out_path, "w", encoding="utf-8") as f:
+            f.write(page)
+        detail = f"{min(len(rows), args.rows)} of {len(rows)} rows pre-rendered" if rows else "client-side only"
+        print(f"  Generated: {account['page']}.html ({account['code']}) - {detail}")
+
+    print(f"\nDone! Generated {len(accounts)} report pages.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Stage only the files the site actually uses into a dist/ directory for the
+production image, and report everything that is left behind.
+
+Every published page (*.html outside templates) is an entry point. From there
+the HTML, CSS, JS and JSON graph is followed: quoted strings, url(...) and
+srcset candidates that resolve to a file in the tree (directly, with .html
+appended as nginx's try_files does, or as a directory index) are reachable.
+Data directories filled at deploy time (csvfiles/) and the learn search shards
+are staged whole since the pages build those paths at runtime. Anything else — unreferenced -p-1080 /
+-p-1600 image variants, build inputs, scripts, the backlog — is reported as an
+orphan and not shipped.
+
+The Dockerfile runs this in its first stage and copies only dist/ into the
+nginx image.
+
+Usage:
+    python build-site-dist.py                     # stage into ./dist and report
+    python build-site-dist.py --dry-run --list    # report only, list every orphan
+    python build-site-dist.py --out /dist --report orphans.json
+"""
+
+import argparse
+import fnmatch
+import json
+import os
+import re
+import shutil
+import urllib.parse
+
+WORKSPACE = os.path.dirname(os.path.abspath(__file__))
+
+# Never shipped, never followed
+EXCLUDE = [".git", ".git/*", "*/__pycache__/*", "__pycache__/*", "*.py", "*.pyc", "*.md", "*.bak",
+           "*.textClipping", ".DS_Store", "*/.DS_Store", ".gitignore", ".dockerignore", "Dockerfile",
+           "docker-compose*.yml", "requests.jsonl", "nginx/*", "dist", "dist/*"]
+# Shipped whole: filled at deploy time and addressed by paths built in JS
+KEEP_DIRS = ["csvfiles", "learn-articles/search"]
+# Absolute URLs on these hosts are site paths too (canonical links, og:image)
+SITE_HOSTS = ("machinetrader.io", "www.machinetrader.io")
+# Shipped when present even if nothing links to them
+ALWAYS = ["404.html", "robots.txt", "sitemap.xml", "favicon.ico", "site.webmanifest"]
+# Files whose contents are scanned for references
+SCAN_EXT = (".html", ".htm", ".css", ".js", ".json", ".svg", ".xml", ".webmanifest", ".txt")
+
+SITE_URL_RE = re.compile(r"https?://([\w.-]+)(/[^\s]*)?$")
+STRING_RE = re.compile(r'"([^"\n]{1,400})"|\'([^\'\n]{1,400})\'|`([^`$\n]{1,400})`|url\(\s*([^)\s]+)\s*\)')
+
+
+def excluded(rel):
+    return any(fnmatch.fnmatch(rel, pattern) for pattern in EXCLUDE)
+
+
+def list_files(root):
+    """Every candidate file as a POSIX path relative to root."""
+    files = set()
+    for dirpath, dirnames, filenames in os.walk(root):
+        rel_dir = os.path.relpath(dirpath, root).replace(os.sep, "/")
+        rel_dir = "" if rel_dir == "." else rel_dir + "/"
+        dirnames[:] = [d for d in dirnames if not excluded(rel_dir + d)]
+        for name in filenames:
+            rel = rel_dir + name
+            if not excluded(rel):
+                files.add(rel)
+    return files
+
+
+def entry_points(files):
+    pages = {f for f in files if f.endswith((".html", ".htm")) and not os.path.basename(f).startswith("_")}
+    return pages | {f for f in ALWAYS if f in files}
+
+
+def candidates(text):
+    """Strings in a file that might be site paths (whole strings plus srcset-style parts)."""
+    for match in STRING_RE.finditer(text):
+        value = next(g for g in match.groups() if g is not None).strip().strip("'\"")
+        yield value
+        if "," in value or " " in value:
+            for part in value.split(","):
+                part = part.strip().split(" ")[0]
+                if part:
+                    yield part
+
+
+def resolve(source, ref, files, dirs):
+    """Tree path a reference in source points at, or None."""
+    match = SITE_URL_RE.match(ref)
+    if match and match.group(1) in SITE_HOSTS:
+        ref = match.group(2) or "/"
+    if not ref or ref.startswith(("#", "data:", "mailto:", "tel:", "javascript:", "//")) or "://" in ref:
+        return None
+    ref = urllib.parse.unquote(ref.split("#", 1)[0].split("?", 1)[0])
+    if not ref:
+        return None
+    if ref.startswith("/"):
+        path = ref.lstrip("/")
+    else:
+        path = os.path.normpath(os.path.join(os.path.dirname(source), ref)).replace(os.sep, "/")
+        if path.startswith("../"):
+            return None
+    path = path.rstrip("/")
+    if path in files:
+        return path
+    if path + ".html" in files:
+        return path + ".html"
+    if (path in dirs or path == "") and (path + "/index.html").lstrip("/") in files:
+        return (path + "/index.html").lstrip("/")
+    return None
+
+
+def reachable(root, files):
+    """Closure of the reference graph from every entry point."""
+    dirs = {os.path.dirname(f) for f in files}
+    dirs |= {d.rsplit("/", i)[0] for d in list(dirs) for i in range(1, d.count("/") + 1)}
+    seen = set(entry_points(files))
+    stack = list(seen)
+    while stack:
+        path = stack.pop()
+        if not path.endswith(SCAN_EXT):
+            continue
+        with open(os.path.join(root, path), "r", encoding="utf-8", errors="replace") as f:
+            text = f.read()
+        for ref in candidates(text):
+            target = resolve(path, ref, files, dirs)
+            if target is not None and target not in seen:
+                seen.add(target)
+                stack.append(target)
+    return seen
+
+
+def size_of(root, paths):
+    return sum(os.path.getsize(os.path.join(root, p)) for p in paths)
+
+
+def stage(root, paths, out):
+    """Copy paths into a fresh out directory."""
+    if os.path.isdir(out):
+        shutil.rmtree(out)
+    for rel in sorted(paths):
+        target = os.path.join(out, rel)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        shutil.copy2(os.path.join(root, rel), target)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stage the reachable site files and report orphans.")
+    parser.add_argument("--root", default=WORKSPACE, help="site source tree")
+    parser.add_argument("--out", default=os.path.join(WORKSPACE, "dist"), help="staging directory (replaced)")
+    parser.add_argument("--dry-run", action="store_true", help="report only, do not stage")
+    parser.add_argument("--list", action="store_true", help="print every orphaned file")
+    parser.add_argument("--report", help="write the orphan list as JSON")
+    args = parser.parse_args()
+
+    root = os.path.abspath(args.root)
+    files = list_files(root)
+    keep = {f for f in files if any(f.startswith(d + "/") for d in KEEP_DIRS)}
+    shipped = reachable(root, files - keep) | keep
+    orphans = sorted(files - shipped)
+
+    total, shipped_bytes = size_of(root, files), size_of(root, shipped)
+    print(f"Scanned {len(files)} files ({total / 1e6:.1f} MB); "
+          f"{len(shipped)} reachable ({shipped_bytes / 1e6:.1f} MB), {len(orphans)} orphaned.")
+
+    by_dir = {}
+    for rel in orphans:
+        d = os.path.dirname(rel) or "."
+        count, size = by_dir.get(d, (0, 0))
+        by_dir[d] = (count + 1, size + os.path.getsize(os.path.join(root, rel)))
+    for d, (count, size) in sorted(by_dir.items(), key=lambda kv: -kv[1][1]):
+        print(f"  {d + '/':<32} {count:>4} orphaned  {size / 1e3:>9.1f} KB")
+    if args.list:
+        for rel in orphans:
+            print(f"    {rel}")
+
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump({"shipped": sorted(shipped), "orphans": orphans,
+                       "shipped_bytes": shipped_bytes, "orphaned_bytes": total - shipped_bytes}, f, indent=1)
+
+    if not args.dry_run:
+        stage(root, shipped, args.out)
+        print(f"\nDone! Staged {len(shipped)} files into {args.out}.")
+    else:
+        print("\nDone! (dry run, nothing staged)")
+
+
+if __name__ == "__main__":
+    main()
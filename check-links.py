@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+"""
+Offline link and asset checker for the generated site.
+
+The converters rewrite links by regex (/learn-articles/... -> ....html,
+/data-center -> ../data-center.html, ...) and nothing verified the result.
+This checker reads every page in the output tree, collects each internal href,
+src, srcset, url(...) and fetch() path (fetch(csvPath) is followed through the
+page's `var csvPath = '...'`), and resolves it the way nginx/default.conf does:
+legacy `return 301` redirects, the .html -> clean URL redirect, try_files
+$uri $uri.html $uri/ for pages and $uri $uri.csv under /csvfiles/. Proxied API
+locations are skipped. #fragments pointing at a page are checked against the
+ids on that page.
+
+Extraction runs in parallel and is cached per page content hash in
+.linkcheck-cache.json, so a re-run only re-parses pages that changed; resolving
+against the current tree is a set lookup per link and is always redone.
+
+Usage:
+    python check-links.py
+    python check-links.py --root dist --data-dir /srv/csvfiles
+    python check-links.py --no-cache -v
+"""
+
+import argparse
+import bisect
+import hashlib
+import json
+import os
+import posixpath
+import re
+import sys
+import time
+import urllib.parse
+from concurrent.futures import ProcessPoolExecutor
+
+WORKSPACE = os.path.dirname(os.path.abspath(__file__))
+NGINX_CONF = os.path.join(WORKSPACE, "nginx", "default.conf")
+CACHE_PATH = os.path.join(WORKSPACE, ".linkcheck-cache.json")
+CACHE_VERSION = 1
+
+SITE_HOSTS = ("machinetrader.io", "www.machinetrader.io")
+SKIP_DIRS = {".git", "__pycache__", "node_modules", "dist"}
+PARALLEL_MIN = 200      # below this many changed pages a process pool costs more than it saves
+
+ATTR_RE = re.compile(r'\b(href|src|poster|action|data-src)\s*=\s*(["\'])(.*?)\2', re.I | re.S)
+SRCSET_RE = re.compile(r'\bsrcset\s*=\s*(["\'])(.*?)\1', re.I | re.S)
+URL_RE = re.compile(r'url\(\s*["\']?([^"\')\s]+)["\']?\s*\)')
+FETCH_LITERAL_RE = re.compile(r'fetch\(\s*(["\'])([^"\'$]+)\1')
+FETCH_VAR_RE = re.compile(r'fetch\(\s*([A-Za-z_$][\w$]*)\s*[,)]')
+STRING_VAR_RE = re.compile(r'\b(?:var|let|const)\s+([A-Za-z_$][\w$]*)\s*=\s*(["\'])([^"\']*)\2\s*;')
+ID_RE = re.compile(r'\b(?:id|name)\s*=\s*["\']([^"\']+)["\']', re.I)
+REDIRECT_RE = re.compile(r'location\s+=\s+(\S+)\s*\{\s*return\s+30[12]\s+(\S+?)\s*;')
+PROXY_RE = re.compile(r'location\s+(?:\^~\s+)?(/\S*)\s*\{[^}]*proxy_pass', re.S)
+
+
+# ── extraction (cached per page hash) ───────────────────────────────────
+
+def line_index(text):
+    """Line number lookup for character offsets."""
+    breaks = [m.start() for m in re.finditer("\n", text)]
+    return lambda pos: bisect.bisect_left(breaks, pos) + 1
+
+
+def extract(path):
+    """(sha, [(ref, line)], [ids]) for one page; runs in worker processes."""
+    with open(path, "rb") as f:
+        raw = f.read()
+    text = raw.decode("utf-8", "replace")
+    line_of = line_index(text)
+    refs = []
+    for m in ATTR_RE.finditer(text):
+        refs.append((m.group(3).strip(), line_of(m.start())))
+    for m in SRCSET_RE.finditer(text):
+        line = line_of(m.start())
+        for candidate in m.group(2).split(","):
+            if candidate.strip():
+                refs.append((candidate.strip().split()[0], line))
+    for m in URL_RE.finditer(text):
+        refs.append((m.group(1), line_of(m.start())))
+    for m in FETCH_LITERAL_RE.finditer(text):
+        refs.append((m.group(2).strip(), line_of(m.start())))
+    variables = {m.group(1): m.group(3) for m in STRING_VAR_RE.finditer(text)}
+    for m in FETCH_VAR_RE.finditer(text):
+        if m.group(1) in variables:
+            refs.append((variables[m.group(1)], line_of(m.start())))
+    ids = sorted(set(ID_RE.findall(text)))
+    return hashlib.sha256(raw).hexdigest(), refs, ids
+
+
+def load_cache(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return cache.get("pages", {}) if cache.get("version") == CACHE_VERSION else {}
+
+
+def save_cache(path, pages):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"version": CACHE_VERSION, "pages": pages}, f, separators=(",", ":"))
+
+
+def quick_key(path):
+    st = os.stat(path)
+    return f"{st.st_mtime_ns}:{st.st_size}"
+
+
+def scan_pages(root, pages, cache, jobs):
+    """{page: {"key", "sha", "refs", "ids"}}; only pages whose content changed are re-parsed."""
+    result, todo = {}, []
+    for page in pages:
+        full = os.path.join(root, page)
+        entry = cache.get(page)
+        if entry and entry["key"] == quick_key(full):
+            result[page] = entry
+            continue
+        todo.append(page)
+
+    fulls = [os.path.join(root, p) for p in todo]
+    if len(todo) >= PARALLEL_MIN and jobs != 1:
+        with ProcessPoolExecutor(max_workers=jobs or None) as pool:
+            extracted = list(pool.map(extract, fulls, chunksize=8))
+    else:
+        extracted = [extract(p) for p in fulls]
+
+    reparsed = 0
+    for page, full, (sha, refs, ids) in zip(todo, fulls, extracted):
+        old = cache.get(page)
+        reparsed += not (old and old["sha"] == sha)
+        result[page] = {"key": quick_key(full), "sha": sha, "refs": refs, "ids": ids}
+    return result, reparsed
+
+
+# ── resolution (nginx rules) ────────────────────────────────────────────
+
+class Site:
+    """Output tree plus the nginx routing rules that apply to it."""
+
+    def __init__(self, root, nginx_conf, data_dir=None):
+        self.root = root
+        self.files = set()
+        for dirpath, dirnames, filenames in os.walk(root):
+            dirnames[:] = [d for d in dirnames if d not in SKIP_DIRS]
+            rel = os.path.relpath(dirpath, root).replace(os.sep, "/")
+            for name in filenames:
+                self.files.add(name if rel == "." else f"{rel}/{name}")
+        self.data_dir = data_dir
+        self.data_files = set()
+        if data_dir:
+            for dirpath, _, filenames in os.walk(data_dir):
+                rel = os.path.relpath(dirpath, data_dir).replace(os.sep, "/")
+                self.data_files.update(name if rel == "." else f"{rel}/{name}" for name in filenames)
+        self.has_data = bool(data_dir) or any(f.startswith("csvfiles/") for f in self.files)
+
+        self.redirects, self.proxies = {}, []
+        if nginx_conf and os.path.exists(nginx_conf):
+            with open(nginx_conf, "r", encoding="utf-8") as f:
+                conf = f.read()
+            self.redirects = dict(REDIRECT_RE.findall(conf))
+            self.proxies = PROXY_RE.findall(conf)
+
+    def page_url(self, page):
+        """URL path a page file is served under (clean URL, directory for index.html)."""
+        if page == "index.html":
+            return "/"
+        if page.endswith("/index.html"):
+            return "/" + page[:-len("index.html")]
+        return "/" + (page[:-5] if page.endswith(".html") else page)
+
+    def exists(self, rel):
+        if rel.startswith("csvfiles/") and self.data_dir:
+            return rel[len("csvfiles/"):] in self.data_files
+        return rel in self.files
+
+    def resolve(self, url_path, hops=0):
+        """("ok" | "skip" | "broken", file path or reason) for an absolute URL path."""
+        if hops > 5:
+            return "broken", "redirect loop"
+        if url_path in self.redirects:
+            target = urllib.parse.urlsplit(self.redirects[url_path])
+            if target.netloc:
+                return "skip", "external redirect"
+            return self.resolve(target.path or "/", hops + 1)
+        if any(url_path.startswith(prefix) for prefix in self.proxies):
+            return "skip", "proxied service"
+        rel = url_path.lstrip("/")
+        if url_path.startswith("/csvfiles/"):
+            if not self.has_data:
+                return "skip", "runtime data"
+            for candidate in (rel, rel + ".csv"):
+                if self.exists(candidate):
+                    return "ok", candidate
+            return "broken", "no such data file"
+        if url_path.endswith(".html") and not url_path.startswith("/components/"):
+            # nginx 301s to the clean URL, which then goes through try_files
+            url_path, rel = url_path[:-5], rel[:-5]
+            if url_path.endswith("/index"):
+                url_path, rel = url_path[:-5], rel[:-5]
+        rel = rel.rstrip("/")
+        candidates = [rel, rel + ".html", (rel + "/index.html").lstrip("/")]
+        if url_path.endswith("/"):
+            candidates = [(rel + "/index.html").lstrip("/")]
+        for candidate in candidates:
+            if candidate and self.exists(candidate):
+                return "ok", candidate
+        return "broken", "no such file"
+
+    def check(self, page, ref, ids_by_page):
+        """(status, detail) for one reference found on page."""
+        if not ref or "${" in ref or ref.startswith(("mailto:", "tel:", "javascript:", "data:", "blob:")):
+            return "skip", "not a link"
+        split = urllib.parse.urlsplit(ref)
+        if split.scheme or split.netloc:
+            if split.scheme in ("http", "https", "") and split.hostname in SITE_HOSTS:
+                split = split._replace(scheme="", netloc="")
+            else:
+                return "skip", "external"
+        base = self.page_url(page)
+        if not split.path:
+            target_page, fragment = page, split.fragment
+        else:
+            url_path = posixpath.normpath(posixpath.join(posixpath.dirname(base + "x"), urllib.parse.unquote(split.path)))
+            if split.path.endswith("/") and not url_path.endswith("/"):
+                url_path += "/"
+            if url_path.startswith("//"):
+                url_path = url_path[1:]
+            status, detail = self.resolve(url_path)
+            if status != "ok":
+                return status, detail
+            target_page, fragment = detail, split.fragment
+        if fragment and target_page in ids_by_page and fragment not in ids_by_page[target_page]:
+            return "broken", f"no #{fragment} on {target_page}"
+        return "ok", target_page
+
+
+def find_pages(root):
+    pages = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = [d for d in dirnames if d not in SKIP_DIRS]
+        rel = os.path.relpath(dirpath, root).replace(os.sep, "/")
+        for name in filenames:
+            if name.endswith(".html") and not name.startswith("_"):
+                pages.append(name if rel == "." else f"{rel}/{name}")
+    return sorted(pages)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check internal links and assets against the output tree.")
+    parser.add_argument("--root", default=WORKSPACE, help="output tree to check (e.g. dist)")
+    parser.add_argument("--nginx-conf", default=NGINX_CONF)
+    parser.add_argument("--data-dir", help="csvfiles directory to check /csvfiles/ paths against")
+    parser.add_argument("--cache", default=CACHE_PATH, help="per-page extraction cache")
+    parser.add_argument("--no-cache", action="store_true", help="re-parse every page")
+    parser.add_argument("--jobs", type=int, default=0, help="worker processes (0 = CPU count, 1 = serial)")
+    parser.add_argument("-v", "--verbose", action="store_true", help="also list skipped references")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    root = os.path.abspath(args.root)
+    site = Site(root, args.nginx_conf, args.data_dir)
+    pages = find_pages(root)
+    cache = {} if args.no_cache else load_cache(args.cache)
+    scanned, reparsed = scan_pages(root, pages, cache, args.jobs)
+    if not args.no_cache:
+        save_cache(args.cache, scanned)
+
+    ids_by_page = {page: set(entry["ids"]) for page, entry in scanned.items()}
+    counts = {"ok": 0, "skip": 0, "broken": 0}
+    broken = []
+    for page in pages:
+        seen = set()
+        for ref, line in scanned[page]["refs"]:
+            if ref in seen:
+                continue
+            seen.add(ref)
+            status, detail = site.check(page, ref, ids_by_page)
+            counts[status] += 1
+            if status == "broken" or (status == "skip" and args.verbose and detail != "external"):
+                broken.append((page, line, ref, status, detail))
+
+    elapsed = time.perf_counter() - started
+    for page, line, ref, status, detail in broken:
+        print(f"{page}:{line}: {status}: {ref} ({detail})")
+    print(f"\nChecked {counts['ok'] + counts['broken']} links on {len(pages)} pages "
+          f"({reparsed} re-parsed) in {elapsed * 1000:.0f} ms: "
+          f"{counts['broken']} broken, {counts['skip']} skipped.")
+    sys.exit(1 if counts["broken"] else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,14 +2,32 @@
 """
 Convert all learn-articles from old Webflow theme to new dark Tailwind theme.
 Extracts unique article content and wraps it in the standard dark template.
+
+Also builds the search index for learn.html (learn-articles/search/): an
+inverted index over title, h2, description and body, sharded by term prefix
+and cached per article, so only changed articles are re-tokenized.
+
+Usage:
+    python convert-learn-articles.py                # convert, then index
+    python convert-learn-articles.py --index-only   # index the current pages
 """
 
+import argparse
+import hashlib
+import json
 import os
 import re
 import html
 
+from image_dimensions import ImageSizes, annotate_images
+
 WORKSPACE = os.path.dirname(os.path.abspath(__file__))
 ARTICLES_DIR = os.path.join(WORKSPACE, "learn-articles")
+SEARCH_DIR = os.path.join(ARTICLES_DIR, "search")
+SEARCH_CACHE = os.path.join(WORKSPACE, ".search-index-cache.json")
+
+# Image header sizes, cached across runs (see image_dimensions.py)
+IMAGE_SIZES = ImageSizes()    # main() turns off remote fetches with --offline
 
 # Map each article file to its category for the sidebar badge
 ARTICLE_CATEGORIES = {
@@ -48,26 +66,36 @@ DEFAULT_DESCRIPTIONS = {
 
 
 def extract_content(filepath):
-    """Extract title, description, h2, and rich-text content from old article."""
+    """Extract title, description, h2, and rich-text content from old article.
+
+    Also reads pages that are already converted (for the search index); the
+    last value tells the two apart so main() does not convert a page twice.
+    """
     with open(filepath, "r", encoding="utf-8") as f:
         content = f.read()
 
     # Extract <title>
     title_match = re.search(r"<title>([^<]+)</title>", content)
-    title = title_match.group(1).strip() if title_match else "Article"
+    title = html.unescape(title_match.group(1).strip()) if title_match else "Article"
 
     # Extract meta description
     desc_match = re.search(r'meta name="description" content="([^"]*)"', content)
-    description = desc_match.group(1).strip() if desc_match else ""
+    description = html.unescape(desc_match.group(1).strip()) if desc_match else ""
 
     # Extract canonical URL
     canon_match = re.search(r'<link href="([^"]*)" rel="canonical"', content)
+    if not canon_match:
+        canon_match = re.search(r'<link rel="canonical" href="([^"]*)"', content)
     canonical = canon_match.group(1).strip() if canon_match else ""
 
     # Extract h2 heading (main-heading_blacl or first h2 in article)
     h2_match = re.search(r'class="main-heading_blacl"[^>]*>([^<]+)', content)
+    hero_match = re.search(r'<h1 class="text-3xl[^"]*">([^<]+)</h1>', content)
     if h2_match:
         h2 = h2_match.group(1).strip()
+    elif hero_match:
+        # Already converted: the h2 was moved into the hero <h1>
+        h2 = html.unescape(hero_match.group(1).strip())
     else:
         h2_match = re.search(r"<h2>([^<]+)</h2>", content)
         h2 = h2_match.group(1).strip() if h2_match else title
@@ -78,8 +106,15 @@ def extract_content(filepath):
         content,
         re.DOTALL,
     )
+    converted_match = re.search(
+        r'<div class="article-content">(.*?)</div>\s*</article>',
+        content,
+        re.DOTALL,
+    )
     if rich_match:
         article_html = rich_match.group(1).strip()
+    elif converted_match:
+        article_html = converted_match.group(1).strip()
     else:
         # For welcome-machinetrader which has simpler structure
         rich_match = re.search(
@@ -89,7 +124,8 @@ def extract_content(filepath):
         )
         article_html = rich_match.group(1).strip() if rich_match else ""
 
-    return title, description, canonical, h2, article_html
+    converted = not rich_match and converted_match is not None
+    return title, description, canonical, h2, article_html, converted
 
 
 def clean_article_html(article_html):
@@ -130,6 +166,8 @@ def clean_article_html(article_html):
     # Remove old width/height from figure images
     article_html = re.sub(r'<figure[^>]*>', '<figure class="my-6">', article_html)
     article_html = re.sub(r'<figcaption>', '<figcaption class="text-sm text-gray-500 mt-2 text-center">', article_html)
+    # Intrinsic width/height so screenshots don't reflow the page; lazy-load below the fold
+    article_html = annotate_images(article_html, ARTICLES_DIR, IMAGE_SIZES)
 
     return article_html
 
@@ -459,12 +497,173 @@ def generate_dark_article(filename, title, description, canonical, h2, article_h
 </html>'''
 
 
+# ── search index ────────────────────────────────────────────────────────
+
+SEARCH_VERSION = 1
+FIELD_WEIGHTS = {"title": 4, "h2": 4, "description": 2, "body": 1}
+BODY_TF_CAP = 8                  # body occurrences counted per term, so long articles don't drown short ones
+SHARD_TARGET_BYTES = 16000       # single-character shards above this are split by two-character prefix
+SNIPPET_BEFORE, SNIPPET_AFTER = 40, 90
+STOPWORDS = set("""
+a an and are as at be been but by can do does for from has have how if in into is it its of on or our
+so such that the their then there these they this to was we were what when which will with you your
+""".split())
+
+
+def plain_text(fragment):
+    """Visible text of an HTML fragment, whitespace collapsed."""
+    fragment = re.sub(r"<(script|style)\b.*?</\1>", " ", fragment, flags=re.DOTALL | re.IGNORECASE)
+    fragment = re.sub(r"<[^>]+>", " ", fragment)
+    text = html.unescape(fragment).replace("\u200d", "")
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def tokenize(text):
+    return [t for t in re.findall(r"[a-z0-9]+", text.lower()) if 2 <= len(t) <= 30 and t not in STOPWORDS]
+
+
+def snippet(text, term):
+    """Short excerpt of text around the first whole-word occurrence of term."""
+    match = re.search(r"(?<![a-z0-9])" + re.escape(term) + r"(?![a-z0-9])", text.lower())
+    if not match:
+        return ""
+    start = max(match.start() - SNIPPET_BEFORE, 0)
+    end = min(match.end() + SNIPPET_AFTER, len(text))
+    if start > 0:
+        start = text.find(" ", start) + 1 or start
+    if end < len(text):
+        cut = text.rfind(" ", match.end(), end)
+        end = cut if cut > 0 else end
+    return ("\u2026" if start > 0 else "") + text[start:end].strip() + ("\u2026" if end < len(text) else "")
+
+
+def article_postings(fields):
+    """{term: [score, snippet]} for one article's title/h2/description/body."""
+    texts = {name: plain_text(fields[name]) for name in FIELD_WEIGHTS}
+    scores = {}
+    for name, weight in FIELD_WEIGHTS.items():
+        counts = {}
+        for term in tokenize(texts[name]):
+            counts[term] = counts.get(term, 0) + 1
+        for term, count in counts.items():
+            count = min(count, BODY_TF_CAP) if name == "body" else 1
+            scores[term] = scores.get(term, 0) + weight * count
+    return {term: [score, snippet(texts["body"], term)] for term, score in scores.items()}
+
+
+def _shard_prefixes(terms):
+    """Term prefix per shard: one character, or two where a one-character shard would be too big."""
+    by_first = {}
+    for term, size in terms.items():
+        by_first.setdefault(term[0], {})[term] = size
+    shards = {}
+    for first, group in by_first.items():
+        if sum(group.values()) <= SHARD_TARGET_BYTES:
+            shards[first] = sorted(group)
+            continue
+        for term in group:
+            shards.setdefault(term[:2], []).append(term)
+    return {prefix: sorted(terms_) for prefix, terms_ in shards.items()}
+
+
+def build_search_index(articles, out_dir=SEARCH_DIR, cache_path=SEARCH_CACHE):
+    """Write manifest.json and prefix shards for articles [(filename, fields, category)].
+
+    Postings are cached per article content hash, so unchanged articles are not
+    re-tokenized; shard files are content-addressed and only written when new.
+    """
+    try:
+        with open(cache_path, "r", encoding="utf-8") as f:
+            cache = json.load(f)
+        if cache.get("version") != SEARCH_VERSION:
+            cache = {}
+    except (OSError, ValueError):
+        cache = {}
+    cached = cache.get("articles", {})
+
+    entries, reindexed = {}, 0
+    for filename, fields, category in articles:
+        key = hashlib.sha256(json.dumps([fields, category], sort_keys=True).encode("utf-8")).hexdigest()
+        entry = cached.get(filename)
+        if not entry or entry["sha"] != key:
+            entry = {"sha": key, "postings": article_postings(fields)}
+            reindexed += 1
+        entries[filename] = entry
+
+    docs, index = [], {}
+    for doc_id, (filename, fields, category) in enumerate(articles):
+        docs.append({
+            "url": f"learn-articles/{filename}",
+            "title": plain_text(fields["h2"]),
+            "category": category,
+            "description": plain_text(fields["description"]),
+        })
+        for term, (score, text) in entries[filename]["postings"].items():
+            index.setdefault(term, []).append([doc_id, score, text])
+
+    sizes = {term: len(json.dumps(postings)) + len(term) for term, postings in index.items()}
+    os.makedirs(out_dir, exist_ok=True)
+    shards, written, keep = {}, 0, {"manifest.json"}
+    for prefix, terms in sorted(_shard_prefixes(sizes).items()):
+        body = json.dumps({"prefix": prefix, "terms": {t: index[t] for t in terms}},
+                          ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        name = f"{prefix}.{hashlib.sha256(body).hexdigest()[:12]}.json"
+        path = os.path.join(out_dir, name)
+        if not os.path.exists(path):
+            with open(path, "wb") as f:
+                f.write(body)
+            written += 1
+        shards[prefix] = {"file": name, "terms": len(terms), "bytes": len(body)}
+        keep.add(name)
+    for name in os.listdir(out_dir):
+        if name not in keep and name.endswith(".json"):
+            os.remove(os.path.join(out_dir, name))
+
+    categories = list(dict.fromkeys(ARTICLE_CATEGORIES.values()))
+    manifest = {
+        "version": SEARCH_VERSION,
+        "docs": docs,
+        "categories": categories,
+        "shards": shards,
+    }
+    with open(os.path.join(out_dir, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, separators=(",", ":"))
+    with open(cache_path, "w", encoding="utf-8") as f:
+        json.dump({"version": SEARCH_VERSION, "articles": entries}, f, separators=(",", ":"))
+    return len(index), len(shards), written, reindexed
+
+
 def main():
+    parser = argparse.ArgumentParser(description="Convert learn-articles to the dark theme and build the search index.")
+    parser.add_argument("--index-only", action="store_true", help="rebuild the search index from the current pages")
+    parser.add_argument("--offline", action="store_true", help="do not fetch remote images (cached sizes still apply)")
+    args = parser.parse_args()
+    IMAGE_SIZES.fetch_remote = not args.offline
+
     files = sorted([f for f in os.listdir(ARTICLES_DIR) if f.endswith(".html")])
-    print(f"Found {len(files)} learn-article files to convert.\n")
+    indexed = []
+
+    if args.index_only:
+        for filename in files:
+            title, description, canonical, h2, article_html, _ = extract_content(os.path.join(ARTICLES_DIR, filename))
+            fields = {"title": title, "h2": h2, "description": description, "body": article_html}
+            indexed.append((filename, fields, ARTICLE_CATEGORIES.get(filename, "General")))
+        files = []
+    else:
+        print(f"Found {len(files)} learn-article files to convert.\n")
 
+    converted = 0
     for filename in files:
         filepath = os.path.join(ARTICLES_DIR, filename)
+        title, description, canonical, h2, article_html, done = extract_content(filepath)
+        category = ARTICLE_CATEGORIES.get(filename, "General")
+
+        # Already in the dark theme: cleaning it again would stack classes and escapes
+        if done:
+            fields = {"title": title, "h2": h2, "description": description, "body": article_html}
+            indexed.append((filename, fields, category))
+            print(f"  Skipped: {filename} (already converted)")
+            continue
 
         # Back up original
         bak_path = filepath + ".bak"
@@ -475,16 +674,12 @@ def main():
                 f.write(orig)
             print(f"  Backed up: {filename} -> {filename}.bak")
 
-        title, description, canonical, h2, article_html = extract_content(filepath)
-
         # Use default description if none found
         if not description and filename in DEFAULT_DESCRIPTIONS:
             description = DEFAULT_DESCRIPTIONS[filename]
         elif not description:
             description = f"{title} - Learn algorithmic trading with MachineTrader."
 
-        category = ARTICLE_CATEGORIES.get(filename, "General")
-
         new_html = generate_dark_article(
             filename, title, description, canonical, h2, article_html, category
         )
@@ -492,9 +687,20 @@ def main():
         with open(filepath, "w", encoding="utf-8") as f:
             f.write(new_html)
 
+        fields = {"title": title, "h2": h2, "description": description, "body": article_html}
+        indexed.append((filename, fields, category))
+        converted += 1
         print(f"  Converted: {filename} ({category}) - {h2}")
 
-    print(f"\nDone! Converted {len(files)} learn-article files.")
+    IMAGE_SIZES.save()
+    terms, shards, written, reindexed = build_search_index(indexed)
+    print(f"  Search index: {len(indexed)} articles ({reindexed} re-indexed), "
+          f"{terms} terms in {shards} shards ({written} written)")
+
+    if args.index_only:
+        print(f"\nDone! Indexed {len(indexed)} learn-article files.")
+    else:
+        print(f"\nDone! Converted {converted} learn-article files ({len(files) - converted} already converted).")
 
 
 if __name__ == "__main__":
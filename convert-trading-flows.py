@@ -4,12 +4,18 @@ Convert all trading-flows pages from old Webflow theme to new dark Tailwind them
 Extracts unique content + custom CSS, adapts for dark, wraps in standard template.
 """
 
+import argparse
 import os
 import re
 
+from image_dimensions import ImageSizes, annotate_images
+
 WORKSPACE = os.path.dirname(os.path.abspath(__file__))
 FLOWS_DIR = os.path.join(WORKSPACE, "trading-flows")
 
+# Image header sizes, cached across runs (see image_dimensions.py)
+IMAGE_SIZES = ImageSizes()    # main() turns off remote fetches with --offline
+
 # ── metadata per flow page ──────────────────────────────────────────────
 FLOW_META = {
     "bear-call-spread-flow.html": {
@@ -268,6 +274,9 @@ def extract_main_content(content):
     main_html = re.sub(r'href="/data-center"', 'href="../data-center.html"', main_html)
     main_html = re.sub(r'href="/learn"', 'href="../learn.html"', main_html)
 
+    # Intrinsic width/height and lazy loading for any screenshots in the flow write-up
+    main_html = annotate_images(main_html, FLOWS_DIR, IMAGE_SIZES)
+
     return main_html
 
 
@@ -847,6 +856,11 @@ def generate_index_page():
 
 
 def main():
+    parser = argparse.ArgumentParser(description="Convert trading-flows to the dark theme.")
+    parser.add_argument("--offline", action="store_true", help="do not fetch remote images (cached sizes still apply)")
+    args = parser.parse_args()
+    IMAGE_SIZES.fetch_remote = not args.offline
+
     files = sorted([f for f in os.listdir(FLOWS_DIR) if f.endswith(".html")])
     print(f"Found {len(files)} trading-flows files to convert.\n")
 
@@ -886,6 +900,7 @@ def main():
 
         print(f"  Converted: {filename} — {meta['h1']}")
 
+    IMAGE_SIZES.save()
     print(f"\nDone! Converted {len(files)} trading-flows files.")
 
 
@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+"""
+Date parsing shared by the /csvfiles tools and services.
+
+The portfolio-history and SPY CSVs carry ISO dates in some exports and
+M/D/YYYY (or M/D/YY) in others; the chart pages accept both, so everything
+that reads those files in Python normalizes through iso_date() first.
+parse_time() turns Alpaca timestamps (orders, bars, trades) into epoch seconds.
+"""
+
+import re
+from datetime import datetime, timezone
+
+
+def iso_date(value):
+    """YYYY-MM-DD for the date formats found in the CSVs (ISO, M/D/YY, M/D/YYYY)."""
+    value = value.strip().strip('"')
+    if len(value) >= 10 and value[4] == "-":
+        return value[:10]
+    for fmt in ("%m/%d/%Y", "%m/%d/%y"):
+        try:
+            return datetime.strptime(value, fmt).strftime("%Y-%m-%d")
+        except ValueError:
+            pass
+    raise ValueError(f"unrecognized date: {value!r}")
+
+
+def parse_time(value):
+    """Epoch seconds from an ISO-8601 timestamp (Alpaca's filled_at, bar "t") or a number."""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        pass
+    text = str(value).strip().replace("Z", "+00:00")
+    # Alpaca sends nanosecond fractions; fromisoformat takes at most six digits
+    text = re.sub(r"(\.\d{6})\d+", r"\1", text)
+    stamp = datetime.fromisoformat(text)
+    if stamp.tzinfo is None:
+        stamp = stamp.replace(tzinfo=timezone.utc)
+    return stamp.timestamp()
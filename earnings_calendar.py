@@ -0,0 +1,334 @@
+#!/usr/bin/env python3
+"""
+Earnings-calendar store for the daily earnings-call strategy.
+
+strategies/trading-on-daily-earnings-calls.html fetches the NASDAQ earnings
+calendar at 3:30 AM and tracks every name on it from 4:00 AM. This module
+ingests calendar snapshots (NASDAQ api/calendar/earnings responses saved as
+JSON files) into an EarningsStore indexed by date, symbol and timing:
+
+  * timing is "bmo" (time-pre-market), "amc" (time-after-hours) or "unknown";
+  * a snapshot is authoritative for its date, so a newer snapshot replaces
+    that day's list (names dropped from it are removed) and an older one is
+    ignored; a name that moves to another date in a newer snapshot leaves its
+    old date, so each symbol is listed once;
+  * snapshot files already ingested are skipped by size and mtime, so the
+    3:30 AM job only parses what changed.
+
+tradable() answers "today's names" for the session: before-open reporters of
+the day plus, optionally, after-close reporters of the previous weekday, kept
+when they pass the market-cap, price, volume and dollar-volume filters
+(latest barsonemonth row per symbol, as exported by the monthly-bars flow) and
+are tradable (and, for the short side, shortable) in the assetsTradable list.
+
+Usage:
+    python earnings_calendar.py fixtures/earnings --day 2026-01-30
+    python earnings_calendar.py fixtures/earnings --day 2026-01-30 --bars barsonemonth.csv \\
+        --assets assets.json --min-price 5 --min-dollar-volume 1e8 --state earnings-store.json
+    python earnings_calendar.py /tmp/earnings --generate 3000 --day 2026-01-30
+"""
+
+import argparse
+import csv
+import glob
+import json
+import os
+import random
+import time
+from datetime import date, datetime, timedelta
+
+TIMINGS = {"time-pre-market": "bmo", "time-after-hours": "amc", "time-not-supplied": "unknown"}
+
+MIN_PRICE = 5.0                  # the strategy buys $10,000 per name; skip penny stocks
+MIN_DOLLAR_VOLUME = 1e8          # monthly close * volume (barsonemonth.marketvalue)
+
+
+def _money(value):
+    """$1,234.56 / (1.20) / N/A -> float or None."""
+    if value is None:
+        return None
+    text = str(value).strip().replace("$", "").replace(",", "")
+    negative = text.startswith("(") and text.endswith(")")
+    text = text.strip("()")
+    try:
+        number = float(text)
+    except ValueError:
+        return None
+    return -number if negative else number
+
+
+def _day(value):
+    """YYYY-MM-DD, M/D/YYYY or NASDAQ's "Fri, Jan 30, 2026" -> date."""
+    if isinstance(value, date):
+        return value
+    text = str(value).strip()
+    for fmt in ("%Y-%m-%d", "%m/%d/%Y", "%a, %b %d, %Y", "%b %d, %Y"):
+        try:
+            return datetime.strptime(text, fmt).date()
+        except ValueError:
+            continue
+    raise ValueError(f"unrecognized date: {value!r}")
+
+
+def previous_weekday(day):
+    day -= timedelta(days=1)
+    while day.weekday() >= 5:
+        day -= timedelta(days=1)
+    return day
+
+
+def parse_snapshot(doc):
+    """(date, events) from a NASDAQ earnings-calendar response; events are dicts keyed by field."""
+    data = doc.get("data") or {}
+    when = doc.get("date") or data.get("asOf")
+    if not when:
+        raise ValueError("snapshot has neither a date nor data.asOf")
+    events = []
+    for row in data.get("rows") or []:
+        symbol = (row.get("symbol") or "").strip().upper()
+        if not symbol:
+            continue
+        events.append({
+            "symbol": symbol,
+            "name": row.get("name", ""),
+            "timing": TIMINGS.get(row.get("time"), "unknown"),
+            "market_cap": _money(row.get("marketCap")),
+            "eps_forecast": _money(row.get("epsForecast")),
+            "estimates": int(row["noOfEsts"]) if str(row.get("noOfEsts", "")).isdigit() else None,
+            "fiscal_quarter": row.get("fiscalQuarterEnding", ""),
+        })
+    return _day(when), events
+
+
+# ── store ───────────────────────────────────────────────────────────────
+
+class EarningsStore:
+    """Latest revision of every day's calendar, indexed by date and symbol."""
+
+    def __init__(self):
+        self.by_date = {}       # YYYY-MM-DD -> {symbol: event}
+        self.revision = {}      # YYYY-MM-DD -> fetched_at of the snapshot it came from
+        self.where = {}         # symbol -> [YYYY-MM-DD, fetched_at]
+        self.files = {}         # snapshot path -> [size, mtime]
+
+    def ingest(self, day, events, fetched_at):
+        """Apply one day's snapshot; returns {"added", "updated", "removed", "moved", "stale"} counts."""
+        day = _day(day).isoformat()
+        counts = dict.fromkeys(("added", "updated", "removed", "moved", "stale"), 0)
+        if fetched_at < self.revision.get(day, float("-inf")):
+            counts["stale"] = 1
+            return counts
+        old = self.by_date.get(day, {})
+        new = {}
+        for event in events:
+            symbol = event["symbol"]
+            listed = self.where.get(symbol)
+            if listed and listed[0] != day:
+                if listed[1] > fetched_at:
+                    continue        # a newer snapshot already put it on another date
+                self.by_date.get(listed[0], {}).pop(symbol, None)
+                counts["moved"] += 1
+            elif symbol not in old:
+                counts["added"] += 1
+            elif old[symbol] != event:
+                counts["updated"] += 1
+            new[symbol] = event
+            self.where[symbol] = [day, fetched_at]
+        for symbol in old:
+            if symbol not in new and self.where.get(symbol, [None])[0] == day:
+                del self.where[symbol]
+                counts["removed"] += 1
+        self.by_date[day] = new
+        self.revision[day] = fetched_at
+        return counts
+
+    def ingest_dir(self, directory):
+        """Ingest every new or changed *.json snapshot in a directory, oldest revision first."""
+        pending = []
+        for path in glob.glob(os.path.join(directory, "*.json")):
+            stat = os.stat(path)
+            if self.files.get(path) == [stat.st_size, stat.st_mtime]:
+                continue
+            with open(path, "r", encoding="utf-8") as f:
+                doc = json.load(f)
+            day, events = parse_snapshot(doc)
+            pending.append((float(doc.get("fetchedAt") or stat.st_mtime), day, events, path, stat))
+        totals = dict.fromkeys(("files", "added", "updated", "removed", "moved", "stale"), 0)
+        for fetched_at, day, events, path, stat in sorted(pending, key=lambda p: p[0]):
+            for key, n in self.ingest(day, events, fetched_at).items():
+                totals[key] += n
+            self.files[path] = [stat.st_size, stat.st_mtime]
+            totals["files"] += 1
+        return totals
+
+    def on(self, day, timing=None):
+        """Events reported on one date, optionally only one timing."""
+        events = self.by_date.get(_day(day).isoformat(), {}).values()
+        return [e for e in events if timing is None or e["timing"] == timing]
+
+    def symbol(self, symbol):
+        """(date, event) the symbol is currently listed on, or None."""
+        listed = self.where.get(symbol.upper())
+        return None if listed is None else (listed[0], self.by_date[listed[0]][symbol.upper()])
+
+    def tradable(self, day, prior_after_close=True, include_unknown=False, min_market_cap=0.0,
+                 min_price=MIN_PRICE, min_volume=0.0, min_dollar_volume=MIN_DOLLAR_VOLUME,
+                 bars=None, assets=None, side="long"):
+        """Names moving in day's session that pass the liquidity filters, largest market cap first.
+
+        bars is {symbol: {"close", "volume", "dollar_volume"}} (load_monthly_bars) and
+        assets {symbol: asset} (load_assets); without them those filters are skipped.
+        """
+        day = _day(day)
+        timings = ("bmo", "unknown") if include_unknown else ("bmo",)
+        picks = [dict(e, date=day.isoformat()) for e in self.on(day) if e["timing"] in timings]
+        if prior_after_close:
+            prior = previous_weekday(day).isoformat()
+            picks += [dict(e, date=prior) for e in self.on(prior, "amc")]
+
+        out = []
+        for event in picks:
+            symbol = event["symbol"]
+            if min_market_cap and (event["market_cap"] or 0.0) < min_market_cap:
+                continue
+            if assets is not None:
+                asset = assets.get(symbol)
+                if not asset or not asset.get("tradable", True) or asset.get("status", "active") != "active":
+                    continue
+                if side == "short" and not asset.get("shortable"):
+                    continue
+            if bars is not None:
+                bar = bars.get(symbol)
+                if bar is None or bar["close"] < min_price or bar["volume"] < min_volume \
+                        or bar["dollar_volume"] < min_dollar_volume:
+                    continue
+                event = dict(event, close=bar["close"], dollar_volume=bar["dollar_volume"])
+            out.append(event)
+        out.sort(key=lambda e: -(e["market_cap"] or 0.0))
+        return out
+
+    def to_dict(self):
+        return {"by_date": self.by_date, "revision": self.revision, "where": self.where, "files": self.files}
+
+    @classmethod
+    def from_dict(cls, data):
+        store = cls()
+        for key in ("by_date", "revision", "where", "files"):
+            setattr(store, key, data.get(key, {}))
+        return store
+
+    def save(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "r", encoding="utf-8") as f:
+            return cls.from_dict(json.load(f))
+
+
+# ── liquidity inputs ────────────────────────────────────────────────────
+
+def load_monthly_bars(path):
+    """Latest barsonemonth row per symbol: {symbol: {"close", "volume", "dollar_volume", "date"}}."""
+    latest = {}
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        for row in csv.DictReader(f):
+            symbol = (row.get("symbol") or "").strip().upper()
+            close, volume = _money(row.get("close")), _money(row.get("volume"))
+            if not symbol or close is None or volume is None:
+                continue
+            stamp = (row.get("date") or "")[:10]
+            if symbol in latest and latest[symbol]["date"] >= stamp:
+                continue
+            value = _money(row.get("marketvalue"))
+            latest[symbol] = {"close": close, "volume": volume,
+                              "dollar_volume": value if value is not None else close * volume, "date": stamp}
+    return latest
+
+
+def load_assets(path):
+    """{symbol: asset} from a GET /v2/assets response (the assetsTradable global)."""
+    with open(path, "r", encoding="utf-8") as f:
+        return {a["symbol"].upper(): a for a in json.load(f) if a.get("symbol")}
+
+
+# ── synthetic fixtures ──────────────────────────────────────────────────
+
+def write_fixtures(directory, day, names_per_day=3000, days=5, revisions=2, seed=0):
+    """NASDAQ-shaped snapshots around day, each date written revisions times with some names moved or dropped."""
+    rng = random.Random(seed)
+    os.makedirs(directory, exist_ok=True)
+    universe = sorted({"".join(rng.choice("ABCDEFGHIJKLMNOPQRSTUVWXYZ") for _ in range(rng.randint(2, 4)))
+                       for _ in range(names_per_day * days * 2)})
+    day = _day(day)
+    dates = [day]
+    while len(dates) < days:
+        dates.insert(0, previous_weekday(dates[0]))
+    fetched = time.time() - 86400
+    rng.shuffle(universe)
+    written = 0
+    for i, d in enumerate(dates):
+        names = universe[i * names_per_day:(i + 1) * names_per_day]
+        for r in range(revisions):
+            if r:
+                names = [n for n in names if rng.random() > 0.02]   # a few cancel or move out
+            rows = [{"symbol": n, "name": f"{n} Corp.", "time": rng.choice(list(TIMINGS)),
+                     "marketCap": f"${rng.lognormvariate(21, 2):,.0f}", "epsForecast": f"${rng.uniform(-1, 4):.2f}",
+                     "noOfEsts": str(rng.randint(1, 30)), "fiscalQuarterEnding": "Dec/2025"} for n in names]
+            doc = {"fetchedAt": fetched + i * 3600 + r * 60,
+                   "data": {"asOf": d.strftime("%a, %b %d, %Y"), "rows": rows}}
+            with open(os.path.join(directory, f"{d.isoformat()}.r{r}.json"), "w", encoding="utf-8") as f:
+                json.dump(doc, f)
+            written += 1
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingest earnings-calendar snapshots and list the day's tradable names.")
+    parser.add_argument("snapshots", help="directory of NASDAQ earnings-calendar JSON snapshots")
+    parser.add_argument("--day", default=date.today().isoformat(), help="trading day (YYYY-MM-DD)")
+    parser.add_argument("--state", help="store file: loaded if present, saved afterwards")
+    parser.add_argument("--bars", help="barsonemonth CSV export for the price and volume filters")
+    parser.add_argument("--assets", help="GET /v2/assets JSON (assetsTradable) for the tradable filter")
+    parser.add_argument("--side", choices=("long", "short"), default="long")
+    parser.add_argument("--min-market-cap", type=float, default=0.0)
+    parser.add_argument("--min-price", type=float, default=MIN_PRICE)
+    parser.add_argument("--min-volume", type=float, default=0.0, help="monthly share volume")
+    parser.add_argument("--min-dollar-volume", type=float, default=MIN_DOLLAR_VOLUME, help="monthly close * volume")
+    parser.add_argument("--no-prior-amc", action="store_true", help="leave out the previous day's after-close names")
+    parser.add_argument("--include-unknown", action="store_true", help="also list names without a reported time")
+    parser.add_argument("--generate", type=int, metavar="N", help="first write synthetic snapshots, N names per day")
+    parser.add_argument("--top", type=int, default=20, help="names to print")
+    args = parser.parse_args()
+
+    if args.generate:
+        print(f"  Wrote {write_fixtures(args.snapshots, args.day, args.generate)} synthetic snapshots.")
+    store = EarningsStore.load(args.state) if args.state and os.path.exists(args.state) else EarningsStore()
+
+    started = time.perf_counter()
+    totals = store.ingest_dir(args.snapshots)
+    ingest_ms = (time.perf_counter() - started) * 1000
+    print(f"  Ingested {totals['files']} snapshots in {ingest_ms:.1f} ms: {totals['added']} added, "
+          f"{totals['updated']} updated, {totals['moved']} moved, {totals['removed']} removed, "
+          f"{totals['stale']} stale; {len(store.where)} names on {len(store.by_date)} dates.")
+
+    bars = load_monthly_bars(args.bars) if args.bars else None
+    assets = load_assets(args.assets) if args.assets else None
+    started = time.perf_counter()
+    names = store.tradable(args.day, prior_after_close=not args.no_prior_amc, include_unknown=args.include_unknown,
+                           min_market_cap=args.min_market_cap, min_price=args.min_price, min_volume=args.min_volume,
+                           min_dollar_volume=args.min_dollar_volume, bars=bars, assets=assets, side=args.side)
+    query_ms = (time.perf_counter() - started) * 1000
+    print(f"  {len(names)} tradable names for {args.day} in {query_ms:.2f} ms\n")
+    for e in names[:args.top]:
+        cap = f"${e['market_cap'] / 1e9:,.1f}B" if e["market_cap"] else "n/a"
+        print(f"    {e['symbol']:<6} {e['timing']:<7} {e['date']}  cap {cap:>10}  {e['name'][:40]}")
+
+    if args.state:
+        store.save(args.state)
+    print(f"\nDone! {len(names)} names ready for the 4:00 AM tracker.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+"""
+Range-query API over the portfolio histories and SPY series in /csvfiles.
+
+nginx can only hand out whole CSV files. This service keeps every
+alpaca_portfolio_history_*.csv and spydata.csv indexed by date in memory and
+answers date-window queries, so a page receives exactly the rows it displays:
+
+    GET /api/history/                                   series list with date ranges
+    GET /api/history/<series>?from=&to=&fields=&format= rows with from <= Date <= to
+
+<series> is the CSV name without .csv (as in build-data-feeds.py). from and to
+take ISO or M/D/YYYY dates (400 otherwise); rows whose first field is not a
+date are skipped, and a file that cannot be read answers 500. fields is a
+comma-separated column list (Date is always included); format is "json"
+(columnar, like the feeds) or "csv". Responses carry an ETag derived from the
+file version and the query, are gzip-compressed when the client accepts it and
+are kept in a small LRU, so repeated windows are served straight from memory.
+A file is re-read when its mtime changes (checked at most once per second).
+
+Usage:
+    python history_api.py --csv-dir csvfiles --port 8091
+"""
+
+import argparse
+import asyncio
+import bisect
+import csv
+import glob
+import gzip
+import hashlib
+import io
+import json
+import os
+import time
+from collections import OrderedDict
+from date_util import iso_date
+from http_util import read_request, send
+
+WORKSPACE = os.path.dirname(os.path.abspath(__file__))
+CSV_DIR = os.path.join(WORKSPACE, "csvfiles")
+ROUTE_PREFIX = "/api/history/"
+SERIES_PATTERNS = ["alpaca_portfolio_history_*.csv", "spydata.csv"]
+
+STAT_INTERVAL = 1.0       # seconds between mtime checks per file
+CACHE_SIZE = 512          # encoded responses kept in memory
+MIN_GZIP_BYTES = 512
+
+
+def _value(text):
+    text = text.strip().strip('"').replace(",", "")
+    if text == "":
+        return None
+    try:
+        return float(text)
+    except ValueError:
+        return text
+
+
+class Series:
+    """One CSV held column-wise with a sorted date index."""
+
+    def __init__(self, path):
+        self.path = path
+        self.name = os.path.splitext(os.path.basename(path))[0]
+        self.version = None
+        self.checked = 0.0
+        self.columns = []
+        self.dates = []
+        self.data = {}
+
+    def refresh(self, now=None):
+        """Re-read the file if its mtime or size changed since the last load."""
+        now = time.monotonic() if now is None else now
+        if self.version is not None and now - self.checked < STAT_INTERVAL:
+            return False
+        self.checked = now
+        st = os.stat(self.path)
+        version = f"{st.st_mtime_ns:x}-{st.st_size:x}"
+        if version == self.version:
+            return False
+        self.load()
+        self.version = version
+        return True
+
+    def load(self):
+        with open(self.path, "r", encoding="utf-8", newline="") as f:
+            reader = csv.reader(f)
+            first = next(reader, None)
+            if not first:
+                raise ValueError(f"{self.name}: no header row")
+            header = [h.strip().replace('"', "") for h in first]
+            by_date, skipped = {}, 0
+            for record in reader:
+                if not record or not record[0].strip():
+                    continue
+                try:
+                    date = iso_date(record[0])
+                except ValueError:
+                    skipped += 1          # footer/total rows and the like
+                    continue
+                record += [""] * (len(header) - len(record))
+                by_date[date] = [_value(v) for v in record[1:len(header)]]
+        if skipped:
+            print(f"  {self.name}: skipped {skipped} rows without a date")
+        self.columns = header
+        self.dates = sorted(by_date)
+        self.data = {col: [by_date[d][i] for d in self.dates] for i, col in enumerate(header[1:])}
+
+    def window(self, start=None, end=None):
+        """Index range [i, j) of rows with start <= Date <= end."""
+        i = bisect.bisect_left(self.dates, start) if start else 0
+        j = bisect.bisect_right(self.dates, end) if end else len(self.dates)
+        return i, max(i, j)
+
+    def info(self):
+        return {
+            "columns": self.columns,
+            "rows": len(self.dates),
+            "first": self.dates[0] if self.dates else None,
+            "last": self.dates[-1] if self.dates else None,
+        }
+
+
+def encode_json(series, fields, i, j):
+    data = [series.dates[i:j]] + [series.data[f][i:j] for f in fields]
+    doc = {"series": series.name, "columns": ["Date"] + fields, "data": data}
+    return json.dumps(doc, separators=(",", ":")).encode("utf-8"), "application/json"
+
+
+def encode_csv(series, fields, i, j):
+    buf = io.StringIO()
+    writer = csv.writer(buf, lineterminator="\n")
+    writer.writerow(["Date"] + fields)
+    columns = [series.data[f] for f in fields]
+    for k in range(i, j):
+        writer.writerow([series.dates[k]] + ["" if c[k] is None else (repr(c[k]) if isinstance(c[k], float) else c[k])
+                                             for c in columns])
+    return buf.getvalue().encode("utf-8"), "text/csv"
+
+
+ENCODERS = {"json": encode_json, "csv": encode_csv}
+
+
+class HistoryAPI:
+    """Serves date-window queries over every series CSV in csv_dir."""
+
+    def __init__(self, csv_dir=CSV_DIR, cache_size=CACHE_SIZE):
+        self.csv_dir = csv_dir
+        self.cache_size = cache_size
+        self.series = {}
+        self.cache = OrderedDict()    # (name, version, start, end, fields, format, gzip) -> (etag, body, type)
+        self.requests = 0
+        self.scan()
+
+    def scan(self):
+        """Pick up new CSV files (existing ones are refreshed on demand)."""
+        paths = {p for pattern in SERIES_PATTERNS for p in glob.glob(os.path.join(self.csv_dir, pattern))}
+        for path in paths:
+            name = os.path.splitext(os.path.basename(path))[0]
+            if name not in self.series:
+                self.series[name] = Series(path)
+        for name in [n for n, s in self.series.items() if s.path not in paths]:
+            del self.series[name]
+
+    def get(self, name):
+        """The named series, refreshed; None if it does not exist. Raises if it cannot be read."""
+        series = self.series.get(name)
+        if series is None:
+            self.scan()
+            series = self.series.get(name)
+        if series is None:
+            return None
+        try:
+            series.refresh()
+        except FileNotFoundError:
+            del self.series[name]
+            return None
+        return series
+
+    def query(self, series, params, accept_gzip):
+        """(status, etag, body, content type, gzipped) for one query."""
+        start = (params.get("from") or [""])[0].strip()
+        end = (params.get("to") or [""])[0].strip()
+        try:
+            start = iso_date(start) if start else ""
+            end = iso_date(end) if end else ""
+        except ValueError:
+            return 400, None, b"", "text/plain", False
+        fmt = (params.get("format") or ["json"])[0]
+        requested = [f for f in ",".join(params.get("fields") or []).split(",") if f and f != "Date"]
+        fields = requested or series.columns[1:]
+        if fmt not in ENCODERS or any(f not in series.data for f in fields):
+            return 400, None, b"", "text/plain", False
+
+        key = (series.name, series.version, start, end, tuple(fields), fmt, accept_gzip)
+        hit = self.cache.get(key)
+        if hit is None:
+            i, j = series.window(start or None, end or None)
+            body, content_type = ENCODERS[fmt](series, fields, i, j)
+            etag = '"' + hashlib.sha256(repr(key).encode()).hexdigest()[:20] + '"'
+            gzipped = accept_gzip and len(body) >= MIN_GZIP_BYTES
+            if gzipped:
+                body = gzip.compress(body, compresslevel=6, mtime=0)
+            hit = (etag, body, content_type, gzipped)
+            self.cache[key] = hit
+            if len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+        else:
+            self.cache.move_to_end(key)
+        return (200,) + hit
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                request = await read_request(reader)
+                if request is None:
+                    break
+                await self.route(*request, writer)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def route(self, method, path, params, headers, writer):
+        self.requests += 1
+        cors = {"Access-Control-Allow-Origin": "*"}
+        if method not in ("GET", "HEAD"):
+            await send(writer, 405, headers={**cors, "Allow": "GET, HEAD"})
+            return
+        if not (path + "/").startswith(ROUTE_PREFIX):
+            await send(writer, 404, headers=cors)
+            return
+        name = path[len(ROUTE_PREFIX):].strip("/")
+
+        if not name:
+            self.scan()
+            listing = {}
+            for n in sorted(self.series):
+                try:
+                    series = self.get(n)
+                except (OSError, ValueError) as e:
+                    listing[n] = {"error": str(e)}
+                    continue
+                if series is not None:
+                    listing[n] = series.info()
+            body = json.dumps(listing).encode("utf-8")
+            await send(writer, 200, body, {**cors, "Content-Type": "application/json", "Cache-Control": "no-cache"})
+            return
+
+        try:
+            series = self.get(name)
+        except (OSError, ValueError) as e:
+            print(f"  {name}: load failed: {e!r}")
+            await send(writer, 500, b"series could not be read\n", {**cors, "Content-Type": "text/plain"})
+            return
+        if series is None:
+            await send(writer, 404, headers=cors)
+            return
+        accept_gzip = "gzip" in headers.get("accept-encoding", "")
+        status, etag, body, content_type, gzipped = self.query(series, params, accept_gzip)
+        if status != 200:
+            await send(writer, status, b"bad date, field or format\n", {**cors, "Content-Type": "text/plain"})
+            return
+        out = {**cors, "ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+        if headers.get("if-none-match") == etag:
+            await send(writer, 304, headers=out)
+            return
+        out["Content-Type"] = content_type
+        if gzipped:
+            out["Content-Encoding"] = "gzip"
+        await send(writer, 200, b"" if method == "HEAD" else body, out)
+
+
+async def serve(args):
+    api = HistoryAPI(args.csv_dir)
+    server = await asyncio.start_server(api.handle, args.host, args.port)
+    print(f"Serving {len(api.series)} series from {args.csv_dir} on http://{args.host}:{args.port}{ROUTE_PREFIX}")
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Date-range query API for the /csvfiles series.")
+    parser.add_argument("--csv-dir", default=CSV_DIR)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8091)
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Minimal asyncio HTTP/1.1 plumbing shared by the local services.
+
+screener_gateway.py, history_api.py, alpaca_stub.py and snapshot_cache.py all
+serve a handful of routes over asyncio streams with keep-alive; they read the
+request head and write responses through these helpers instead of each
+carrying a copy, and none of them needs a third-party web framework.
+"""
+
+import urllib.parse
+
+REASONS = {200: "OK", 204: "No Content", 207: "Multi-Status", 304: "Not Modified", 400: "Bad Request",
+           401: "Unauthorized", 404: "Not Found", 405: "Method Not Allowed", 422: "Unprocessable Entity",
+           500: "Internal Server Error", 503: "Service Unavailable"}
+
+
+async def read_request(reader):
+    """(method, path, query, headers) from one HTTP/1.x request head, or None on EOF."""
+    line = await reader.readline()
+    if not line:
+        return None
+    try:
+        method, target, _ = line.decode("latin-1").split(" ", 2)
+    except ValueError:
+        return None
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    path, _, query = target.partition("?")
+    return method, path, urllib.parse.parse_qs(query), headers
+
+
+def response_head(status, headers):
+    lines = [f"HTTP/1.1 {status} {REASONS.get(status, '')}"]
+    lines += [f"{k}: {v}" for k, v in headers.items()]
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+
+async def send(writer, status, body=b"", headers=None, keep_alive=True):
+    head = {"Content-Length": str(len(body)), "Connection": "keep-alive" if keep_alive else "close"}
+    head.update(headers or {})
+    writer.write(response_head(status, head) + body)
+    await writer.drain()
@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+"""
+Intrinsic image sizes and loading hints for the page converters.
+
+Article screenshots were emitted without width/height (or with the invalid
+"auto"), so pages reflow as each image arrives, and every image loaded
+eagerly. annotate_images() rewrites the <img> tags of an article fragment:
+
+  * width/height come from the image header itself (PNG, GIF, JPEG, WebP,
+    SVG). Local files are read from disk; remote ones (the Webflow CDN) are
+    fetched with a Range request for the first bytes only.
+  * images with less than ABOVE_FOLD_CHARS of text before them are treated as
+    above the fold and load eagerly, the first of them with
+    fetchpriority="high"; every other image gets loading="lazy"
+    decoding="async".
+
+Sizes are cached in .image-size-cache.json, keyed by the SHA-256 of local files
+and by URL for remote ones (Webflow upload URLs are content-addressed), so a
+rebuild reads no image twice. Failed remote fetches are cached too, for
+MISS_TTL, so a rebuild without network does not wait on every image; --offline
+skips remote fetches altogether. Running the module annotates already-converted
+pages in place; rewriting is idempotent.
+
+Usage:
+    python image_dimensions.py learn-articles/*.html
+    python image_dimensions.py learn-articles/*.html --offline
+"""
+
+import argparse
+import hashlib
+import html
+import json
+import os
+import re
+import struct
+import time
+import urllib.parse
+import urllib.request
+
+WORKSPACE = os.path.dirname(os.path.abspath(__file__))
+CACHE_PATH = os.path.join(WORKSPACE, ".image-size-cache.json")
+
+ABOVE_FOLD_CHARS = 600           # article text before an image that still fits the first screen
+REMOTE_RANGES = (65536, 524288)  # header bytes fetched; JPEGs with large EXIF blocks need the second
+FETCH_TIMEOUT = 10
+MISS_TTL = 24 * 3600             # seconds before a failed remote fetch is retried
+
+IMG_RE = re.compile(r"<img\b[^>]*>", re.I)
+HINT_ATTR_RE = re.compile(r'\s(?:loading|decoding|fetchpriority)="[^"]*"', re.I)
+SIZE_ATTR_RE = re.compile(r'\s(width|height)="([^"]*)"', re.I)
+SRC_RE = re.compile(r'\ssrc="([^"]*)"', re.I)
+TAG_RE = re.compile(r"<[^>]+>")
+SVG_LENGTH_RE = re.compile(r"^\s*([\d.]+)\s*(px)?\s*$")
+
+
+# ── header parsing ──────────────────────────────────────────────────────
+
+def _svg_size(data):
+    head = data[:4096].decode("utf-8", "replace")
+    tag = re.search(r"<svg\b[^>]*>", head, re.S)
+    if not tag:
+        return None
+    attrs = dict(re.findall(r'([\w:-]+)\s*=\s*["\']([^"\']*)["\']', tag.group(0)))
+    w = SVG_LENGTH_RE.match(attrs.get("width", ""))
+    h = SVG_LENGTH_RE.match(attrs.get("height", ""))
+    if w and h:
+        return round(float(w.group(1))), round(float(h.group(1)))
+    box = attrs.get("viewBox", "").replace(",", " ").split()
+    if len(box) == 4:
+        return round(float(box[2])), round(float(box[3]))
+    return None
+
+
+def _jpeg_size(data):
+    i = 2
+    while i + 9 < len(data):
+        if data[i] != 0xFF:
+            i += 1
+            continue
+        marker = data[i + 1]
+        if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7 or marker == 0xFF:
+            i += 1 if marker == 0xFF else 2
+            continue
+        length = struct.unpack(">H", data[i + 2:i + 4])[0]
+        if marker in (0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF):
+            h, w = struct.unpack(">HH", data[i + 5:i + 9])
+            return w, h
+        i += 2 + length
+    return None
+
+
+def image_size(data):
+    """(width, height) from the first bytes of an image, or None if unknown or truncated."""
+    if data[:8] == b"\x89PNG\r\n\x1a\n" and len(data) >= 24:
+        return struct.unpack(">II", data[16:24])
+    if data[:6] in (b"GIF87a", b"GIF89a") and len(data) >= 10:
+        return struct.unpack("<HH", data[6:10])
+    if data[:2] == b"\xff\xd8":
+        return _jpeg_size(data)
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP" and len(data) >= 30:
+        chunk = data[12:16]
+        if chunk == b"VP8 ":
+            w, h = struct.unpack("<HH", data[26:30])
+            return w & 0x3FFF, h & 0x3FFF
+        if chunk == b"VP8L":
+            bits = int.from_bytes(data[21:25], "little")
+            return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+        if chunk == b"VP8X":
+            return int.from_bytes(data[24:27], "little") + 1, int.from_bytes(data[27:30], "little") + 1
+        return None
+    if b"<svg" in data[:4096]:
+        return _svg_size(data)
+    return None
+
+
+# ── size cache ──────────────────────────────────────────────────────────
+
+class ImageSizes:
+    """(width, height) per image source, cached by local file hash or remote URL."""
+
+    def __init__(self, cache_path=CACHE_PATH, fetch_remote=True):
+        self.cache_path = cache_path
+        self.fetch_remote = fetch_remote
+        self.cache = {}
+        self.dirty = False
+        self.misses = []
+        if cache_path and os.path.exists(cache_path):
+            try:
+                with open(cache_path, "r", encoding="utf-8") as f:
+                    self.cache = json.load(f)
+            except ValueError:
+                self.cache = {}
+
+    def save(self):
+        if self.cache_path and self.dirty:
+            with open(self.cache_path, "w", encoding="utf-8") as f:
+                json.dump(self.cache, f, indent=0, sort_keys=True)
+            self.dirty = False
+
+    def _remember(self, key, size):
+        if size:
+            self.cache[key] = list(size)
+            self.dirty = True
+        return size
+
+    def local(self, path):
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except OSError:
+            return None
+        key = "sha256:" + hashlib.sha256(data).hexdigest()
+        if key in self.cache:
+            return tuple(self.cache[key])
+        return self._remember(key, image_size(data))
+
+    def _miss(self, key):
+        self.cache["miss:" + key] = int(time.time())
+        self.dirty = True
+
+    def remote(self, url):
+        key = "url:" + url
+        if key in self.cache:
+            return tuple(self.cache[key])
+        if not self.fetch_remote or time.time() - self.cache.get("miss:" + key, 0) < MISS_TTL:
+            return None
+        for limit in REMOTE_RANGES:
+            req = urllib.request.Request(url, headers={"Range": f"bytes=0-{limit - 1}", "User-Agent": "image-dimensions"})
+            try:
+                with urllib.request.urlopen(req, timeout=FETCH_TIMEOUT) as resp:
+                    data = resp.read(limit)
+            except (OSError, ValueError):
+                self._miss(key)
+                return None
+            size = image_size(data)
+            if size:
+                self.cache.pop("miss:" + key, None)
+                return self._remember(key, size)
+            if len(data) < limit:
+                break
+        self._miss(key)
+        return None
+
+    def get(self, src, base_dir):
+        """Size for an <img src> as written in a page located in base_dir."""
+        src = html.unescape(src)
+        if src.startswith(("http://", "https://")):
+            size = self.remote(src)
+        elif src.startswith("//"):
+            size = self.remote("https:" + src)
+        elif src.startswith("data:"):
+            return None
+        else:
+            path = urllib.parse.unquote(src.split("?", 1)[0].split("#", 1)[0])
+            if path.startswith("/"):
+                path = os.path.join(WORKSPACE, path.lstrip("/"))
+            else:
+                path = os.path.join(base_dir, path)
+            size = self.local(os.path.normpath(path))
+        if size is None:
+            self.misses.append(src)
+        return size
+
+
+# ── rewriting ───────────────────────────────────────────────────────────
+
+def _set_attrs(tag, attrs):
+    end = "/>" if tag.endswith("/>") else ">"
+    body = tag[:-len(end)].rstrip()
+    extra = "".join(f' {name}="{value}"' for name, value in attrs)
+    return f"{body}{extra}{' ' if end == '/>' else ''}{end}"
+
+
+def annotate_images(fragment, base_dir, sizes, above_fold_chars=ABOVE_FOLD_CHARS):
+    """Add width/height and loading hints to every <img> in an article fragment."""
+    out, last, text_before, hero_done = [], 0, 0, False
+    for match in IMG_RE.finditer(fragment):
+        text_before += len(html.unescape(TAG_RE.sub("", fragment[last:match.start()])).strip())
+        out.append(fragment[last:match.start()])
+        last = match.end()
+
+        tag = HINT_ATTR_RE.sub("", match.group(0))
+        existing = {name.lower(): value for name, value in SIZE_ATTR_RE.findall(tag)}
+        attrs = []
+        if not (existing.get("width", "").isdigit() and existing.get("height", "").isdigit()):
+            tag = SIZE_ATTR_RE.sub("", tag)
+            src = SRC_RE.search(tag)
+            size = sizes.get(src.group(1), base_dir) if src else None
+            if size:
+                attrs += [("width", size[0]), ("height", size[1])]
+
+        if text_before < above_fold_chars and not hero_done:
+            attrs.append(("fetchpriority", "high"))
+            hero_done = True
+        elif text_before >= above_fold_chars:
+            attrs += [("loading", "lazy"), ("decoding", "async")]
+        out.append(_set_attrs(tag, attrs))
+    out.append(fragment[last:])
+    return "".join(out)
+
+
+ARTICLE_RE = re.compile(r"(<article\b[^>]*>)(.*?)(</article>)", re.S)
+
+
+def annotate_page(page, base_dir, sizes):
+    """annotate_images() over the <article> of a converted page (the whole page if it has none)."""
+    if ARTICLE_RE.search(page):
+        return ARTICLE_RE.sub(lambda m: m.group(1) + annotate_images(m.group(2), base_dir, sizes) + m.group(3), page)
+    return annotate_images(page, base_dir, sizes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Add intrinsic image sizes and loading hints to converted pages.")
+    parser.add_argument("pages", nargs="+", help="HTML files to rewrite in place")
+    parser.add_argument("--offline", action="store_true", help="do not fetch remote images (cached sizes still apply)")
+    args = parser.parse_args()
+
+    sizes = ImageSizes(fetch_remote=not args.offline)
+    changed = 0
+    for path in args.pages:
+        with open(path, "r", encoding="utf-8") as f:
+            page = f.read()
+        new_page = annotate_page(page, os.path.dirname(os.path.abspath(path)), sizes)
+        if new_page != page:
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(new_page)
+            changed += 1
+            print(f"  Updated: {path}")
+    sizes.save()
+
+    if sizes.misses:
+        print(f"\n  No size for {len(sizes.misses)} images (unreachable or unknown format)")
+    print(f"\nDone! Rewrote {changed} of {len(args.pages)} pages.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+/* ============================================
+   MachineTrader — Date-sharded data feeds
+   Reads /csvfiles/feeds/manifest.json (written by build-data-feeds.py)
+   and fetches only the shards that overlap the requested date range.
+   ============================================ */
+
+window.MTFeeds = (() => {
+  const BASE = '/csvfiles/feeds/';
+  let manifestPromise = null;
+  const shardPromises = new Map();
+
+  function getManifest() {
+    if (!manifestPromise) {
+      manifestPromise = fetch(BASE + 'manifest.json', { cache: 'no-cache' }).then(response => {
+        if (!response.ok) throw new Error('HTTP error! status: ' + response.status);
+        return response.json();
+      });
+      manifestPromise.catch(() => { manifestPromise = null; });
+    }
+    return manifestPromise;
+  }
+
+  function getShard(file) {
+    if (!shardPromises.has(file)) {
+      const promise = fetch(BASE + file).then(response => {
+        if (!response.ok) throw new Error('HTTP error! status: ' + response.status);
+        return response.json();
+      });
+      promise.catch(() => shardPromises.delete(file));
+      shardPromises.set(file, promise);
+    }
+    return shardPromises.get(file);
+  }
+
+  // Feed name for a /csvfiles/<name>.csv path
+  function feedName(csvPath) {
+    return csvPath.split('/').pop().replace(/\.csv$/i, '');
+  }
+
+  // { columns, data: [[col0...], [col1...]] } for rows with from <= Date <= to (ISO dates, both optional)
+  async function load(name, options = {}) {
+    const manifest = await getManifest();
+    const feed = manifest.feeds && manifest.feeds[name];
+    if (!feed) throw new Error('Unknown feed: ' + name);
+    const from = options.from || '';
+    const to = options.to || '9999-99-99';
+    const shards = feed.shards.filter(s => s.last >= from && s.first <= to);
+    const docs = await Promise.all(shards.map(s => getShard(s.file)));
+    const data = feed.columns.map(() => []);
+    docs.forEach(doc => {
+      const dates = doc.data[0];
+      for (let i = 0; i < dates.length; i++) {
+        if (dates[i] < from || dates[i] > to) continue;
+        for (let c = 0; c < data.length; c++) data[c].push(doc.data[c][i]);
+      }
+    });
+    return { columns: feed.columns, data };
+  }
+
+  // Same shape as parseCSV() on the report pages: one object of strings per row ('' for empty cells)
+  async function loadRows(name, options = {}) {
+    const { columns, data } = await load(name, options);
+    const rows = [];
+    for (let i = 0; i < data[0].length; i++) {
+      const row = {};
+      columns.forEach((column, c) => {
+        const value = data[c][i];
+        row[column] = value === null || value === undefined ? '' : String(value);
+      });
+      rows.push(row);
+    }
+    return rows;
+  }
+
+  return { feedName, load, loadRows, getManifest };
+})();
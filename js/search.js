@@ -0,0 +1,101 @@
+/* ============================================
+   MachineTrader — Learn article search
+   Reads /learn-articles/search/manifest.json (written by
+   convert-learn-articles.py) and fetches only the prefix shards
+   that hold the query terms.
+   ============================================ */
+
+window.MTSearch = (() => {
+  const BASE = '/learn-articles/search/';
+  // Same list as STOPWORDS in convert-learn-articles.py
+  const STOPWORDS = new Set(('a an and are as at be been but by can do does for from has have how if in into is it its ' +
+    'of on or our so such that the their then there these they this to was we were what when which will with you your').split(' '));
+  let manifestPromise = null;
+  const shardPromises = new Map();
+
+  function getManifest() {
+    if (!manifestPromise) {
+      manifestPromise = fetch(BASE + 'manifest.json', { cache: 'no-cache' }).then(response => {
+        if (!response.ok) throw new Error('HTTP error! status: ' + response.status);
+        return response.json();
+      });
+      manifestPromise.catch(() => { manifestPromise = null; });
+    }
+    return manifestPromise;
+  }
+
+  function getShard(file) {
+    if (!shardPromises.has(file)) {
+      const promise = fetch(BASE + file).then(response => {
+        if (!response.ok) throw new Error('HTTP error! status: ' + response.status);
+        return response.json();
+      });
+      promise.catch(() => shardPromises.delete(file));
+      shardPromises.set(file, promise);
+    }
+    return shardPromises.get(file);
+  }
+
+  function tokenize(text) {
+    return (text.toLowerCase().match(/[a-z0-9]+/g) || []).filter(t => t.length >= 2 && t.length <= 30 && !STOPWORDS.has(t));
+  }
+
+  // Shards are keyed by a one- or two-character term prefix
+  function shardFor(manifest, term) {
+    return manifest.shards[term.slice(0, 2)] || manifest.shards[term[0]] || null;
+  }
+
+  // { results: [{ url, title, category, description, snippet, score }], facets: { category: count } }
+  // Every query term must match; the last one also matches as a prefix (search-as-you-type).
+  async function search(query, options = {}) {
+    const manifest = await getManifest();
+    const terms = [...new Set(tokenize(query))];
+    if (!terms.length) return { results: [], facets: {} };
+    const shards = await Promise.all(terms.map(term => {
+      const shard = shardFor(manifest, term);
+      return shard ? getShard(shard.file) : null;
+    }));
+
+    const n = manifest.docs.length;
+    let matched = null;
+    terms.forEach((term, i) => {
+      const hits = new Map();
+      const shard = shards[i];
+      const asPrefix = i === terms.length - 1;
+      if (shard) {
+        Object.keys(shard.terms).forEach(t => {
+          if (t !== term && !(asPrefix && t.startsWith(term))) return;
+          const postings = shard.terms[t];
+          const weight = Math.log(1 + n / postings.length) * (t === term ? 1 : 0.5);
+          postings.forEach(([doc, score, text]) => {
+            const best = hits.get(doc);
+            if (!best || score * weight > best.score) hits.set(doc, { score: score * weight, text: text || (best && best.text) });
+          });
+        });
+      }
+      if (matched === null) {
+        matched = hits;
+      } else {
+        const next = new Map();
+        hits.forEach((hit, doc) => {
+          const prev = matched.get(doc);
+          if (prev) next.set(doc, { score: prev.score + hit.score, text: prev.text || hit.text });
+        });
+        matched = next;
+      }
+    });
+
+    const facets = {};
+    const results = [];
+    matched.forEach((hit, doc) => {
+      const info = manifest.docs[doc];
+      facets[info.category] = (facets[info.category] || 0) + 1;
+      if (options.category && info.category !== options.category) return;
+      results.push({ ...info, snippet: hit.text || info.description, score: hit.score });
+    });
+    results.sort((a, b) => b.score - a.score);
+    return { results, facets };
+  }
+
+  return { search, getManifest, tokenize };
+})();
@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+"""
+Local top / worst movers screener over the tradable universe.
+
+top-performing-stocks.html and worst-performing-stocks.html render lists from
+the remote stock-screener API (through screener_gateway.py). The data behind
+them is already local: global.get("assetsTradable") holds the universe and the
+monthly-bars flow stores every symbol's bars. MoversScreener keeps the latest
+bar of every symbol in column arrays and ranks the whole universe at once:
+
+  * change_pct is close over the previous bar's close (over the bar's own
+    open until a previous bar is known);
+  * price, volume and dollar-volume floors and the assetsTradable flags are
+    applied as vectorized masks;
+  * top-K (gainers only) and bottom-K (losers only) come from np.argpartition, a linear-time partial
+    selection; only the K picks are sorted, never the universe;
+  * update() assigns new bars into the arrays in place, so a refresh after a
+    batch of bars costs one masked pass, not a reload.
+
+lists() returns the same JSON shape the pages consume (symbol, open, high, low,
+close, change_pct, volume, vwap) under the screener's list names, and fetch()
+lets ScreenerGateway serve them in place of the remote API (see --serve). While
+serving, the --bars file is re-read whenever it changes and folded in with
+update(), so the lists follow the monthly-bars flow without a restart.
+
+Usage:
+    python movers_screener.py --bars barsonemonth.csv --assets assets.json --out-dir /tmp/screener
+    python movers_screener.py --bars bars.json --serve --port 8090
+    python movers_screener.py --synthetic 10000 --top 20
+"""
+
+import argparse
+import asyncio
+import csv
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+from date_util import parse_time
+
+TOP_LIST, WORST_LIST = "topstocksmt4", "worststocksmt4"
+TOP_K = 20
+MIN_PRICE = 1.0
+MIN_VOLUME = 0.0
+MIN_DOLLAR_VOLUME = 0.0
+
+FIELDS = ("open", "high", "low", "close", "volume", "vwap")
+
+
+def bar_row(bar):
+    """(timestamp, {open, high, low, close, volume, vwap}) from an Alpaca bar or a barsonemonth row."""
+    def pick(*keys):
+        for key in keys:
+            value = bar.get(key)
+            if value not in (None, "", " "):
+                return float(value)
+        return np.nan
+    values = {"open": pick("o", "open"), "high": pick("h", "high"), "low": pick("l", "low"),
+              "close": pick("c", "close"), "volume": pick("v", "volume"), "vwap": pick("vw", "vwap")}
+    return parse_time(bar.get("t") or bar.get("date") or bar.get("timestamp") or 0), values
+
+
+def _json_float(value, digits):
+    """Rounded float for the list JSON; None for a missing (NaN) field, which json.dumps would emit as NaN."""
+    return None if np.isnan(value) else round(float(value), digits)
+
+
+class MoversScreener:
+    """Latest bar per symbol as growable column arrays, ranked with partial selection."""
+
+    def __init__(self, capacity=1024):
+        self.index = {}                 # symbol -> slot
+        self.symbols = np.empty(capacity, dtype=object)
+        self.cols = {f: np.full(capacity, np.nan) for f in FIELDS + ("ref", "stamp")}
+        self.tradable = np.ones(capacity, dtype=bool)
+        self.allowed = None             # tradable symbols once set_assets() ran; None = every symbol
+        self.size = 0
+        # update() runs on the server loop while ScreenerGateway ranks from a worker thread
+        self.lock = threading.RLock()
+
+    def _slots(self, symbols):
+        missing = [s for s in dict.fromkeys(symbols) if s not in self.index]
+        if self.size + len(missing) > len(self.symbols):
+            capacity = max(len(self.symbols) * 2, self.size + len(missing))
+            grow = capacity - len(self.symbols)
+            self.symbols = np.concatenate([self.symbols, np.empty(grow, dtype=object)])
+            self.cols = {f: np.concatenate([c, np.full(grow, np.nan)]) for f, c in self.cols.items()}
+            self.tradable = np.concatenate([self.tradable, np.ones(grow, dtype=bool)])
+        for symbol in missing:
+            self.index[symbol] = self.size
+            self.symbols[self.size] = symbol
+            self.tradable[self.size] = self.allowed is None or symbol in self.allowed
+            self.size += 1
+        return np.array([self.index[s] for s in symbols], dtype=np.int64)
+
+    def set_assets(self, assets):
+        """Restrict ranking to active, tradable assets (GET /v2/assets / assetsTradable rows)."""
+        with self.lock:
+            self.allowed = {a["symbol"] for a in assets
+                            if a.get("tradable", True) and a.get("status", "active") == "active"}
+            self._slots(sorted(self.allowed))
+            self.tradable[:self.size] = [s in self.allowed for s in self.symbols[:self.size]]
+
+    def update(self, bars):
+        """Fold in new bars: {symbol: bar} or [(symbol, bar)]; returns how many symbols changed."""
+        items = bars.items() if isinstance(bars, dict) else bars
+        by_stamp = {}
+        for symbol, bar in items:
+            stamp, values = bar_row(bar)
+            by_stamp.setdefault(stamp, {})[symbol] = values
+        with self.lock:
+            return self._apply(by_stamp)
+
+    def _apply(self, by_stamp):
+        changed = set()
+        # oldest first, so a newer bar sees the one it replaces as its previous close
+        for stamp in sorted(by_stamp):
+            rows = by_stamp[stamp]
+            slots = self._slots(list(rows))
+            c = self.cols
+            newer = ~(c["stamp"][slots] >= stamp)
+            c["ref"][slots] = np.where(newer & ~np.isnan(c["stamp"][slots]), c["close"][slots], c["ref"][slots])
+            keep = newer | (c["stamp"][slots] == stamp)
+            for f in FIELDS:
+                fresh = np.array([r[f] for r in rows.values()])
+                c[f][slots] = np.where(keep, fresh, c[f][slots])
+            c["stamp"][slots] = np.where(keep, stamp, c["stamp"][slots])
+            changed.update(s for s, k in zip(rows, keep) if k)
+        return len(changed)
+
+    def change_pct(self):
+        c = {f: a[:self.size] for f, a in self.cols.items()}
+        ref = np.where(np.isnan(c["ref"]), c["open"], c["ref"])
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(ref > 0, (c["close"] / ref - 1.0) * 100.0, np.nan)
+
+    def rank(self, k=TOP_K, min_price=MIN_PRICE, min_volume=MIN_VOLUME, min_dollar_volume=MIN_DOLLAR_VOLUME):
+        """(top slots, worst slots, change_pct): the k best gainers and k worst losers among eligible symbols."""
+        change = self.change_pct()
+        close = self.cols["close"][:self.size]
+        volume = np.nan_to_num(self.cols["volume"][:self.size])
+        with np.errstate(invalid="ignore"):
+            ok = (self.tradable[:self.size] & ~np.isnan(change) & (close >= min_price)
+                  & (volume >= min_volume) & (close * volume >= min_dollar_volume))
+            gainers = np.flatnonzero(ok & (change > 0))
+            losers = np.flatnonzero(ok & (change < 0))
+        return self._pick(gainers, -change[gainers], k), self._pick(losers, change[losers], k), change
+
+    @staticmethod
+    def _pick(slots, keys, k):
+        """The k slots with the smallest keys, in key order (argpartition, then sort only the picks)."""
+        k = min(k, len(slots))
+        if k == 0:
+            return slots[:0]
+        picked = np.argpartition(keys, k - 1)[:k]
+        return slots[picked[np.argsort(keys[picked], kind="stable")]]
+
+    def _rows(self, slots, change):
+        c = self.cols
+        out = []
+        for i in slots:
+            out.append({
+                "symbol": self.symbols[i],
+                "open": _json_float(c["open"][i], 4),
+                "high": _json_float(c["high"][i], 4),
+                "low": _json_float(c["low"][i], 4),
+                "close": _json_float(c["close"][i], 4),
+                "change_pct": _json_float(change[i], 2),
+                "volume": int(np.nan_to_num(c["volume"][i])),
+                "vwap": _json_float(c["vwap"][i], 4),
+            })
+        return out
+
+    def lists(self, **filters):
+        """{list name: [stock, ...]} in the shape the movers pages render."""
+        with self.lock:
+            top, worst, change = self.rank(**filters)
+            return {TOP_LIST: self._rows(top, change), WORST_LIST: self._rows(worst, change)}
+
+    def fetch(self, url, **filters):
+        """ScreenerGateway fetch(): the JSON body of the list named by the URL's last segment."""
+        name = url.rstrip("/").rsplit("/", 1)[-1]
+        lists = self.lists(**filters)
+        if name not in lists:
+            raise KeyError(f"unknown screener list {name!r}")
+        return json.dumps(lists[name], separators=(",", ":")).encode()
+
+
+# ── inputs ──────────────────────────────────────────────────────────────
+
+def load_bars(path):
+    """[(symbol, bar)] from a barsonemonth CSV export or an Alpaca multi-bar response ({"bars": {sym: [...]}})."""
+    if path.endswith(".csv"):
+        with open(path, "r", encoding="utf-8", newline="") as f:
+            return [(row["symbol"].strip().upper(), row) for row in csv.DictReader(f) if row.get("symbol")]
+    with open(path, "r", encoding="utf-8") as f:
+        doc = json.load(f)
+    bars = doc.get("bars", doc)
+    return [(symbol, bar) for symbol, rows in bars.items() for bar in (rows if isinstance(rows, list) else [rows])]
+
+
+def synthetic_bars(n, stamp, seed=0):
+    base = np.random.default_rng(0).lognormal(3.5, 1.2, n)
+    rng = np.random.default_rng(seed)
+    opens = base * (1 + rng.normal(0, 0.02, n))
+    close = opens * (1 + rng.normal(0, 0.06, n))
+    volume = rng.lognormal(12, 2, n).astype(int)
+    return [(f"S{i:05d}", {"t": stamp, "o": opens[i], "h": max(opens[i], close[i]) * 1.01,
+                           "l": min(opens[i], close[i]) * 0.99, "c": close[i], "v": int(volume[i]),
+                           "vw": (opens[i] + close[i]) / 2}) for i in range(n)]
+
+
+def file_version(path):
+    st = os.stat(path)
+    return st.st_mtime_ns, st.st_size
+
+
+async def feed_bars(screener, args):
+    """Fold new bars into the screener every interval: the --bars file when it changes, else synthetic ticks."""
+    version = file_version(args.bars) if args.bars else None
+    rounds = 0
+    while True:
+        await asyncio.sleep(args.interval)
+        if args.bars:
+            try:
+                current = file_version(args.bars)
+            except FileNotFoundError:
+                continue
+            if current == version:
+                continue
+            version = current
+            bars = await asyncio.to_thread(load_bars, args.bars)
+        else:
+            rounds += 1
+            bars = synthetic_bars(args.synthetic, "2025-10-01T00:00:00Z", 2 + rounds)[::20]
+        changed = await asyncio.to_thread(screener.update, bars)
+        print(f"  Folded in {len(bars)} bars, {changed} symbols changed")
+
+
+async def serve(screener, args, filters):
+    from screener_gateway import ScreenerGateway
+    gateway = ScreenerGateway("local:", interval=args.interval, fetch=lambda url: screener.fetch(url, **filters))
+    server = await gateway.start(args.host, args.port)
+    feeder = asyncio.create_task(feed_bars(screener, args))
+    print(f"Local screener on http://{args.host}:{args.port}/api/screener/{{{TOP_LIST},{WORST_LIST}}}")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        feeder.cancel()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rank the tradable universe into top and worst movers.")
+    parser.add_argument("--bars", help="barsonemonth CSV export or Alpaca bars JSON")
+    parser.add_argument("--assets", help="GET /v2/assets JSON (assetsTradable)")
+    parser.add_argument("--synthetic", type=int, metavar="N", help="use N synthetic symbols instead of --bars")
+    parser.add_argument("--top", type=int, default=TOP_K, help="stocks per list")
+    parser.add_argument("--min-price", type=float, default=MIN_PRICE)
+    parser.add_argument("--min-volume", type=float, default=MIN_VOLUME)
+    parser.add_argument("--min-dollar-volume", type=float, default=MIN_DOLLAR_VOLUME)
+    parser.add_argument("--out-dir", help=f"write {TOP_LIST}.json and {WORST_LIST}.json here")
+    parser.add_argument("--serve", action="store_true", help="serve the lists through ScreenerGateway")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--interval", type=int, default=60, help="seconds between bar refreshes and re-ranks (--serve)")
+    args = parser.parse_args()
+
+    screener = MoversScreener()
+    if args.assets:
+        with open(args.assets, "r", encoding="utf-8") as f:
+            screener.set_assets(json.load(f))
+    if args.synthetic:
+        bars = synthetic_bars(args.synthetic, "2025-09-01T00:00:00Z") + synthetic_bars(args.synthetic, "2025-10-01T00:00:00Z", 1)
+    elif args.bars:
+        bars = load_bars(args.bars)
+    else:
+        parser.error("--bars or --synthetic is required")
+
+    started = time.perf_counter()
+    screener.update(bars)
+    load_ms = (time.perf_counter() - started) * 1000
+    filters = {"k": args.top, "min_price": args.min_price, "min_volume": args.min_volume,
+               "min_dollar_volume": args.min_dollar_volume}
+    started = time.perf_counter()
+    lists = screener.lists(**filters)
+    rank_ms = (time.perf_counter() - started) * 1000
+    print(f"  {screener.size} symbols from {len(bars)} bars in {load_ms:.1f} ms; ranked in {rank_ms:.2f} ms\n")
+    for name, rows in lists.items():
+        print(f"  {name}: " + ", ".join(f"{r['symbol']} {r['change_pct']:+.2f}%" for r in rows[:8]))
+
+    if args.synthetic:
+        fresh = synthetic_bars(args.synthetic // 20, "2025-10-01T00:00:00Z", 2)
+        started = time.perf_counter()
+        screener.update(fresh)
+        screener.lists(**filters)
+        print(f"\n  Refresh with {len(fresh)} new bars: {(time.perf_counter() - started) * 1000:.2f} ms")
+
+    if args.out_dir:
+        os.makedirs(args.out_dir, exist_ok=True)
+        for name, rows in lists.items():
+            with open(os.path.join(args.out_dir, f"{name}.json"), "w", encoding="utf-8") as f:
+                json.dump(rows, f, separators=(",", ":"))
+
+    if args.serve:
+        try:
+            asyncio.run(serve(screener, args, filters))
+        except KeyboardInterrupt:
+            pass
+        return
+    print(f"\nDone! {len(lists[TOP_LIST])} top and {len(lists[WORST_LIST])} worst movers.")
+
+
+if __name__ == "__main__":
+    main()
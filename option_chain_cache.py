@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""
+Indexed option-chain cache and contract selector.
+
+The Bear Call / Bear Put Spread flows page through /v2/options/contracts with
+next_page_token, push every page into flow.get("contracts"), then filter and sort
+the whole array on open_interest > 1000 and build the put leg by slicing the
+call symbol (convertCallToPut). This module ingests the same paginated
+responses once per TTL into per-underlying indexes keyed by expiry, type and
+strike, so the selections the flows make become bisect or dict lookups:
+
+    nearest strike to spot            O(log n)
+    top-N by open interest            O(log n + N)
+    matching put/call leg             O(1)
+
+FixtureContractsFetcher serves local JSON files page by page and stands in for
+the broker in tests.
+
+Usage:
+    python option_chain_cache.py QQQ --fixtures fixtures/contracts --spot 512.3 --expiry 2025-12-19
+"""
+
+import argparse
+import bisect
+import json
+import os
+import time
+import urllib.parse
+import urllib.request
+
+from options_backtester import occ_symbol, parse_occ
+
+WORKSPACE = os.path.dirname(os.path.abspath(__file__))
+
+DEFAULT_TTL = 300          # seconds before a chain is re-fetched
+MIN_OPEN_INTEREST = 1000   # "filter contracts by open_interest" in the spread flows
+
+
+def normalize_contract(raw):
+    """Alpaca contract object (string fields) -> dict with typed fields used by the indexes."""
+    symbol = raw["symbol"]
+    underlying, expiry, option_type, strike = parse_occ(symbol)
+    oi = raw.get("open_interest")
+    close = raw.get("close_price")
+    return {
+        "symbol": symbol,
+        "underlying": raw.get("underlying_symbol") or raw.get("underlying") or underlying,
+        "expiration_date": raw.get("expiration_date") or expiry,
+        "type": raw.get("type") or option_type,
+        "strike_price": float(raw.get("strike_price") or strike),
+        "open_interest": int(float(oi)) if oi not in (None, "") else 0,
+        "close_price": float(close) if close not in (None, "") else None,
+        "tradable": raw.get("tradable", True),
+    }
+
+
+class OptionChain:
+    """All contracts of one underlying, indexed by (expiry, type, strike) and by open interest."""
+
+    def __init__(self, underlying):
+        self.underlying = underlying
+        self.contracts = {}    # symbol -> contract
+        self.expiries = []     # sorted expiration dates
+        self._by_key = {}      # (expiry, type, strike) -> contract
+        self._strikes = {}     # (expiry, type) -> sorted strikes
+        self._by_oi = {}       # (expiry | None, type | None) -> sorted [(-open_interest, symbol)]
+
+    def __len__(self):
+        return len(self.contracts)
+
+    def add(self, raw):
+        """Insert or replace one contract (raw Alpaca object or normalized dict)."""
+        c = normalize_contract(raw)
+        old = self.contracts.get(c["symbol"])
+        if old is not None:
+            self._remove(old)
+        self.contracts[c["symbol"]] = c
+
+        expiry, option_type, strike = c["expiration_date"], c["type"], c["strike_price"]
+        i = bisect.bisect_left(self.expiries, expiry)
+        if i == len(self.expiries) or self.expiries[i] != expiry:
+            self.expiries.insert(i, expiry)
+        self._by_key[(expiry, option_type, strike)] = c
+        strikes = self._strikes.setdefault((expiry, option_type), [])
+        j = bisect.bisect_left(strikes, strike)
+        if j == len(strikes) or strikes[j] != strike:
+            strikes.insert(j, strike)
+        entry = (-c["open_interest"], c["symbol"])
+        for key in self._oi_keys(c):
+            bisect.insort(self._by_oi.setdefault(key, []), entry)
+
+    def _remove(self, c):
+        expiry, option_type, strike = c["expiration_date"], c["type"], c["strike_price"]
+        del self._by_key[(expiry, option_type, strike)]
+        strikes = self._strikes[(expiry, option_type)]
+        del strikes[bisect.bisect_left(strikes, strike)]
+        entry = (-c["open_interest"], c["symbol"])
+        for key in self._oi_keys(c):
+            ranked = self._by_oi[key]
+            del ranked[bisect.bisect_left(ranked, entry)]
+
+    @staticmethod
+    def _oi_keys(c):
+        return ((c["expiration_date"], c["type"]), (c["expiration_date"], None), (None, c["type"]), (None, None))
+
+    # ── queries ─────────────────────────────────────────────────────────
+
+    def contract(self, expiry, option_type, strike):
+        return self._by_key.get((expiry, option_type, float(strike)))
+
+    def nearest_expiry(self, on_or_after):
+        """First listed expiration date on or after a YYYY-MM-DD date."""
+        i = bisect.bisect_left(self.expiries, on_or_after)
+        return self.expiries[i] if i < len(self.expiries) else None
+
+    def nearest_strike(self, expiry, option_type, spot):
+        """Listed strike closest to spot for one expiry and type (ties go to the lower strike)."""
+        strikes = self._strikes.get((expiry, option_type))
+        if not strikes:
+            return None
+        i = bisect.bisect_left(strikes, spot)
+        if i == 0:
+            return strikes[0]
+        if i == len(strikes):
+            return strikes[-1]
+        lo, hi = strikes[i - 1], strikes[i]
+        return lo if spot - lo <= hi - spot else hi
+
+    def nearest_contract(self, expiry, option_type, spot, offset=0.0):
+        """Contract at the strike nearest to spot + offset (e.g. offset=10 for the bear call long leg)."""
+        strike = self.nearest_strike(expiry, option_type, spot + offset)
+        return None if strike is None else self.contract(expiry, option_type, strike)
+
+    def matching_leg(self, symbol):
+        """The put for a call symbol (or the call for a put) at the same expiry and strike."""
+        c = self.contracts.get(symbol)
+        if c is None:
+            return None
+        other = "put" if c["type"] == "call" else "call"
+        return self.contract(c["expiration_date"], other, c["strike_price"])
+
+    def top_by_open_interest(self, n=10, expiry=None, option_type=None, min_open_interest=MIN_OPEN_INTEREST):
+        """Up to n contracts with open_interest > min_open_interest, highest first."""
+        ranked = self._by_oi.get((expiry, option_type), [])
+        # Entries are sorted by -open_interest, so the cutoff is a bisect away
+        stop = bisect.bisect_left(ranked, (-min_open_interest, ""))
+        return [self.contracts[sym] for _, sym in ranked[:min(n, stop)]]
+
+
+# ── fetchers ────────────────────────────────────────────────────────────
+
+class AlpacaContractsFetcher:
+    """Pages through GET /v2/options/contracts on the Alpaca trading API."""
+
+    def __init__(self, key_id=None, secret=None, base_url="https://paper-api.alpaca.markets", limit=10000):
+        self.key_id = key_id or os.environ.get("APCA_API_KEY_ID", "")
+        self.secret = secret or os.environ.get("APCA_API_SECRET_KEY", "")
+        self.base_url = base_url.rstrip("/")
+        self.limit = limit
+
+    def fetch_page(self, underlying, expiration_date_gte=None, expiration_date_lte=None, page_token=None):
+        params = {"underlying_symbols": underlying, "limit": self.limit}
+        if expiration_date_gte:
+            params["expiration_date_gte"] = expiration_date_gte
+        if expiration_date_lte:
+            params["expiration_date_lte"] = expiration_date_lte
+        if page_token:
+            params["page_token"] = page_token
+        req = urllib.request.Request(
+            f"{self.base_url}/v2/options/contracts?{urllib.parse.urlencode(params)}",
+            headers={"APCA-API-KEY-ID": self.key_id, "APCA-API-SECRET-KEY": self.secret},
+        )
+        with urllib.request.urlopen(req, timeout=30) as resp:
+            return json.loads(resp.read().decode("utf-8"))
+
+
+class FixtureContractsFetcher:
+    """Local stand-in for AlpacaContractsFetcher that pages through <fixture_dir>/<UNDERLYING>.json.
+
+    The fixture is either a list of contract objects or an Alpaca response with
+    "option_contracts". Pages are page_size long and next_page_token is the next offset.
+    """
+
+    def __init__(self, fixture_dir, page_size=100):
+        self.fixture_dir = fixture_dir
+        self.page_size = page_size
+        self.calls = 0
+
+    def _contracts(self, underlying):
+        with open(os.path.join(self.fixture_dir, f"{underlying}.json"), "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return data["option_contracts"] if isinstance(data, dict) else data
+
+    def fetch_page(self, underlying, expiration_date_gte=None, expiration_date_lte=None, page_token=None):
+        self.calls += 1
+        contracts = [
+            c for c in self._contracts(underlying)
+            if (not expiration_date_gte or c["expiration_date"] >= expiration_date_gte)
+            and (not expiration_date_lte or c["expiration_date"] <= expiration_date_lte)
+        ]
+        start = int(page_token or 0)
+        end = start + self.page_size
+        return {
+            "option_contracts": contracts[start:end],
+            "next_page_token": str(end) if end < len(contracts) else None,
+        }
+
+
+# ── cache ───────────────────────────────────────────────────────────────
+
+class OptionChainCache:
+    """Per-(underlying, expiry window) OptionChain objects, re-fetched once their TTL expires."""
+
+    def __init__(self, fetcher, ttl=DEFAULT_TTL, clock=time.monotonic):
+        self.fetcher = fetcher
+        self.ttl = ttl
+        self.clock = clock
+        self._chains = {}    # (underlying, gte, lte) -> (fetched_at, OptionChain)
+
+    def chain(self, underlying, expiration_date_gte=None, expiration_date_lte=None):
+        """Cached chain for an underlying and expiry window, refreshed when older than ttl."""
+        key = (underlying, expiration_date_gte, expiration_date_lte)
+        cached = self._chains.get(key)
+        if cached is None or self.clock() - cached[0] >= self.ttl:
+            return self.refresh(underlying, expiration_date_gte, expiration_date_lte)
+        return cached[1]
+
+    def refresh(self, underlying, expiration_date_gte=None, expiration_date_lte=None):
+        """Fetch every page for the window into a fresh OptionChain and cache it."""
+        chain = OptionChain(underlying)
+        token = None
+        while True:
+            page = self.fetcher.fetch_page(underlying, expiration_date_gte, expiration_date_lte, token)
+            self.ingest_page(chain, page)
+            token = page.get("next_page_token")
+            if not token:
+                break
+        self._chains[(underlying, expiration_date_gte, expiration_date_lte)] = (self.clock(), chain)
+        return chain
+
+    @staticmethod
+    def ingest_page(chain, page):
+        for raw in page.get("option_contracts") or []:
+            chain.add(raw)
+
+    def invalidate(self, underlying=None):
+        for key in [k for k in self._chains if underlying is None or k[0] == underlying]:
+            del self._chains[key]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query an indexed option chain.")
+    parser.add_argument("underlying")
+    parser.add_argument("--fixtures", help="directory of <UNDERLYING>.json contract fixtures (default: live Alpaca)")
+    parser.add_argument("--spot", type=float, required=True, help="current underlying price")
+    parser.add_argument("--expiry", help="expiration date on or after which to trade (YYYY-MM-DD)")
+    parser.add_argument("--wing", type=float, default=10.0, help="distance to the long strike")
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    fetcher = FixtureContractsFetcher(args.fixtures) if args.fixtures else AlpacaContractsFetcher()
+    cache = OptionChainCache(fetcher)
+    chain = cache.chain(args.underlying, args.expiry)
+    print(f"Loaded {len(chain)} {args.underlying} contracts across {len(chain.expiries)} expiries.\n")
+
+    expiry = chain.nearest_expiry(args.expiry or "")
+    if expiry is None:
+        print("No expiries found.")
+        return
+    sell = chain.nearest_contract(expiry, "call", args.spot)
+    buy = chain.nearest_contract(expiry, "call", args.spot, args.wing)
+    print(f"  Expiry {expiry}")
+    print(f"  Bear call spread: sell {sell and sell['symbol']}  buy {buy and buy['symbol']}")
+    put = chain.matching_leg(sell["symbol"]) if sell else None
+    print(f"  Matching put for short call: {put and put['symbol']}")
+    if sell and not put:
+        print(f"  (not listed: {occ_symbol(args.underlying, expiry, 'put', sell['strike_price'])})")
+
+    print(f"\n  Top {args.top} by open interest (> {MIN_OPEN_INTEREST}):")
+    for c in chain.top_by_open_interest(args.top, expiry=expiry):
+        print(f"    {c['symbol']:<24} OI {c['open_interest']:>8,}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,451 @@
+#!/usr/bin/env python3
+"""
+Options spread backtester for the defined-risk strategies documented in
+strategies/iron-butterfly.html, trading-flows/bear-call-spread-flow.html and
+trading-flows/bear-put-spread-flow.html.
+
+Strategy legs are evaluated over a historical underlying path and option-chain
+snapshots loaded from local fixtures. Each snapshot is turned into an
+(expiry x strike) price grid so entry premium, payoff, P/L and max-loss are
+computed with array math for every strike/expiry combination at once. Several
+entry-rule and liquidation-rule variants are run side by side for comparison.
+
+Usage:
+    python options_backtester.py underlying.csv chains/ --strategy iron-butterfly
+
+underlying.csv has a header row: timestamp,price
+chains/ holds one JSON file per snapshot:
+    {"timestamp": "2025-01-13T09:35:00", "underlying_price": 590.25,
+     "option_contracts": [{"symbol": "SPY250117C00590000", "expiration_date": "2025-01-17",
+                           "type": "call", "strike_price": "590", "open_interest": "1234",
+                           "bid_price": "2.45", "ask_price": "2.55", "close_price": "2.50"}, ...]}
+"""
+
+import argparse
+import csv
+import json
+import os
+
+import numpy as np
+
+WORKSPACE = os.path.dirname(os.path.abspath(__file__))
+
+CONTRACT_MULTIPLIER = 100
+CALL, PUT = 0, 1
+OPTION_TYPES = {"call": CALL, "put": PUT}
+
+# ── strategy legs: (option type, signed quantity, strike offset in wing widths) ──
+STRATEGY_LEGS = {
+    # Buy put ATM-w, sell put ATM, sell call ATM, buy call ATM+w (strategies/iron-butterfly.html)
+    "iron-butterfly": [(PUT, +1, -1), (PUT, -1, 0), (CALL, -1, 0), (CALL, +1, +1)],
+    # Sell call at the money, buy call strike + 10 ("store contracts" in Bear Call Spread (1).json)
+    "bear-call-spread": [(CALL, -1, 0), (CALL, +1, +1)],
+    # Buy put at the money, sell put strike - 10 ("store contracts" in Bear Put Spread (1).json)
+    "bear-put-spread": [(PUT, +1, 0), (PUT, -1, -1)],
+}
+
+DEFAULT_WING_WIDTH = {"iron-butterfly": 10.0, "bear-call-spread": 10.0, "bear-put-spread": 10.0}
+
+# Entry rules: weekday (0 = Monday), time of day, strike offset from ATM, minimum days to expiry
+ENTRY_RULES = {
+    "monday-0935-atm": {"weekday": 0, "time": "09:35", "strike_offset": 0.0, "min_dte": 0},
+    "monday-1030-atm": {"weekday": 0, "time": "10:30", "strike_offset": 0.0, "min_dte": 0},
+    "tuesday-0935-atm": {"weekday": 1, "time": "09:35", "strike_offset": 0.0, "min_dte": 0},
+}
+
+# Liquidation rules mirror liquidation_flow.json / monitoring_flow.json on the iron butterfly page.
+# profit_target is a fraction of max profit, stop_loss a fraction of max loss.
+LIQUIDATION_RULES = {
+    "hold-to-expiry": {},
+    "thursday-1440": {"exit_weekday": 3, "exit_time": "14:40"},
+    "monitor-50-80": {"profit_target": 0.5, "stop_loss": 0.8, "exit_weekday": 3, "exit_time": "14:40"},
+    "monitor-90-80": {"profit_target": 0.9, "stop_loss": 0.8, "exit_weekday": 3, "exit_time": "14:40"},
+}
+
+
+def occ_symbol(underlying, expiration_date, option_type, strike):
+    """Build an OCC option symbol, e.g. SPY250117P00580000."""
+    yy, mm, dd = str(expiration_date)[:10].split("-")
+    letter = "C" if option_type in (CALL, "call", "C") else "P"
+    return f"{underlying}{yy[-2:]}{mm}{dd}{letter}{int(round(float(strike) * 1000)):08d}"
+
+
+def parse_occ(symbol):
+    """Split an OCC symbol into (underlying, expiration_date, type, strike)."""
+    root, tail = symbol[:-15], symbol[-15:]
+    expiry = f"20{tail[0:2]}-{tail[2:4]}-{tail[4:6]}"
+    option_type = "call" if tail[6] == "C" else "put"
+    return root, expiry, option_type, int(tail[7:]) / 1000.0
+
+
+def _num(value):
+    if value is None or value == "":
+        return np.nan
+    return float(value)
+
+
+class ChainGrid:
+    """One option-chain snapshot as dense (type x expiry x strike) bid/ask grids."""
+
+    def __init__(self, timestamp, underlying_price, expiries, strikes, bid, ask, open_interest):
+        self.timestamp = timestamp
+        self.underlying_price = underlying_price
+        self.expiries = expiries
+        self.strikes = strikes
+        self.bid = bid
+        self.ask = ask
+        self.open_interest = open_interest
+
+    @classmethod
+    def from_snapshot(cls, snapshot):
+        contracts = snapshot.get("option_contracts", [])
+        n = len(contracts)
+        types = np.empty(n, dtype=np.int64)
+        expiry = np.empty(n, dtype="datetime64[D]")
+        strike = np.empty(n)
+        bid = np.empty(n)
+        ask = np.empty(n)
+        oi = np.empty(n)
+        for i, c in enumerate(contracts):
+            types[i] = OPTION_TYPES[c["type"]]
+            expiry[i] = np.datetime64(c["expiration_date"][:10])
+            strike[i] = float(c["strike_price"])
+            last = _num(c.get("close_price"))
+            b, a = _num(c.get("bid_price")), _num(c.get("ask_price"))
+            bid[i] = last if np.isnan(b) else b
+            ask[i] = last if np.isnan(a) else a
+            oi[i] = _num(c.get("open_interest"))
+
+        expiries, e_idx = np.unique(expiry, return_inverse=True)
+        strikes, k_idx = np.unique(strike, return_inverse=True)
+        shape = (2, len(expiries), len(strikes))
+        grids = [np.full(shape, np.nan) for _ in range(3)]
+        for grid, values in zip(grids, (bid, ask, oi)):
+            grid[types, e_idx, k_idx] = values
+
+        return cls(
+            np.datetime64(snapshot["timestamp"][:16], "m"),
+            float(snapshot.get("underlying_price") or np.nan),
+            expiries,
+            strikes,
+            *grids,
+        )
+
+    def strike_index(self, targets):
+        """Index of each target strike in self.strikes, -1 where the strike is not listed."""
+        targets = np.asarray(targets, dtype=float)
+        pos = np.clip(np.searchsorted(self.strikes, targets), 0, len(self.strikes) - 1)
+        return np.where(np.isclose(self.strikes[pos], targets), pos, -1)
+
+    def nearest_strike(self, price):
+        pos = np.clip(np.searchsorted(self.strikes, price), 1, len(self.strikes) - 1)
+        lo, hi = self.strikes[pos - 1], self.strikes[pos]
+        return lo if price - lo <= hi - price else hi
+
+
+# ── vectorized grids ────────────────────────────────────────────────────
+
+def leg_strikes(anchor, legs, wing_width):
+    """(legs x anchors) strike matrix for every anchor strike."""
+    offsets = np.array([off for _, _, off in legs], dtype=float) * wing_width
+    return np.asarray(anchor, dtype=float)[None, :] + offsets[:, None]
+
+
+def _leg_prices(grid, legs, wing_width, sell_side):
+    """(legs x expiries x strikes) fill prices; sell_side picks bid for sells when True."""
+    strikes = leg_strikes(grid.strikes, legs, wing_width)
+    out = np.full((len(legs), len(grid.expiries), len(grid.strikes)), np.nan)
+    for i, (opt, qty, _) in enumerate(legs):
+        idx = grid.strike_index(strikes[i])
+        ok = idx >= 0
+        selling = (qty < 0) == sell_side
+        book = grid.bid if selling else grid.ask
+        out[i][:, ok] = book[opt][:, idx[ok]]
+    return out
+
+
+def entry_credit_grid(grid, legs, wing_width):
+    """Net premium per share received at entry for every (expiry, anchor strike); debit is negative."""
+    prices = _leg_prices(grid, legs, wing_width, sell_side=True)
+    qty = np.array([q for _, q, _ in legs], dtype=float)[:, None, None]
+    return -(qty * prices).sum(axis=0)
+
+
+def exit_cost_grid(grid, legs, wing_width):
+    """Net premium per share paid to close every (expiry, anchor strike); receipts are negative."""
+    prices = _leg_prices(grid, legs, wing_width, sell_side=False)
+    qty = np.array([q for _, q, _ in legs], dtype=float)[:, None, None]
+    return -(qty * prices).sum(axis=0)
+
+
+def payoff_grid(anchor, legs, wing_width, spots):
+    """Intrinsic value per share at expiry for (anchor strikes x spot prices)."""
+    strikes = leg_strikes(anchor, legs, wing_width)[:, :, None]
+    spots = np.asarray(spots, dtype=float)
+    if spots.ndim == 1:
+        spots = spots[None, :]
+    spots = spots[None, :, :]
+    total = 0.0
+    for i, (opt, qty, _) in enumerate(legs):
+        if opt == CALL:
+            intrinsic = np.maximum(spots - strikes[i], 0.0)
+        else:
+            intrinsic = np.maximum(strikes[i] - spots, 0.0)
+        total = total + qty * intrinsic
+    return total[0]
+
+
+def max_profit_loss_grid(grid, legs, wing_width):
+    """Max profit and max loss per share for every (expiry, anchor strike).
+
+    Payoff is piecewise linear in spot, so the extremes sit at the leg strikes or at 0.
+    """
+    credit = entry_credit_grid(grid, legs, wing_width)
+    strikes = leg_strikes(grid.strikes, legs, wing_width).T
+    spots = np.concatenate([np.zeros((len(grid.strikes), 1)), strikes, strikes.max(axis=1, keepdims=True) * 2], axis=1)
+    payoff = payoff_grid(grid.strikes, legs, wing_width, spots)
+    pnl = payoff[None, :, :] + credit[:, :, None]
+    return pnl.max(axis=2), -pnl.min(axis=2)
+
+
+def pnl_grid(entry, exit_, legs, wing_width):
+    """Per-share P/L for holding every (expiry, anchor) from one snapshot to another."""
+    credit = entry_credit_grid(entry, legs, wing_width)
+    cost = exit_cost_grid(exit_, legs, wing_width)
+    # Align the exit grid onto the entry grid's expiries/strikes
+    e_pos = np.searchsorted(exit_.expiries, entry.expiries)
+    e_ok = (e_pos < len(exit_.expiries)) & (exit_.expiries[np.minimum(e_pos, len(exit_.expiries) - 1)] == entry.expiries)
+    k_pos = exit_.strike_index(entry.strikes)
+    aligned = np.full(credit.shape, np.nan)
+    ok_e, ok_k = np.nonzero(e_ok)[0], np.nonzero(k_pos >= 0)[0]
+    aligned[np.ix_(ok_e, ok_k)] = cost[np.ix_(e_pos[ok_e], k_pos[ok_k])]
+    return credit - aligned
+
+
+# ── fixtures ────────────────────────────────────────────────────────────
+
+def load_underlying(path):
+    """Load an underlying price path CSV (timestamp,price) into (datetime64[m], float) arrays."""
+    stamps, prices = [], []
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        for row in csv.DictReader(f):
+            stamps.append(row["timestamp"][:16])
+            prices.append(float(row["price"]))
+    order = np.argsort(np.array(stamps, dtype="datetime64[m]"))
+    return np.array(stamps, dtype="datetime64[m]")[order], np.array(prices)[order]
+
+
+def load_chain_snapshots(chain_dir):
+    """Load every *.json snapshot in chain_dir as ChainGrid objects, sorted by time."""
+    grids = []
+    for name in sorted(os.listdir(chain_dir)):
+        if not name.endswith(".json"):
+            continue
+        with open(os.path.join(chain_dir, name), "r", encoding="utf-8") as f:
+            grids.append(ChainGrid.from_snapshot(json.load(f)))
+    grids.sort(key=lambda g: g.timestamp)
+    return grids
+
+
+# ── backtest ────────────────────────────────────────────────────────────
+
+def _weekday(ts):
+    # 1970-01-01 was a Thursday
+    return int((ts.astype("datetime64[D]").astype(np.int64) + 3) % 7)
+
+
+def _minute_of_day(ts):
+    return int((ts - ts.astype("datetime64[D]")).astype(np.int64))
+
+
+def _hhmm(text):
+    h, m = text.split(":")
+    return int(h) * 60 + int(m)
+
+
+def price_at(stamps, prices, ts):
+    """Last underlying price at or before ts."""
+    i = np.searchsorted(stamps, ts, side="right") - 1
+    return prices[i] if i >= 0 else np.nan
+
+
+def settle_price(stamps, prices, expiry):
+    """Last underlying price on the expiry date at or before the 16:00 close; NaN if the path has none that day."""
+    close = np.datetime64(str(expiry) + "T16:00", "m")
+    i = np.searchsorted(stamps, close, side="right") - 1
+    if i < 0 or stamps[i].astype("datetime64[D]") != np.datetime64(expiry, "D"):
+        return np.nan
+    return prices[i]
+
+
+def find_entries(snapshots, rule):
+    """Indexes of the first snapshot at or after the rule's time on each matching weekday."""
+    target = _hhmm(rule["time"])
+    seen, out = set(), []
+    for i, g in enumerate(snapshots):
+        day = g.timestamp.astype("datetime64[D]")
+        if day in seen or _weekday(g.timestamp) != rule["weekday"]:
+            continue
+        if _minute_of_day(g.timestamp) >= target:
+            seen.add(day)
+            out.append(i)
+    return out
+
+
+def simulate_trade(snapshots, stamps, prices, start, legs, wing_width, entry_rule, exit_rule, grid_cache=None):
+    """Open one position at snapshots[start] and apply a liquidation rule; returns a trade dict or None.
+
+    grid_cache memoizes per-snapshot grids and may be shared by every call with the same legs and wing width.
+    """
+    grid_cache = {} if grid_cache is None else grid_cache
+    entry = snapshots[start]
+    spot = entry.underlying_price
+    if np.isnan(spot):
+        spot = price_at(stamps, prices, entry.timestamp)
+    day = entry.timestamp.astype("datetime64[D]")
+    expiry_ok = entry.expiries >= day + entry_rule.get("min_dte", 0)
+    if not expiry_ok.any():
+        return None
+    e = int(np.argmax(expiry_ok))
+    expiry = entry.expiries[e]
+    k = int(entry.strike_index([entry.nearest_strike(spot + entry_rule.get("strike_offset", 0.0))])[0])
+
+    if ("entry", start) not in grid_cache:
+        grid_cache[("entry", start)] = (
+            entry_credit_grid(entry, legs, wing_width),
+            *max_profit_loss_grid(entry, legs, wing_width),
+        )
+    credit, max_profit, max_loss = (g[e, k] for g in grid_cache[("entry", start)])
+    if np.isnan(credit):
+        return None
+
+    anchor = entry.strikes[k]
+    exit_time = exit_rule.get("exit_time")
+    exit_minute = _hhmm(exit_time) if exit_time else None
+    target = exit_rule.get("profit_target")
+    stop = exit_rule.get("stop_loss")
+
+    exit_ts, pnl, reason = None, None, "expiry"
+    for j in range(start + 1, len(snapshots)):
+        g = snapshots[j]
+        if g.timestamp.astype("datetime64[D]") > expiry:
+            break
+        e2 = np.searchsorted(g.expiries, expiry)
+        k2 = g.strike_index([anchor])[0]
+        if e2 >= len(g.expiries) or g.expiries[e2] != expiry or k2 < 0:
+            continue
+        if ("exit", j) not in grid_cache:
+            grid_cache[("exit", j)] = exit_cost_grid(g, legs, wing_width)
+        cost = grid_cache[("exit", j)][e2, k2]
+        if np.isnan(cost):
+            continue
+        current = credit - cost
+        if target is not None and current >= target * max_profit:
+            exit_ts, pnl, reason = g.timestamp, current, "profit-target"
+            break
+        if stop is not None and current <= -stop * max_loss:
+            exit_ts, pnl, reason = g.timestamp, current, "stop-loss"
+            break
+        if exit_minute is not None and _weekday(g.timestamp) == exit_rule["exit_weekday"] \
+                and _minute_of_day(g.timestamp) >= exit_minute:
+            exit_ts, pnl, reason = g.timestamp, current, "scheduled"
+            break
+
+    if pnl is None:
+        # no price on the expiry date means the path ends early; settling on a stale price would be wrong
+        settle = settle_price(stamps, prices, expiry)
+        if np.isnan(settle):
+            return None
+        payoff = payoff_grid([anchor], legs, wing_width, [settle])[0, 0]
+        exit_ts, pnl = np.datetime64(str(expiry) + "T16:00", "m"), credit + payoff
+
+    return {
+        "entry_time": str(entry.timestamp),
+        "exit_time": str(exit_ts),
+        "expiry": str(expiry),
+        "strike": float(anchor),
+        "spot": float(spot),
+        "credit": float(credit * CONTRACT_MULTIPLIER),
+        "max_profit": float(max_profit * CONTRACT_MULTIPLIER),
+        "max_loss": float(max_loss * CONTRACT_MULTIPLIER),
+        "pnl": float(pnl * CONTRACT_MULTIPLIER),
+        "reason": reason,
+    }
+
+
+def summarize(trades):
+    """Headline stats for a list of trade dicts."""
+    pnl = np.array([t["pnl"] for t in trades]) if trades else np.zeros(0)
+    risk = np.array([t["max_loss"] for t in trades]) if trades else np.zeros(0)
+    equity = np.cumsum(pnl)
+    drawdown = (np.maximum.accumulate(np.concatenate([[0.0], equity])) - np.concatenate([[0.0], equity])).max()
+    return {
+        "trades": len(trades),
+        "wins": int((pnl > 0).sum()),
+        "win_rate": float((pnl > 0).mean() * 100) if len(pnl) else 0.0,
+        "total_pnl": float(pnl.sum()),
+        "avg_pnl": float(pnl.mean()) if len(pnl) else 0.0,
+        "max_drawdown": float(drawdown),
+        "return_on_capital": float(pnl.sum() / risk.sum() * 100) if risk.sum() > 0 else 0.0,
+    }
+
+
+def run_variants(snapshots, stamps, prices, strategy, wing_width=None, quantity=1,
+                 entry_rules=None, liquidation_rules=None):
+    """Run every entry x liquidation rule combination; returns {(entry, exit): (summary, trades)}."""
+    legs = STRATEGY_LEGS[strategy]
+    wing_width = wing_width or DEFAULT_WING_WIDTH[strategy]
+    entry_rules = entry_rules or ENTRY_RULES
+    liquidation_rules = liquidation_rules or LIQUIDATION_RULES
+
+    results, grid_cache = {}, {}
+    for entry_name, entry_rule in entry_rules.items():
+        starts = find_entries(snapshots, entry_rule)
+        for exit_name, exit_rule in liquidation_rules.items():
+            trades = []
+            for start in starts:
+                trade = simulate_trade(snapshots, stamps, prices, start, legs, wing_width, entry_rule, exit_rule, grid_cache)
+                if trade:
+                    for key in ("credit", "max_profit", "max_loss", "pnl"):
+                        trade[key] *= quantity
+                    trades.append(trade)
+            results[(entry_name, exit_name)] = (summarize(trades), trades)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backtest defined-risk options spreads from local fixtures.")
+    parser.add_argument("underlying", help="underlying price CSV (timestamp,price)")
+    parser.add_argument("chains", help="directory of option-chain snapshot JSON files")
+    parser.add_argument("--strategy", choices=sorted(STRATEGY_LEGS), default="iron-butterfly")
+    parser.add_argument("--wing-width", type=float, help="distance from ATM to the long strikes")
+    parser.add_argument("--quantity", type=int, default=1, help="contracts per leg")
+    parser.add_argument("--trades-out", help="write every trade of every variant to this CSV")
+    args = parser.parse_args()
+
+    stamps, prices = load_underlying(args.underlying)
+    snapshots = load_chain_snapshots(args.chains)
+    print(f"Loaded {len(prices)} underlying prices and {len(snapshots)} chain snapshots.\n")
+
+    results = run_variants(snapshots, stamps, prices, args.strategy, args.wing_width, args.quantity)
+
+    print(f"  {'entry rule':<20} {'liquidation rule':<16} {'trades':>6} {'win %':>6} {'total P/L':>11} {'max DD':>9} {'ROC %':>7}")
+    for (entry_name, exit_name), (stats, _) in results.items():
+        print(f"  {entry_name:<20} {exit_name:<16} {stats['trades']:>6} {stats['win_rate']:>6.1f} "
+              f"{stats['total_pnl']:>11.2f} {stats['max_drawdown']:>9.2f} {stats['return_on_capital']:>7.1f}")
+
+    if args.trades_out:
+        fields = ["entry_rule", "liquidation_rule", "entry_time", "exit_time", "expiry", "strike",
+                  "spot", "credit", "max_profit", "max_loss", "pnl", "reason"]
+        with open(args.trades_out, "w", encoding="utf-8", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=fields)
+            writer.writeheader()
+            for (entry_name, exit_name), (_, trades) in results.items():
+                for t in trades:
+                    row = {k: round(v, 2) if isinstance(v, float) else v for k, v in t.items()}
+                    writer.writerow({"entry_rule": entry_name, "liquidation_rule": exit_name, **row})
+        print(f"\nTrades written to {args.trades_out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,362 @@
+#!/usr/bin/env python3
+"""
+Incrementally maintained order and position ledger for the portfolio flows.
+
+The FAANG, Crypto and Bitcoin ETF Portfolio flows recompute their P/L from
+scratch: "calculate net trades in strategy" filters the whole ordersPaper
+table by the strategy's start date and tickers and sums
+filled_qty * filled_avg_price (negative for buys), then "get market value"
+filters every position by symbol each minute and adds the market values.
+Ledger keeps that state running instead:
+
+  * fills are indexed by (account, symbol) in filled_at order, so any date
+    range is a bisect away, and each strategy keeps per-symbol net quantity,
+    average-cost basis, realized P/L and net trades plus a per-day net-trades
+    index;
+  * ingest() takes the orders table as often as it is refreshed; orders already
+    applied are skipped by id, and a partial fill that grows is applied as the
+    difference only;
+  * mark() moves a symbol's price and adjusts the market value of every
+    strategy holding it, so valuing a strategy is a lookup, not a scan.
+
+Symbols are keyed the way Alpaca reports positions (BTC/USD -> BTCUSD) so crypto
+orders and positions meet. Strategy market value is the ledger's quantity times
+the marked price; it equals the flows' figure as long as the strategy's symbols
+were not already held before its start date.
+
+Usage:
+    python order_ledger.py "trading-flows/Create FAANG Portfolio.json" --stub
+    python order_ledger.py trading-flows/Create*Portfolio.json \\
+        --orders orders_paper.json --positions positions.json --state ledger.json
+"""
+
+import argparse
+import bisect
+import json
+import os
+import re
+import time
+from datetime import datetime, timezone
+
+from date_util import parse_time
+from portfolio_rebalancer import load_flow_strategy, normalize_symbol
+
+DEFAULT_ACCOUNT = "paper"
+QTY_EPSILON = 1e-9
+
+CUTOFF_RE = re.compile(r'const cutoff = new Date\("([^"]+)"\)')
+GAINLOSS_RE = re.compile(r'global\.set\("(\w+)Gainloss"')
+
+
+def utc_date(ts):
+    return datetime.fromtimestamp(ts, timezone.utc).strftime("%Y-%m-%d")
+
+
+def _number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def strategy_from_flow(path):
+    """{"name", "tickers", "portfolio_size", "start"} from a portfolio flow export."""
+    strategy = load_flow_strategy(path)
+    with open(path, "r", encoding="utf-8") as f:
+        nodes = json.load(f)
+    start, name = None, None
+    for node in nodes:
+        func = node.get("func", "")
+        if node.get("name") == "calculate net trades in strategy":
+            match = CUTOFF_RE.search(func)
+            start = match.group(1) if match else None
+        elif node.get("name") == "get market value":
+            match = GAINLOSS_RE.search(func)
+            name = match.group(1) if match else None
+    return {
+        "name": name or path.rsplit("/", 1)[-1].rsplit(".", 1)[0],
+        "tickers": strategy["tickers"],
+        "portfolio_size": strategy["portfolio_size"],
+        "start": start,
+    }
+
+
+# ── running state ───────────────────────────────────────────────────────
+
+class Holding:
+    """One symbol inside one strategy: net quantity, average-cost basis and cash flows."""
+
+    FIELDS = ("qty", "cost_basis", "realized", "net_trades")
+
+    def __init__(self, qty=0.0, cost_basis=0.0, realized=0.0, net_trades=0.0):
+        self.qty = qty
+        self.cost_basis = cost_basis
+        self.realized = realized
+        self.net_trades = net_trades
+
+    def apply(self, qty, price):
+        """Apply a signed fill (buys positive); returns the change in cost basis."""
+        before = self.cost_basis
+        self.net_trades -= qty * price
+        if abs(self.qty) < QTY_EPSILON or (self.qty > 0) == (qty > 0):
+            self.cost_basis += qty * price
+            self.qty += qty
+        else:
+            avg = self.cost_basis / self.qty
+            closed = qty if abs(qty) <= abs(self.qty) else -self.qty
+            self.realized += closed * (avg - price)
+            self.cost_basis += closed * avg
+            self.qty += closed
+            rest = qty - closed
+            if abs(rest) > QTY_EPSILON:
+                self.cost_basis = rest * price
+                self.qty = rest
+        if abs(self.qty) < QTY_EPSILON:
+            self.qty, self.cost_basis = 0.0, 0.0
+        return self.cost_basis - before
+
+    def to_dict(self):
+        return {f: getattr(self, f) for f in self.FIELDS}
+
+
+class Strategy:
+    """Running totals for one strategy: a ticker set traded in one account since a start time."""
+
+    def __init__(self, name, tickers, account=DEFAULT_ACCOUNT, start=None, portfolio_size=0.0):
+        self.name = name
+        self.account = account
+        self.tickers = [t.strip() for t in tickers if t.strip()]
+        self.symbols = {normalize_symbol(t) for t in self.tickers}
+        self.start = start
+        self.start_ts = None if start is None else parse_time(start)
+        self.portfolio_size = float(portfolio_size or 0.0)
+        self.holdings = {}          # symbol -> Holding
+        self.daily = {}             # YYYY-MM-DD -> net trades that day
+        self.net_trades = 0.0
+        self.cost_basis = 0.0
+        self.market_value = 0.0
+
+    def includes(self, ts):
+        # the flows keep fills strictly after the cutoff
+        return self.start_ts is None or ts > self.start_ts
+
+    def gainloss(self):
+        """The flows' strategy<Name>Gainloss / Gainlosspct: net trades plus market value."""
+        gainloss = self.net_trades + self.market_value
+        pct = gainloss / self.portfolio_size * 100.0 if self.portfolio_size else 0.0
+        return {"net_trades": round(self.net_trades, 2), "market_value": round(self.market_value, 2),
+                "gainloss": round(gainloss, 2), "gainlosspct": round(pct, 2)}
+
+    def to_dict(self):
+        return {
+            "name": self.name, "account": self.account, "tickers": self.tickers, "start": self.start,
+            "portfolio_size": self.portfolio_size, "daily": self.daily,
+            "holdings": {s: h.to_dict() for s, h in self.holdings.items()},
+        }
+
+
+class Ledger:
+    """Fills indexed by account, symbol and time, with per-strategy running P/L."""
+
+    def __init__(self):
+        self.strategies = {}        # name -> Strategy
+        self.by_symbol = {}         # (account, symbol) -> [Strategy]
+        self.holders = {}           # symbol -> [Strategy] across accounts, for mark()
+        self.fills = {}             # (account, symbol) -> sorted [(ts, order_id, signed_qty, price)]
+        self.applied = {}           # (account, order_id) -> [filled_qty, filled_avg_price]
+        self.prices = {}            # symbol -> last marked price
+
+    def add_strategy(self, strategy):
+        """Register a strategy and replay the fills already in the ledger into it."""
+        if strategy.name in self.strategies:
+            raise ValueError(f"strategy {strategy.name!r} is already registered")
+        self.strategies[strategy.name] = strategy
+        for symbol in strategy.symbols:
+            key = (strategy.account, symbol)
+            self.by_symbol.setdefault(key, []).append(strategy)
+            self.holders.setdefault(symbol, []).append(strategy)
+            for ts, _, qty, price in self.fills.get(key, ()):
+                if strategy.includes(ts):
+                    self._apply(strategy, symbol, ts, qty, price)
+        return strategy
+
+    def _apply(self, strategy, symbol, ts, qty, price):
+        holding = strategy.holdings.get(symbol)
+        if holding is None:
+            holding = strategy.holdings[symbol] = Holding()
+        strategy.cost_basis += holding.apply(qty, price)
+        strategy.net_trades -= qty * price
+        day = utc_date(ts)
+        strategy.daily[day] = strategy.daily.get(day, 0.0) - qty * price
+        mark = self.prices.get(symbol)
+        if mark is not None:
+            strategy.market_value += qty * mark
+
+    def add_fill(self, symbol, side, qty, price, filled_at, order_id=None, account=DEFAULT_ACCOUNT):
+        """Record one fill and fold it into every strategy trading the symbol in that account."""
+        symbol = normalize_symbol(symbol)
+        ts = parse_time(filled_at)
+        signed = qty if side == "buy" else -qty
+        key = (account, symbol)
+        bisect.insort(self.fills.setdefault(key, []), (ts, order_id or "", signed, price))
+        for strategy in self.by_symbol.get(key, ()):
+            if strategy.includes(ts):
+                self._apply(strategy, symbol, ts, signed, price)
+
+    def ingest(self, orders, account=DEFAULT_ACCOUNT):
+        """Apply new or grown fills from an orders listing (ordersPaper rows); returns how many changed."""
+        changed = 0
+        for order in orders:
+            if not order.get("filled_at"):
+                continue
+            qty, price = _number(order.get("filled_qty")), _number(order.get("filled_avg_price"))
+            if not qty or price is None:
+                continue
+            key = (account, order.get("id") or order.get("client_order_id"))
+            seen_qty, seen_price = self.applied.get(key, (0.0, 0.0))
+            delta = qty - seen_qty
+            if abs(delta) < QTY_EPSILON:
+                continue
+            # cumulative average price -> the price of just the newly filled part
+            delta_price = (qty * price - seen_qty * seen_price) / delta
+            self.add_fill(order["symbol"], order.get("side"), delta, delta_price, order["filled_at"],
+                          order_id=key[1], account=account)
+            self.applied[key] = [qty, price]
+            changed += 1
+        return changed
+
+    def mark(self, symbol, price):
+        """Move a symbol's price; market values of the strategies holding it follow."""
+        symbol = normalize_symbol(symbol)
+        old = self.prices.get(symbol, 0.0)
+        self.prices[symbol] = price
+        for strategy in self.holders.get(symbol, ()):
+            holding = strategy.holdings.get(symbol)
+            if holding is not None:
+                strategy.market_value += holding.qty * (price - old)
+
+    def mark_positions(self, rows):
+        """mark() every symbol in a GET /v2/positions response at its current_price."""
+        for row in rows:
+            price = _number(row.get("current_price"))
+            if price is None:
+                qty, value = _number(row.get("qty")), _number(row.get("market_value"))
+                price = value / qty if qty and value is not None else None
+            if price is not None:
+                self.mark(row["symbol"], price)
+
+    def fills_between(self, symbol, start=None, end=None, account=DEFAULT_ACCOUNT):
+        """Fills of one symbol with start <= filled_at < end, as (ts, order_id, signed_qty, price)."""
+        rows = self.fills.get((account, normalize_symbol(symbol)), [])
+        lo = 0 if start is None else bisect.bisect_left(rows, (parse_time(start),))
+        hi = len(rows) if end is None else bisect.bisect_left(rows, (parse_time(end),))
+        return rows[lo:hi]
+
+    def report(self):
+        return {name: s.gainloss() for name, s in self.strategies.items()}
+
+    # ── persistence ──
+
+    def to_dict(self):
+        return {
+            "strategies": [s.to_dict() for s in self.strategies.values()],
+            "fills": [[account, symbol, rows] for (account, symbol), rows in self.fills.items()],
+            "applied": [[account, order_id, seen] for (account, order_id), seen in self.applied.items()],
+            "prices": self.prices,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """Restore a saved ledger without replaying its fills."""
+        ledger = cls()
+        ledger.prices = dict(data.get("prices", {}))
+        ledger.fills = {(a, s): [tuple(r) for r in rows] for a, s, rows in data.get("fills", [])}
+        ledger.applied = {(a, o): seen for a, o, seen in data.get("applied", [])}
+        for saved in data.get("strategies", []):
+            strategy = Strategy(saved["name"], saved["tickers"], saved["account"], saved["start"],
+                                saved["portfolio_size"])
+            strategy.daily = dict(saved.get("daily", {}))
+            for symbol, fields in saved.get("holdings", {}).items():
+                holding = strategy.holdings[symbol] = Holding(**fields)
+                strategy.net_trades += holding.net_trades
+                strategy.cost_basis += holding.cost_basis
+                strategy.market_value += holding.qty * ledger.prices.get(symbol, 0.0)
+            ledger.strategies[strategy.name] = strategy
+            for symbol in strategy.symbols:
+                ledger.by_symbol.setdefault((strategy.account, symbol), []).append(strategy)
+                ledger.holders.setdefault(symbol, []).append(strategy)
+        return ledger
+
+    def save(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "r", encoding="utf-8") as f:
+            return cls.from_dict(json.load(f))
+
+
+# ── CLI ─────────────────────────────────────────────────────────────────
+
+def print_report(ledger):
+    for name, r in ledger.report().items():
+        print(f"  {name:<16} net trades ${r['net_trades']:>12,.2f}  market value ${r['market_value']:>12,.2f}  "
+              f"gain/loss ${r['gainloss']:>10,.2f} ({r['gainlosspct']:.2f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain strategy net trades and market value from order fills.")
+    parser.add_argument("flows", nargs="+", help="portfolio flow exports (Create * Portfolio.json)")
+    parser.add_argument("--orders", help="orders listing (ordersPaper / GET /v2/orders?status=all), JSON")
+    parser.add_argument("--positions", help="GET /v2/positions response (JSON) to mark prices from")
+    parser.add_argument("--account", default=DEFAULT_ACCOUNT, help="account the orders belong to")
+    parser.add_argument("--state", help="ledger state file: loaded if present, saved afterwards")
+    parser.add_argument("--stub", action="store_true", help="buy each flow's portfolio on a seeded alpaca_stub broker")
+    args = parser.parse_args()
+
+    ledger = Ledger.load(args.state) if args.state and os.path.exists(args.state) else Ledger()
+    for path in args.flows:
+        spec = strategy_from_flow(path)
+        if spec["name"] not in ledger.strategies:
+            ledger.add_strategy(Strategy(spec["name"], spec["tickers"], args.account, spec["start"],
+                                         spec["portfolio_size"]))
+
+    orders, positions = [], []
+    if args.stub:
+        import alpaca_stub
+        from portfolio_rebalancer import equal_weights
+        market = alpaca_stub.MarketReplay(seed=0)
+        broker = alpaca_stub.Broker(market, cash=1e7)
+        for strategy in ledger.strategies.values():
+            for ticker, weight in equal_weights(strategy.tickers).items():
+                ask = market.quote(ticker)[3]
+                broker.submit({"symbol": ticker, "qty": round(strategy.portfolio_size * weight / ask, 6),
+                               "side": "buy", "type": "market"})
+        orders = list(broker.orders.values())
+        positions = broker.positions_json()
+    else:
+        if args.orders:
+            with open(args.orders, "r", encoding="utf-8") as f:
+                orders = json.load(f)
+        if args.positions:
+            with open(args.positions, "r", encoding="utf-8") as f:
+                positions = json.load(f)
+
+    started = time.perf_counter()
+    changed = ledger.ingest(orders, account=args.account)
+    ledger.mark_positions(positions)
+    elapsed = time.perf_counter() - started
+    again = ledger.ingest(orders, account=args.account)
+    print(f"  Ingested {changed} new fills of {len(orders)} orders ({again} on re-ingest); "
+          f"marked {len(positions)} positions in {elapsed * 1000:.2f} ms.\n")
+    print_report(ledger)
+
+    if args.state:
+        ledger.save(args.state)
+    print(f"\nDone! {len(ledger.strategies)} strategies, "
+          f"{sum(len(rows) for rows in ledger.fills.values())} fills in the ledger.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,443 @@
+#!/usr/bin/env python3
+"""
+Portfolio analytics for the account reports.
+
+reports/*.html display Daily P/L, Daily %, Cumulative Profit, Cumulative %,
+Annualized % and Sharpe Ratio straight out of alpaca_portfolio_history_*.csv.
+This module derives those columns, plus drawdown and volatility, from the raw
+Date / Equity / Cash Flow series:
+
+  * Daily P/L is the equity change net of that day's cash flow, so deposits and
+    withdrawals are not counted as profit.
+  * Daily % divides it by the previous equity plus the cash flow (flows are
+    assumed to land at the start of the day); Cumulative % is the time-weighted
+    return chained from the daily returns.
+  * Annualized % and Sharpe Ratio use 252 trading days; Sharpe uses the
+    sample standard deviation of daily returns with a zero risk-free rate.
+
+derive_metrics() works on one series or a (dates x accounts) matrix at once.
+RunningStats keeps the same statistics as O(1) running state, so appending a
+trading day updates every account without re-reading its history.
+
+Usage:
+    python portfolio_analytics.py csvfiles/                     # summary for every account
+    python portfolio_analytics.py csvfiles/ --write             # rewrite derived columns
+    python portfolio_analytics.py csvfiles/ --append NikkiLive 2026-01-05 10523.18 [500]
+"""
+
+import argparse
+import csv
+import glob
+import json
+import os
+
+import numpy as np
+
+from date_util import iso_date
+
+WORKSPACE = os.path.dirname(os.path.abspath(__file__))
+CSV_DIR = os.path.join(WORKSPACE, "csvfiles")
+CSV_PREFIX = "alpaca_portfolio_history_"
+# Running state for --append lives outside csvfiles/, which nginx serves publicly
+STATE_DIR = os.path.join(WORKSPACE, ".portfolio-stats")
+
+TRADING_DAYS = 252
+
+# Column layout of /csvfiles/alpaca_portfolio_history_*.csv (see reports/_template.html)
+PORTFOLIO_HISTORY_COLUMNS = [
+    "Date",
+    "Equity",
+    "Cash Flow",
+    "Daily P/L",
+    "Daily %",
+    "Cumulative Profit",
+    "Cumulative %",
+    "Annualized %",
+    "Sharpe Ratio",
+]
+
+
+# ── loading ─────────────────────────────────────────────────────────────
+
+def _float(value):
+    value = (value or "").strip().replace("$", "").replace(",", "")
+    return float(value) if value else np.nan
+
+
+def load_history(path, extra=()):
+    """Read one portfolio-history CSV into {"Date", "Equity", "Cash Flow"} arrays.
+
+    Columns named in extra are read as float arrays too when the file has them;
+    any other column is ignored.
+    """
+    dates, equity, cash_flow = [], [], []
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        reader = csv.DictReader(f)
+        columns = {col: [] for col in extra if col in (reader.fieldnames or ())}
+        for row in reader:
+            if not row.get("Date"):
+                continue
+            dates.append(iso_date(row["Date"]))
+            equity.append(_float(row.get("Equity")))
+            cash_flow.append(_float(row.get("Cash Flow")))
+            for col, values in columns.items():
+                values.append(_float(row.get(col)))
+    return {
+        "Date": np.array(dates, dtype="datetime64[D]"),
+        "Equity": np.array(equity),
+        "Cash Flow": np.array(cash_flow),
+        **{col: np.array(values) for col, values in columns.items()},
+    }
+
+
+def account_name(path):
+    """alpaca_portfolio_history_NikkiLive.csv -> NikkiLive"""
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return stem[len(CSV_PREFIX):] if stem.startswith(CSV_PREFIX) else stem
+
+
+def history_path(csv_dir, account):
+    return os.path.join(csv_dir, f"{CSV_PREFIX}{account}.csv")
+
+
+def load_accounts(csv_dir=CSV_DIR, extra=()):
+    """Every alpaca_portfolio_history_*.csv in csv_dir, keyed by account name (extra as in load_history)."""
+    paths = sorted(glob.glob(os.path.join(csv_dir, f"{CSV_PREFIX}*.csv")))
+    return {account_name(p): load_history(p, extra) for p in paths}
+
+
+def align(histories, field="Equity"):
+    """Stack several histories on their union of dates -> (dates, names, (dates x accounts) matrix)."""
+    names = list(histories)
+    if not names:
+        return np.array([], dtype="datetime64[D]"), names, np.zeros((0, 0))
+    dates = np.unique(np.concatenate([histories[n]["Date"] for n in names]))
+    out = np.full((len(dates), len(names)), np.nan)
+    for j, n in enumerate(names):
+        out[np.searchsorted(dates, histories[n]["Date"]), j] = histories[n][field]
+    return dates, names, out
+
+
+# ── vectorized metrics ──────────────────────────────────────────────────
+
+def ffill(x):
+    """Forward-fill NaNs along axis 0 of a 2-D array."""
+    idx = np.where(~np.isnan(x), np.arange(x.shape[0])[:, None], 0)
+    np.maximum.accumulate(idx, axis=0, out=idx)
+    return x[idx, np.arange(x.shape[1])]
+
+
+def derive_metrics(equity, cash_flow=None, base=None):
+    """All report metrics for a (T,) series or a (T, accounts) matrix with NaN where an account has no row.
+
+    base is the equity before the first row (e.g. a backtest's starting capital);
+    without it the first row of each account carries no return.
+    Returns a dict of arrays shaped like equity.
+    """
+    equity = np.asarray(equity, dtype=float)
+    squeeze = equity.ndim == 1
+    eq = equity[:, None] if squeeze else equity
+    cf = np.zeros_like(eq) if cash_flow is None else np.asarray(cash_flow, dtype=float).reshape(eq.shape)
+    cf = np.nan_to_num(cf)
+
+    valid = ~np.isnan(eq)
+    filled = ffill(eq)
+    prev = np.vstack([np.full((1, eq.shape[1]), np.nan if base is None else base), filled[:-1]])
+    has_ret = valid & ~np.isnan(prev)
+
+    with np.errstate(invalid="ignore", divide="ignore", over="ignore"):
+        pnl = np.where(has_ret, eq - prev - cf, 0.0)
+        denom = prev + cf
+        r = np.where(has_ret & (denom > 0), pnl / denom, 0.0)
+
+        n = np.cumsum(has_ret, axis=0)
+        growth = np.cumprod(1.0 + r, axis=0)
+        cum_profit = np.cumsum(pnl, axis=0)
+        annualized = np.where(n > 0, np.power(growth, TRADING_DAYS / np.maximum(n, 1)) - 1.0, 0.0)
+
+        s1 = np.cumsum(r, axis=0)
+        s2 = np.cumsum(r * r, axis=0)
+        mean = np.where(n > 0, s1 / np.maximum(n, 1), 0.0)
+        var = np.where(n > 1, np.maximum(s2 - n * mean * mean, 0.0) / np.maximum(n - 1, 1), 0.0)
+        sd = np.sqrt(var)
+        sharpe = np.where(sd > 0, mean / sd * np.sqrt(TRADING_DAYS), 0.0)
+
+        peak = np.maximum.accumulate(growth, axis=0)
+        drawdown = growth / peak - 1.0
+        max_drawdown = np.minimum.accumulate(drawdown, axis=0)
+
+    out = {
+        "Daily P/L": pnl,
+        "Daily %": r * 100.0,
+        "Cumulative Profit": cum_profit,
+        "Cumulative %": (growth - 1.0) * 100.0,
+        "Annualized %": annualized * 100.0,
+        "Sharpe Ratio": sharpe,
+        "Volatility %": sd * np.sqrt(TRADING_DAYS) * 100.0,
+        "Drawdown %": drawdown * 100.0,
+        "Max Drawdown %": max_drawdown * 100.0,
+    }
+    for k, v in out.items():
+        v[~valid] = np.nan
+        out[k] = v[:, 0] if squeeze else v
+    return out
+
+
+def history_columns(dates, equity, cash_flow=None, base=None):
+    """Full portfolio-history columns (report layout plus drawdown/volatility) for one series."""
+    metrics = derive_metrics(equity, cash_flow, base)
+    return {
+        "Date": np.asarray(dates).astype("datetime64[D]").astype(str),
+        "Equity": np.asarray(equity, dtype=float),
+        "Cash Flow": np.full(len(equity), np.nan) if cash_flow is None else np.asarray(cash_flow, dtype=float),
+        **metrics,
+    }
+
+
+def format_row(columns, i, fields=PORTFOLIO_HISTORY_COLUMNS):
+    """One CSV row of history columns; NaN becomes an empty cell."""
+    row = []
+    for col in fields:
+        v = columns[col][i]
+        if col == "Date":
+            row.append(str(v))
+        elif v is None or np.isnan(v):
+            row.append("")
+        else:
+            row.append(f"{v:.4f}" if col == "Sharpe Ratio" else f"{v:.2f}")
+    return row
+
+
+def write_history(path, columns):
+    """Write history columns to CSV in the report layout."""
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(PORTFOLIO_HISTORY_COLUMNS)
+        for i in range(len(columns["Date"])):
+            writer.writerow(format_row(columns, i))
+
+
+# ── incremental updates ─────────────────────────────────────────────────
+
+class RunningStats:
+    """O(1)-per-day running state for one or many accounts (scalars or aligned arrays).
+
+    Holds Welford mean/M2 of daily returns, the time-weighted growth index, its
+    peak, max drawdown, cumulative profit and last equity; update() appends one
+    day and returns that day's report metrics.
+    """
+
+    FIELDS = ("n", "mean", "m2", "growth", "peak", "max_drawdown", "cum_profit", "last_equity")
+
+    def __init__(self, n=0, mean=0.0, m2=0.0, growth=1.0, peak=1.0, max_drawdown=0.0,
+                 cum_profit=0.0, last_equity=np.nan):
+        self.n = np.asarray(n, dtype=float)
+        self.mean = np.asarray(mean, dtype=float)
+        self.m2 = np.asarray(m2, dtype=float)
+        self.growth = np.asarray(growth, dtype=float)
+        self.peak = np.asarray(peak, dtype=float)
+        self.max_drawdown = np.asarray(max_drawdown, dtype=float)
+        self.cum_profit = np.asarray(cum_profit, dtype=float)
+        self.last_equity = np.asarray(last_equity, dtype=float)
+
+    @classmethod
+    def from_history(cls, equity, cash_flow=None, base=None):
+        """Running state equal to having fed the whole series (or matrix) through update()."""
+        eq = np.asarray(equity, dtype=float)
+        squeeze = eq.ndim == 1
+        eq = eq[:, None] if squeeze else eq
+        cf = None if cash_flow is None else np.asarray(cash_flow, dtype=float).reshape(eq.shape)
+        m = derive_metrics(eq, cf, base)
+
+        filled = ffill(eq)
+        prev = np.vstack([np.full((1, eq.shape[1]), np.nan if base is None else base), filled[:-1]])
+        n = (~np.isnan(eq) & ~np.isnan(prev)).sum(axis=0)
+
+        def last(key):
+            return np.nan_to_num(ffill(m[key])[-1])
+
+        growth = 1.0 + last("Cumulative %") / 100.0
+        sd = last("Volatility %") / 100.0 / np.sqrt(TRADING_DAYS)
+        state = cls(
+            n=n,
+            mean=np.where(n > 0, np.nansum(m["Daily %"], axis=0) / 100.0 / np.maximum(n, 1), 0.0),
+            m2=sd * sd * np.maximum(n - 1, 0),
+            growth=growth,
+            peak=growth / (1.0 + last("Drawdown %") / 100.0),
+            max_drawdown=last("Max Drawdown %") / 100.0,
+            cum_profit=last("Cumulative Profit"),
+            last_equity=filled[-1],
+        )
+        if squeeze:
+            for f in cls.FIELDS:
+                setattr(state, f, getattr(state, f)[0])
+        return state
+
+    def update(self, equity, cash_flow=0.0):
+        """Append one trading day; returns the derived metrics for that day."""
+        equity = np.asarray(equity, dtype=float)
+        cf = np.nan_to_num(np.asarray(cash_flow, dtype=float))
+        active = ~np.isnan(equity)
+        has_ret = active & ~np.isnan(self.last_equity)
+
+        with np.errstate(invalid="ignore", divide="ignore", over="ignore"):
+            pnl = np.where(has_ret, equity - self.last_equity - cf, 0.0)
+            denom = self.last_equity + cf
+            r = np.where(has_ret & (denom > 0), pnl / denom, 0.0)
+
+            n = self.n + has_ret
+            delta = r - self.mean
+            mean = np.where(has_ret, self.mean + delta / np.maximum(n, 1), self.mean)
+            m2 = np.where(has_ret, self.m2 + delta * (r - mean), self.m2)
+            growth = self.growth * (1.0 + r)
+            peak = np.maximum(self.peak, growth)
+            drawdown = growth / peak - 1.0
+            max_drawdown = np.minimum(self.max_drawdown, drawdown)
+
+            self.n, self.mean, self.m2 = n, mean, m2
+            self.growth, self.peak, self.max_drawdown = growth, peak, max_drawdown
+            self.cum_profit = self.cum_profit + pnl
+            self.last_equity = np.where(active, equity, self.last_equity)
+
+            var = np.where(n > 1, m2 / np.maximum(n - 1, 1), 0.0)
+            sd = np.sqrt(var)
+            annualized = np.where(n > 0, np.power(growth, TRADING_DAYS / np.maximum(n, 1)) - 1.0, 0.0)
+            sharpe = np.where(sd > 0, mean / sd * np.sqrt(TRADING_DAYS), 0.0)
+
+        return {
+            "Daily P/L": pnl,
+            "Daily %": r * 100.0,
+            "Cumulative Profit": self.cum_profit,
+            "Cumulative %": (growth - 1.0) * 100.0,
+            "Annualized %": annualized * 100.0,
+            "Sharpe Ratio": sharpe,
+            "Volatility %": sd * np.sqrt(TRADING_DAYS) * 100.0,
+            "Drawdown %": drawdown * 100.0,
+            "Max Drawdown %": max_drawdown * 100.0,
+        }
+
+    def to_dict(self):
+        return {f: np.asarray(getattr(self, f)).tolist() for f in self.FIELDS}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**{f: data[f] for f in cls.FIELDS})
+
+
+def state_path(csv_path):
+    return os.path.join(STATE_DIR, os.path.basename(csv_path) + ".stats.json")
+
+
+def load_state(csv_path):
+    """Running state saved next to a history CSV, rebuilt from the CSV if missing or stale."""
+    path = state_path(csv_path)
+    if os.path.exists(path) and os.path.getmtime(path) >= os.path.getmtime(csv_path):
+        with open(path, "r", encoding="utf-8") as f:
+            return RunningStats.from_dict(json.load(f))
+    h = load_history(csv_path)
+    return RunningStats.from_history(h["Equity"], h["Cash Flow"])
+
+
+def save_state(csv_path, state):
+    os.makedirs(STATE_DIR, exist_ok=True)
+    with open(state_path(csv_path), "w", encoding="utf-8") as f:
+        json.dump(state.to_dict(), f)
+
+
+def last_date(csv_path, tail=4096):
+    """ISO date of a history CSV's last row, read from the end of the file; None if it has no rows."""
+    with open(csv_path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        f.seek(max(f.tell() - tail, 0))
+        lines = f.read().decode("utf-8", errors="replace").splitlines()
+    for line in reversed(lines):
+        cell = line.split(",", 1)[0].strip().strip('"')
+        if cell and cell != "Date":
+            try:
+                return iso_date(cell)
+            except ValueError:
+                continue
+    return None
+
+
+def append_day(csv_path, date, equity, cash_flow=None):
+    """Append one day to a history CSV using the saved running state (no full recompute).
+
+    The date must be after the CSV's last row; re-running a day would fold it
+    into the running state twice.
+    """
+    date = iso_date(date)
+    last = last_date(csv_path)
+    if last is not None and date <= last:
+        raise ValueError(f"{os.path.basename(csv_path)} already has rows through {last}; not appending {date}")
+    state = load_state(csv_path)
+    metrics = state.update(equity, 0.0 if cash_flow is None else cash_flow)
+    columns = {k: [float(v)] for k, v in metrics.items()}
+    columns["Date"] = [date]
+    columns["Equity"] = [float(equity)]
+    columns["Cash Flow"] = [np.nan if cash_flow is None else float(cash_flow)]
+    with open(csv_path, "a", encoding="utf-8", newline="") as f:
+        csv.writer(f).writerow(format_row(columns, 0))
+    save_state(csv_path, state)
+    return metrics
+
+
+def summarize(histories):
+    """Latest headline metrics per account, computed for all accounts in one aligned pass."""
+    dates, names, equity = align(histories, "Equity")
+    _, _, cash_flow = align(histories, "Cash Flow")
+    m = derive_metrics(equity, cash_flow)
+    summary = {}
+    for j, name in enumerate(names):
+        rows = np.nonzero(~np.isnan(equity[:, j]))[0]
+        if not len(rows):
+            continue
+        last = rows[-1]
+        summary[name] = {
+            "start": str(dates[rows[0]]),
+            "end": str(dates[last]),
+            "days": int(len(rows)),
+            "equity": float(equity[last, j]),
+            **{k: float(v[last, j]) for k, v in m.items() if k not in ("Daily P/L", "Daily %", "Drawdown %")},
+        }
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Derive report metrics from portfolio-history CSVs.")
+    parser.add_argument("csv_dir", nargs="?", default=CSV_DIR)
+    parser.add_argument("--write", action="store_true", help="rewrite the derived columns in every CSV")
+    parser.add_argument("--append", nargs="+", metavar="ARG",
+                        help="ACCOUNT DATE EQUITY [CASH_FLOW]: append one day incrementally")
+    args = parser.parse_args()
+
+    if args.append:
+        account, date, equity = args.append[:3]
+        cash_flow = float(args.append[3]) if len(args.append) > 3 else None
+        path = history_path(args.csv_dir, account)
+        try:
+            m = append_day(path, date, float(equity), cash_flow)
+        except ValueError as exc:
+            parser.error(str(exc))
+        print(f"  {account} {date}: Daily P/L {float(m['Daily P/L']):.2f}, "
+              f"Cumulative {float(m['Cumulative %']):.2f}%, Sharpe {float(m['Sharpe Ratio']):.2f}")
+        return
+
+    histories = load_accounts(args.csv_dir)
+    print(f"Found {len(histories)} portfolio histories in {args.csv_dir}.\n")
+    for name, s in summarize(histories).items():
+        print(f"  {name:<16} {s['end']}  equity ${s['equity']:>12,.2f}  cum {s['Cumulative %']:>7.2f}%  "
+              f"ann {s['Annualized %']:>7.2f}%  sharpe {s['Sharpe Ratio']:>5.2f}  "
+              f"vol {s['Volatility %']:>6.2f}%  maxDD {s['Max Drawdown %']:>7.2f}%")
+
+    if args.write:
+        for name, h in histories.items():
+            path = history_path(args.csv_dir, name)
+            columns = history_columns(h["Date"], h["Equity"], h["Cash Flow"])
+            write_history(path, columns)
+            save_state(path, RunningStats.from_history(h["Equity"], h["Cash Flow"]))
+        print(f"\nDone! Rewrote {len(histories)} portfolio histories.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+"""
+Vectorized rebalancer for the FAANG, Crypto and Bitcoin ETF portfolio flows.
+
+The flows size one symbol per message: they split the `tickers` flow variable,
+look up a quote, and order portfolioSize / number / price shares (ask, falling
+back to bid). plan_rebalance() computes the whole order set in one pass over
+arrays instead, from target weights, current positions and a quote snapshot:
+
+  * prices use the same ask -> bid fallback as "create market orders", then
+    the last trade price;
+  * symbols are normalized the way Alpaca reports positions (BTC/USD -> BTCUSD)
+    so crypto holdings match their targets; orders keep the symbol as given;
+  * a cash buffer is held back, and assets whose weight is within the drift
+    threshold of target are left alone (held assets with a zero target are
+    always closed);
+  * quantities round toward zero to the asset's lot size, or to qty_decimals
+    for fractional assets, and orders below min_notional are dropped;
+  * buys are scaled down together if they would spend more than cash plus
+    sale proceeds.
+
+load_flow_strategy() reads tickers / portfolioSize / number from a flow's
+"Store strategy definition" node, so the presets stay defined in the flows.
+
+Usage:
+    python portfolio_rebalancer.py "trading-flows/Create FAANG Portfolio.json" --stub
+    python portfolio_rebalancer.py "trading-flows/Create Crypto Portfolio.json" \\
+        --positions positions.json --quotes quotes.json --cash 2500 --drift 0.02
+"""
+
+import argparse
+import json
+import re
+import time
+
+import numpy as np
+
+DEFAULT_DRIFT = 0.0          # minimum |current - target| weight before an asset is traded
+DEFAULT_BUFFER = 0.0         # fraction of equity kept in cash
+MIN_NOTIONAL = 1.0           # Alpaca rejects orders under $1
+QTY_DECIMALS = 2             # the flows send qty.toFixed(2)
+CRYPTO_QTY_DECIMALS = 9
+
+FLOW_SET_RE = re.compile(r'flow\.set\(\s*"(\w+)"\s*,\s*("[^"]*"|[\d.]+)\s*\)')
+
+
+def normalize_symbol(symbol):
+    """Position key for a symbol: upper case, crypto pairs without the slash (BTC/USD -> BTCUSD)."""
+    return symbol.strip().upper().replace("/", "")
+
+
+def is_crypto(symbol):
+    return "/" in symbol
+
+
+def load_flow_strategy(path):
+    """{"tickers", "portfolio_size", "number", "time_in_force"} from a portfolio flow export."""
+    with open(path, "r", encoding="utf-8") as f:
+        nodes = json.load(f)
+    values, tif = {}, "gtc"
+    for node in nodes:
+        if node.get("type") != "function":
+            continue
+        if node.get("name") == "Store strategy definition":
+            values = {k: json.loads(v) for k, v in FLOW_SET_RE.findall(node.get("func", ""))}
+        elif node.get("name") == "create market orders":
+            match = re.search(r'"time_in_force":\s*"(\w+)"', node.get("func", ""))
+            tif = match.group(1) if match else tif
+    tickers = [t.strip() for t in str(values.get("tickers", "")).split(",") if t.strip()]
+    if not tickers:
+        raise ValueError(f"{path}: no 'Store strategy definition' node with flow.set(\"tickers\", ...)")
+    return {
+        "tickers": tickers,
+        "portfolio_size": float(values.get("portfolioSize", 0)),
+        "number": int(values.get("number", len(tickers))),
+        "time_in_force": tif,
+    }
+
+
+def equal_weights(tickers):
+    """The flows' portfolioSize / number split, normalized so weights sum to 1."""
+    return {t: 1.0 / len(tickers) for t in tickers}
+
+
+def quote_prices(ask, bid, last=None):
+    """Sizing price per asset: ask if positive, else bid, else last trade (NaN when none)."""
+    ask = np.asarray(ask, dtype=float)
+    bid = np.asarray(bid, dtype=float)
+    last = np.full(ask.shape, np.nan) if last is None else np.asarray(last, dtype=float)
+    price = np.where(ask > 0, ask, np.where(bid > 0, bid, last))
+    return np.where(price > 0, price, np.nan)
+
+
+def round_qty(qty, lot, decimals):
+    """Round toward zero: to a multiple of lot where lot > 0, else to decimals places."""
+    qty = np.asarray(qty, dtype=float)
+    scale = 10.0 ** np.asarray(decimals, dtype=float)
+    fractional = np.trunc(np.round(qty * scale, 6)) / scale
+    safe_lot = np.where(lot > 0, lot, 1.0)
+    whole = np.trunc(np.round(qty / safe_lot, 6)) * safe_lot
+    return np.where(lot > 0, whole, fractional)
+
+
+def plan_rebalance(targets, positions, quotes, cash=0.0, equity=None, cash_buffer=DEFAULT_BUFFER,
+                   drift_threshold=DEFAULT_DRIFT, min_notional=MIN_NOTIONAL, lot_sizes=None,
+                   qty_decimals=None):
+    """Order set moving positions to target weights.
+
+    targets:   {symbol: weight} (weights are normalized to sum to 1)
+    positions: {symbol: qty} (BTC/USD and BTCUSD are the same position)
+    quotes:    {symbol: {"ask", "bid", "last"}} (any missing key counts as 0)
+    equity:    portfolio value to allocate; default cash + market value of positions
+    lot_sizes: {symbol: lot} for whole-share assets (0 / missing = fractional)
+    qty_decimals: {symbol: decimals} for fractional assets (default 2, crypto 9)
+
+    Returns a dict of arrays aligned on "symbol" (plus "equity" and "cash_after").
+    """
+    order_symbol = {}
+    for symbol in list(targets) + list(positions):
+        order_symbol.setdefault(normalize_symbol(symbol), symbol)
+    keys = list(order_symbol)
+    n = len(keys)
+    index = {k: i for i, k in enumerate(keys)}
+
+    weights = np.zeros(n)
+    for symbol, w in targets.items():
+        weights[index[normalize_symbol(symbol)]] += float(w)
+    if weights.sum() > 0:
+        weights /= weights.sum()
+    held = np.zeros(n)
+    for symbol, qty in positions.items():
+        held[index[normalize_symbol(symbol)]] += float(qty)
+
+    quote_by_key = {normalize_symbol(s): q for s, q in quotes.items()}
+    table = np.array([[float(quote_by_key.get(k, {}).get(f) or 0.0) for f in ("ask", "bid", "last")] for k in keys])
+    table = table.reshape(n, 3)
+    price = quote_prices(table[:, 0], table[:, 1], table[:, 2])
+
+    # Held crypto comes back from Alpaca as BTCUSD, without the slash
+    crypto = np.array([is_crypto(order_symbol[k]) or (k.endswith("USD") and len(k) > 5) for k in keys], dtype=bool)
+    lot = np.array([float((lot_sizes or {}).get(order_symbol[k], 0.0)) for k in keys])
+    default_decimals = np.where(crypto, CRYPTO_QTY_DECIMALS, QTY_DECIMALS)
+    decimals = np.array([(qty_decimals or {}).get(order_symbol[k], d) for k, d in zip(keys, default_decimals)],
+                        dtype=float)
+
+    priced = ~np.isnan(price)
+    value = np.where(priced, held * np.nan_to_num(price), 0.0)
+    total = float(cash + value.sum()) if equity is None else float(equity)
+    investable = total * (1.0 - cash_buffer)
+
+    target_value = weights * investable
+    current_w = value / total if total > 0 else np.zeros(n)
+    target_w = weights * (1.0 - cash_buffer)
+    drift = current_w - target_w
+    exit_all = (weights == 0) & (held != 0)
+    trade = priced & ((np.abs(drift) >= drift_threshold) | exit_all)
+    if drift_threshold == 0:
+        trade &= ~np.isclose(target_value, value, rtol=0.0, atol=1e-9)
+
+    raw = np.where(trade, (target_value - value) / np.where(priced, price, 1.0), 0.0)
+    qty = np.where(exit_all, -held, round_qty(raw, lot, decimals))
+
+    # Buys may spend at most the cash above the buffer plus what the sells raise
+    sells, buys = qty < 0, qty > 0
+    proceeds = float(-(qty[sells] * np.nan_to_num(price[sells])).sum())
+    budget = max(cash + proceeds - total * cash_buffer, 0.0)
+    spend = float((qty[buys] * price[buys]).sum())
+    if spend > budget:
+        qty = np.where(buys, round_qty(qty * (budget / spend), lot, decimals), qty)
+
+    notional = np.abs(qty) * np.nan_to_num(price)
+    keep = (qty != 0) & ((notional >= min_notional) | exit_all)
+    qty = np.where(keep, qty, 0.0)
+    notional = np.where(keep, notional, 0.0)
+
+    order = np.nonzero(keep)[0]
+    order = order[np.argsort(qty[order] > 0, kind="stable")]      # sells first, so their cash is available
+    return {
+        "symbol": [order_symbol[keys[i]] for i in order],
+        "side": np.where(qty[order] > 0, "buy", "sell"),
+        "qty": np.abs(qty[order]),
+        "price": price[order],
+        "notional": notional[order],
+        "current_weight": current_w[order],
+        "target_weight": target_w[order],
+        "drift": drift[order],
+        "crypto": crypto[order],
+        "decimals": decimals[order].astype(int),
+        "equity": total,
+        "cash_after": float(cash - (qty * np.nan_to_num(price)).sum()),
+        "unpriced": [order_symbol[keys[i]] for i in np.nonzero(~priced & ((weights > 0) | (held != 0)))[0]],
+    }
+
+
+def alpaca_orders(plan, time_in_force="gtc", client_prefix=None):
+    """Order payloads in the shape "create market orders" sends to the alpaca-order node."""
+    stamp = int(time.time() * 1000)
+    orders = []
+    # crypto and decimals come from the plan, which also recognizes held crypto without the slash (BTCUSD)
+    for symbol, side, qty, crypto, decimals in zip(plan["symbol"], plan["side"], plan["qty"],
+                                                   plan["crypto"], plan["decimals"]):
+        orders.append({
+            "symbol": symbol,
+            "qty": f"{qty:.{decimals}f}".rstrip("0").rstrip(".") or "0",
+            "side": str(side),
+            "type": "market",
+            "client_order_id": f"{client_prefix or ''}{normalize_symbol(symbol)}{stamp}",
+            "time_in_force": "gtc" if crypto else time_in_force,
+        })
+    return orders
+
+
+# ── CLI ─────────────────────────────────────────────────────────────────
+
+def positions_from_alpaca(rows):
+    """{symbol: qty} from a GET /v2/positions response."""
+    return {row["symbol"]: float(row["qty"]) for row in rows}
+
+
+def quotes_from_alpaca(doc):
+    """{symbol: {"ask", "bid", "last"}} from a latest-quotes response ({"quotes": {sym: {"ap", "bp"}}})."""
+    quotes = doc.get("quotes", doc)
+    return {s: {"ask": q.get("ap", q.get("ask")), "bid": q.get("bp", q.get("bid")), "last": q.get("last")}
+            for s, q in quotes.items()}
+
+
+def print_plan(plan):
+    print(f"  Equity ${plan['equity']:,.2f}; {len(plan['symbol'])} orders; cash after ${plan['cash_after']:,.2f}")
+    for i, symbol in enumerate(plan["symbol"]):
+        print(f"    {plan['side'][i]:<4} {symbol:<10} {plan['qty'][i]:>14.6g} @ {plan['price'][i]:>12.4f}"
+              f"  ${plan['notional'][i]:>11,.2f}  weight {plan['current_weight'][i]:6.2%} -> {plan['target_weight'][i]:6.2%}")
+    if plan["unpriced"]:
+        print(f"  No quote for: {', '.join(plan['unpriced'])}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compute the rebalancing orders for a portfolio flow.")
+    parser.add_argument("flow", help="portfolio flow export (Create * Portfolio.json)")
+    parser.add_argument("--positions", help="GET /v2/positions response (JSON)")
+    parser.add_argument("--quotes", help="latest quotes response (JSON)")
+    parser.add_argument("--cash", type=float, help="cash available (default: the flow's portfolioSize)")
+    parser.add_argument("--drift", type=float, default=DEFAULT_DRIFT, help="weight drift threshold, e.g. 0.02")
+    parser.add_argument("--buffer", type=float, default=DEFAULT_BUFFER, help="fraction of equity kept in cash")
+    parser.add_argument("--whole-shares", action="store_true", help="round stock orders to whole shares")
+    parser.add_argument("--stub", action="store_true", help="price against a seeded alpaca_stub market and fill there")
+    parser.add_argument("--json", action="store_true", help="print the Alpaca order payloads")
+    args = parser.parse_args()
+
+    strategy = load_flow_strategy(args.flow)
+    tickers = strategy["tickers"]
+    if strategy["number"] != len(tickers):
+        print(f"  Note: flow sets number={strategy['number']} for {len(tickers)} tickers; using equal weights.")
+    targets = equal_weights(tickers)
+    lots = {t: 1.0 for t in tickers if not is_crypto(t)} if args.whole_shares else None
+    cash = strategy["portfolio_size"] if args.cash is None else args.cash
+
+    if args.stub:
+        import alpaca_stub
+        market = alpaca_stub.MarketReplay(seed=0)
+        broker = alpaca_stub.Broker(market, cash=cash)
+        positions = positions_from_alpaca(broker.positions_json())
+        quotes = {t: dict(zip(("last", "bid", "ask"), market.quote(t)[1:])) for t in tickers}
+    else:
+        positions = {}
+        if args.positions:
+            with open(args.positions, "r", encoding="utf-8") as f:
+                positions = positions_from_alpaca(json.load(f))
+        if not args.quotes:
+            parser.error("--quotes is required unless --stub is given")
+        with open(args.quotes, "r", encoding="utf-8") as f:
+            quotes = quotes_from_alpaca(json.load(f))
+
+    started = time.perf_counter()
+    plan = plan_rebalance(targets, positions, quotes, cash=cash, cash_buffer=args.buffer,
+                          drift_threshold=args.drift, lot_sizes=lots)
+    elapsed = time.perf_counter() - started
+    print_plan(plan)
+    orders = alpaca_orders(plan, strategy["time_in_force"])
+    if args.json:
+        print(json.dumps(orders, indent=1))
+
+    if args.stub:
+        for order in orders:
+            status, body = broker.submit(order)
+            if status != 200:
+                print(f"  Rejected {order['symbol']}: {body['message']}")
+        account = broker.account()
+        print(f"  Stub fills: cash ${float(account['cash']):,.2f}, equity ${float(account['equity']):,.2f}, "
+              f"{len(broker.positions)} positions")
+
+    print(f"\nDone! Planned {len(orders)} orders in {elapsed * 1000:.2f} ms.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+"""
+Caching gateway in front of the stock-screener API used by
+top-performing-stocks.html and worst-performing-stocks.html.
+
+Each page used to poll stockscreener.machinetrader.io every 60 seconds from
+every open tab. The gateway polls each upstream list once per interval, keeps
+the latest body in memory and serves it with an ETag (If-None-Match -> 304),
+and pushes every change to connected browsers over server-sent events:
+
+    GET /api/screener/<list>           latest JSON, ETag / 304
+    GET /api/screener/<list>/events    text/event-stream, one "update" per change
+    GET /api/screener/health           per-list fetch status
+
+StubUpstream serves changing fake lists on a local port so the gateway can be
+exercised without the real screener (see --stub).
+
+Usage:
+    python screener_gateway.py --port 8090
+    python screener_gateway.py --port 8090 --stub --interval 5
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+import time
+import urllib.request
+
+from http_util import read_request, response_head, send
+
+UPSTREAM_BASE = "https://stockscreener.machinetrader.io/api"
+LISTS = ("topstocksmt4", "worststocksmt4")
+ROUTE_PREFIX = "/api/screener/"
+
+DEFAULT_INTERVAL = 60        # seconds between upstream fetches, as on the pages
+HEARTBEAT = 15               # seconds between SSE keep-alive comments
+FETCH_TIMEOUT = 20
+
+
+def make_etag(body):
+    return '"' + hashlib.sha256(body).hexdigest()[:20] + '"'
+
+
+def fetch_url(url, timeout=FETCH_TIMEOUT):
+    """Blocking GET returning the raw body; run in a thread by the poller."""
+    req = urllib.request.Request(url, headers={"Accept": "application/json"})
+    with urllib.request.urlopen(req, timeout=timeout) as resp:
+        return resp.read()
+
+
+# ── gateway ─────────────────────────────────────────────────────────────
+
+class ScreenerList:
+    """Latest body of one upstream list plus the SSE subscribers waiting on it."""
+
+    def __init__(self, name, url):
+        self.name = name
+        self.url = url
+        self.body = None
+        self.etag = None
+        self.fetched_at = None
+        self.changed_at = None
+        self.error = None
+        self.fetches = 0
+        self.subscribers = set()    # asyncio.Queue(maxsize=1) per SSE connection
+
+    def update(self, body):
+        """Store a fetched body; returns True and notifies subscribers when it changed."""
+        self.fetches += 1
+        self.fetched_at = time.time()
+        self.error = None
+        etag = make_etag(body)
+        if etag == self.etag:
+            return False
+        self.body, self.etag, self.changed_at = body, etag, self.fetched_at
+        for queue in self.subscribers:
+            # Slow clients only ever get the latest version
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait((etag, body))
+        return True
+
+    def status(self):
+        return {
+            "etag": self.etag,
+            "fetched_at": self.fetched_at,
+            "changed_at": self.changed_at,
+            "fetches": self.fetches,
+            "subscribers": len(self.subscribers),
+            "error": self.error,
+        }
+
+
+class ScreenerGateway:
+    """Polls every upstream list once per interval and serves them over HTTP and SSE."""
+
+    def __init__(self, upstream_base=UPSTREAM_BASE, lists=LISTS, interval=DEFAULT_INTERVAL,
+                 fetch=fetch_url, heartbeat=HEARTBEAT):
+        base = upstream_base.rstrip("/")
+        self.lists = {name: ScreenerList(name, f"{base}/{name}") for name in lists}
+        self.interval = interval
+        self.fetch = fetch
+        self.heartbeat = heartbeat
+        self._tasks = []
+        self._server = None
+
+    async def refresh(self, name):
+        entry = self.lists[name]
+        try:
+            body = await asyncio.to_thread(self.fetch, entry.url)
+            json.loads(body)    # never cache or push a broken payload
+        except Exception as exc:
+            entry.error = f"{type(exc).__name__}: {exc}"
+            return False
+        return entry.update(body)
+
+    async def _poll(self, name):
+        while True:
+            started = time.monotonic()
+            await self.refresh(name)
+            await asyncio.sleep(max(self.interval - (time.monotonic() - started), 0))
+
+    async def start(self, host="127.0.0.1", port=8090):
+        # First fetch before accepting connections so nobody sees an empty cache
+        await asyncio.gather(*(self.refresh(name) for name in self.lists))
+        self._tasks = [asyncio.create_task(self._poll(name)) for name in self.lists]
+        self._server = await asyncio.start_server(self._handle, host, port)
+        return self._server
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                request = await read_request(reader)
+                if request is None:
+                    break
+                method, path, _, headers = request
+                if not await self._route(method, path, headers, reader, writer):
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _route(self, method, path, headers, reader, writer):
+        """Answer one request; returns False when the connection should close."""
+        cors = {"Access-Control-Allow-Origin": "*"}
+        if method not in ("GET", "HEAD"):
+            await send(writer, 405, headers={**cors, "Allow": "GET, HEAD"})
+            return True
+        if not path.startswith(ROUTE_PREFIX):
+            await send(writer, 404, headers=cors)
+            return True
+        parts = path[len(ROUTE_PREFIX):].strip("/").split("/")
+
+        if parts == ["health"]:
+            body = json.dumps({name: entry.status() for name, entry in self.lists.items()}).encode()
+            await send(writer, 200, body, {**cors, "Content-Type": "application/json", "Cache-Control": "no-store"})
+            return True
+
+        entry = self.lists.get(parts[0])
+        if entry is None or len(parts) > 2 or (len(parts) == 2 and parts[1] != "events"):
+            await send(writer, 404, headers=cors)
+            return True
+        if len(parts) == 2:
+            await self._stream(entry, reader, writer)
+            return False
+        if entry.body is None:
+            await send(writer, 503, headers={**cors, "Retry-After": str(self.interval)})
+            return True
+
+        cache = {**cors, "ETag": entry.etag, "Cache-Control": "no-cache"}
+        if headers.get("if-none-match") == entry.etag:
+            await send(writer, 304, headers=cache)
+        else:
+            body = b"" if method == "HEAD" else entry.body
+            await send(writer, 200, body, {**cache, "Content-Type": "application/json"})
+        return True
+
+    async def _stream(self, entry, reader, writer):
+        """Server-sent events: the current list at once, then one event per change."""
+        writer.write(response_head(200, {
+            "Content-Type": "text/event-stream",
+            "Cache-Control": "no-cache",
+            "Connection": "keep-alive",
+            "X-Accel-Buffering": "no",
+            "Access-Control-Allow-Origin": "*",
+        }))
+        queue = asyncio.Queue(maxsize=1)
+        if entry.body is not None:
+            queue.put_nowait((entry.etag, entry.body))
+        entry.subscribers.add(queue)
+        try:
+            writer.write(f"retry: {self.interval * 1000}\n\n".encode())
+            # Clients never send after the request, so EOF on the reader means they left
+            while not reader.at_eof() and not writer.is_closing():
+                try:
+                    etag, body = await asyncio.wait_for(queue.get(), self.heartbeat)
+                except asyncio.TimeoutError:
+                    writer.write(b": keep-alive\n\n")
+                else:
+                    # Bodies are compact JSON, so one data line is enough
+                    payload = body.decode("utf-8").replace("\n", "")
+                    writer.write(f"event: update\nid: {etag}\ndata: {payload}\n\n".encode("utf-8"))
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            entry.subscribers.discard(queue)
+
+
+# ── stub upstream ───────────────────────────────────────────────────────
+
+def fake_stocks(rng, n=20, direction=1):
+    """A list shaped like the screener response the pages render."""
+    stocks = []
+    for i in range(n):
+        close = round(rng.uniform(1, 300), 4)
+        change = round(direction * rng.uniform(5, 80), 2)
+        stocks.append({
+            "symbol": "".join(rng.choice("ABCDEFGHIJKLMNOPQRSTUVWXYZ") for _ in range(rng.randint(2, 4))),
+            "open": round(close / (1 + change / 100), 4),
+            "high": round(close * 1.03, 4),
+            "low": round(close * 0.97, 4),
+            "close": close,
+            "change_pct": change,
+            "volume": rng.randint(10_000, 50_000_000),
+            "vwap": round(close * rng.uniform(0.98, 1.02), 4),
+        })
+    stocks.sort(key=lambda s: -abs(s["change_pct"]))
+    return stocks
+
+
+class StubUpstream:
+    """Local stand-in for the screener API; bodies change every change_every requests."""
+
+    def __init__(self, lists=LISTS, change_every=3, seed=0):
+        self.rng = random.Random(seed)
+        self.change_every = change_every
+        self.hits = {name: 0 for name in lists}
+        self.bodies = {name: self._body(name) for name in lists}
+
+    def _body(self, name):
+        direction = -1 if name.startswith("worst") else 1
+        return json.dumps(fake_stocks(self.rng, direction=direction), separators=(",", ":")).encode()
+
+    async def _handle(self, reader, writer):
+        try:
+            request = await read_request(reader)
+            if request is None:
+                return
+            name = request[1].rstrip("/").rsplit("/", 1)[-1]
+            if name not in self.bodies:
+                await send(writer, 404, keep_alive=False)
+                return
+            self.hits[name] += 1
+            if self.change_every and self.hits[name] % self.change_every == 0:
+                self.bodies[name] = self._body(name)
+            await send(writer, 200, self.bodies[name], {"Content-Type": "application/json"}, keep_alive=False)
+        finally:
+            writer.close()
+
+    async def start(self, host="127.0.0.1", port=0):
+        server = await asyncio.start_server(self._handle, host, port)
+        self.port = server.sockets[0].getsockname()[1]
+        self.base_url = f"http://{host}:{self.port}/api"
+        return server
+
+
+async def serve(args):
+    upstream = args.upstream
+    if args.stub:
+        stub = StubUpstream()
+        await stub.start()
+        upstream = stub.base_url
+        print(f"Stub upstream on {upstream}")
+    gateway = ScreenerGateway(upstream, interval=args.interval)
+    server = await gateway.start(args.host, args.port)
+    print(f"Gateway on http://{args.host}:{args.port}{ROUTE_PREFIX}{{{','.join(LISTS)}}} "
+          f"(polling {upstream} every {args.interval}s)")
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Caching SSE gateway for the stock-screener lists.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--upstream", default=UPSTREAM_BASE, help="base URL of the screener API")
+    parser.add_argument("--interval", type=int, default=DEFAULT_INTERVAL, help="seconds between upstream fetches")
+    parser.add_argument("--stub", action="store_true", help="serve from a local stub upstream instead")
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
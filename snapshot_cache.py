@@ -0,0 +1,433 @@
+#!/usr/bin/env python3
+"""
+Shared quote and position snapshot cache in front of the Alpaca APIs.
+
+Within one minute the Bear Call Spread flow alone fires several injects on the
+same */1 9-15 schedule, and each one runs its own alpaca-position-query,
+alpaca-data-last-quote or alpaca-data-last-trade call; the portfolio flows on
+the same instance ask for overlapping symbols again. Pointing the flows'
+paper-api and data-api base URLs at this service lets them share snapshots:
+
+  * GET /v2/account and /v2/positions are cached per credentials (a hash of
+    the key id and secret); requests without both headers are never served
+    from the cache;
+    /v2/positions/{symbol} is answered from the cached positions list, so one
+    upstream call serves every per-symbol position query;
+  * latest quotes and trades (stocks and crypto, single-symbol or ?symbols=)
+    are cached per symbol, and the symbols missing from a request are fetched
+    together in one batched upstream call;
+  * every key has a TTL by route (ROUTE_TTLS), and concurrent misses for the
+    same key wait on the one upstream call already in flight (single flight);
+  * any other request, and every non-GET, is passed straight through; orders
+    and position closes also drop that account's cached snapshots.
+
+GET /_cache/metrics reports hits, misses, coalesced waits, upstream calls and
+upstream latency per route. StubFetcher runs the cache against an in-process
+alpaca_stub broker (see --stub).
+
+Usage:
+    python snapshot_cache.py --port 8093
+    python snapshot_cache.py --port 8093 --trading-url http://127.0.0.1:8092 --data-url http://127.0.0.1:8092
+    python snapshot_cache.py --stub --flows 12 --minutes 5
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import deque
+
+from http_util import read_request, send
+
+TRADING_URL = "https://paper-api.alpaca.markets"
+DATA_URL = "https://data.alpaca.markets"
+METRICS_PATH = "/_cache/metrics"
+
+# Seconds a snapshot is served before it is fetched again
+ROUTE_TTLS = {
+    "account": 5.0,
+    "positions": 5.0,
+    "stock_quotes": 1.0,
+    "stock_trades": 1.0,
+    "crypto_quotes": 1.0,
+    "crypto_trades": 1.0,
+}
+MAX_ENTRIES = 50000          # expired snapshots are pruned past this many keys
+LATENCY_SAMPLES = 1000       # most recent upstream timings kept per route
+FETCH_TIMEOUT = 20
+FORWARD_HEADERS = ("apca-api-key-id", "apca-api-secret-key", "content-type")
+
+
+class UpstreamError(Exception):
+    """A non-200 upstream answer, passed on to every request waiting on it."""
+
+    def __init__(self, status, payload):
+        super().__init__(f"upstream status {status}")
+        self.status = status
+        self.payload = payload
+
+
+def fetch_json(method, url, headers, body=None, timeout=FETCH_TIMEOUT):
+    """Blocking request returning (status, parsed JSON body); run in a thread by the cache."""
+    req = urllib.request.Request(url, data=body or None, method=method, headers=headers)
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
+            status, data = resp.status, resp.read()
+    except urllib.error.HTTPError as exc:
+        status, data = exc.code, exc.read()
+    try:
+        return status, json.loads(data) if data else None
+    except ValueError:
+        return status, {"message": data.decode("utf-8", "replace")}
+
+
+# ── cache ───────────────────────────────────────────────────────────────
+
+class SnapshotCache:
+    """TTL snapshots per key with single-flight loading and per-route counters."""
+
+    COUNTERS = ("requests", "hits", "misses", "coalesced", "upstream", "errors")
+
+    def __init__(self, ttls=None, clock=time.monotonic):
+        self.ttls = {**ROUTE_TTLS, **(ttls or {})}
+        self.clock = clock
+        self._entries = {}      # key -> (expires_at, value)
+        self._inflight = {}     # key -> asyncio.Future
+        self.counters = {}
+        self.latency = {}       # route -> recent upstream seconds per call
+
+    def _count(self, route):
+        if route not in self.counters:
+            self.counters[route] = dict.fromkeys(self.COUNTERS, 0)
+        return self.counters[route]
+
+    async def get_many(self, route, keys, load):
+        """{key: value} for every key; load(missing_keys) -> {key: value} runs once for all misses."""
+        counts = self._count(route)
+        counts["requests"] += 1
+        now = self.clock()
+        results, waits, missing = {}, {}, []
+        for key in keys:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                counts["hits"] += 1
+                results[key] = entry[1]
+            elif key in self._inflight:
+                counts["coalesced"] += 1
+                waits[key] = self._inflight[key]
+            else:
+                counts["misses"] += 1
+                missing.append(key)
+
+        if missing:
+            loop = asyncio.get_running_loop()
+            futures = {key: loop.create_future() for key in missing}
+            self._inflight.update(futures)
+            counts["upstream"] += 1
+            started = time.perf_counter()
+            try:
+                loaded = await load(missing)
+            except Exception as exc:
+                counts["errors"] += 1
+                for future in futures.values():
+                    future.set_exception(exc)
+                    future.exception()     # waiters still see it; silences "never retrieved"
+                raise
+            finally:
+                for key in missing:
+                    self._inflight.pop(key, None)
+                self.latency.setdefault(route, deque(maxlen=LATENCY_SAMPLES)).append(time.perf_counter() - started)
+            expires = self.clock() + self.ttls.get(route, 0.0)
+            for key in missing:
+                value = loaded.get(key)
+                if value is not None:
+                    self._entries[key] = (expires, value)
+                futures[key].set_result(value)
+                results[key] = value
+            if len(self._entries) > MAX_ENTRIES:
+                self.prune()
+
+        for key, future in waits.items():
+            results[key] = await future
+        return results
+
+    async def get(self, route, key, load):
+        """One key; load() -> value."""
+        async def load_one(_):
+            return {key: await load()}
+        return (await self.get_many(route, [key], load_one))[key]
+
+    def invalidate(self, match):
+        """Drop every cached key for which match(key) is true."""
+        for key in [k for k in self._entries if match(k)]:
+            del self._entries[key]
+
+    def prune(self):
+        now = self.clock()
+        self.invalidate(lambda k: self._entries[k][0] <= now)
+
+    def report(self):
+        out = {}
+        for route, counts in sorted(self.counters.items()):
+            served = counts["hits"] + counts["coalesced"] + counts["misses"]
+            samples = sorted(self.latency.get(route, ()))
+
+            def pct(p):
+                return samples[min(int(p * len(samples)), len(samples) - 1)] * 1000 if samples else None
+
+            out[route] = {**counts, "hit_ratio": (counts["hits"] + counts["coalesced"]) / served if served else 0.0,
+                          "upstream_p50_ms": pct(0.5), "upstream_p99_ms": pct(0.99)}
+        return {"entries": len(self._entries), "inflight": len(self._inflight), "routes": out}
+
+
+# ── Alpaca routes ───────────────────────────────────────────────────────
+
+def credentials_key(headers):
+    """Cache slot for a request's Alpaca credentials, or None when the key id or secret is missing.
+
+    Keyed on the secret too, so a request with a known key id but a wrong or
+    missing secret never sees another client's account snapshots.
+    """
+    key_id, secret = headers.get("apca-api-key-id"), headers.get("apca-api-secret-key")
+    if not key_id or not secret:
+        return None
+    return hashlib.sha256(f"{key_id}\0{secret}".encode("utf-8")).hexdigest()
+
+
+def position_key(symbol):
+    return symbol.replace("/", "").upper()
+
+
+class SnapshotService:
+    """Routes Alpaca REST requests through a SnapshotCache, or straight upstream when not cacheable."""
+
+    def __init__(self, cache, fetch=fetch_json, trading_url=TRADING_URL, data_url=DATA_URL):
+        self.cache = cache
+        self.fetch = fetch
+        self.trading_url = trading_url.rstrip("/")
+        self.data_url = data_url.rstrip("/")
+
+    async def _upstream(self, method, base, path, params, headers, body=None):
+        query = urllib.parse.urlencode(params, safe="/,", doseq=True)
+        url = f"{base}{path}" + (f"?{query}" if query else "")
+        forward = {k: v for k, v in headers.items() if k in FORWARD_HEADERS}
+        return await asyncio.to_thread(self.fetch, method, url, forward, body)
+
+    async def _snapshot(self, base, path, headers, params=None):
+        status, payload = await self._upstream("GET", base, path, params or {}, headers)
+        if status != 200:
+            raise UpstreamError(status, payload)
+        return payload
+
+    async def _latest(self, route, base, path, field, symbols, headers):
+        """Per-symbol latest quote/trade objects, missing symbols fetched in one batched call."""
+        async def load(keys):
+            payload = await self._snapshot(base, path, headers, {"symbols": ",".join(k[1] for k in keys)})
+            found = (payload or {}).get(field) or {}
+            return {key: found.get(key[1]) for key in keys}
+        values = await self.cache.get_many(route, [(route, s) for s in symbols], load)
+        return {key[1]: value for key, value in values.items() if value is not None}
+
+    async def request(self, method, path, params, headers, body=b""):
+        """(status, JSON-able payload) for one Alpaca REST request."""
+        parts = [p for p in path.split("/") if p]
+        account = credentials_key(headers)
+        if method == "GET" and path == METRICS_PATH:
+            return 200, self.cache.report()
+        try:
+            if method == "GET" and account is not None:
+                if parts == ["v2", "account"]:
+                    return 200, await self.cache.get("account", ("account", account), lambda: self._snapshot(
+                        self.trading_url, path, headers))
+                if parts[:2] == ["v2", "positions"] and len(parts) >= 2:
+                    positions = await self.cache.get("positions", ("positions", account), lambda: self._snapshot(
+                        self.trading_url, "/v2/positions", headers))
+                    if len(parts) == 2:
+                        return 200, positions
+                    wanted = position_key("/".join(parts[2:]))
+                    match = next((p for p in positions if position_key(p["symbol"]) == wanted), None)
+                    if match is None:
+                        return 404, {"code": 40410000, "message": "position does not exist"}
+                    return 200, match
+                if parts[:2] == ["v2", "stocks"] and parts[-1:] == ["latest"]:
+                    if len(parts) == 4 and parts[2] in ("quotes", "trades"):
+                        kind, symbols = parts[2], [s for s in params.get("symbols", [""])[0].split(",") if s]
+                        found = await self._latest(f"stock_{kind}", self.data_url, f"/v2/stocks/{kind}/latest",
+                                                   kind, symbols, headers)
+                        return 200, {kind: found}
+                    if len(parts) == 5 and parts[3] in ("quotes", "trades"):
+                        kind, symbol = parts[3], parts[2]
+                        found = await self._latest(f"stock_{kind}", self.data_url, f"/v2/stocks/{kind}/latest",
+                                                   kind, [symbol], headers)
+                        if symbol not in found:
+                            return 404, {"message": f"no {kind[:-1]} found for {symbol}"}
+                        return 200, {"symbol": symbol, kind[:-1]: found[symbol]}
+                if parts[:4] == ["v1beta3", "crypto", "us", "latest"] and len(parts) == 5 and parts[4] in ("quotes", "trades"):
+                    kind, symbols = parts[4], [s for s in params.get("symbols", [""])[0].split(",") if s]
+                    found = await self._latest(f"crypto_{kind}", self.data_url, path, kind, symbols, headers)
+                    return 200, {kind: found}
+        except UpstreamError as exc:
+            return exc.status, exc.payload
+
+        # Not cacheable: pass through, and forget this account's snapshots once it trades
+        base = self.data_url if parts[:2] == ["v2", "stocks"] or parts[:1] == ["v1beta3"] else self.trading_url
+        counts = self.cache._count("passthrough")
+        counts["requests"] += 1
+        counts["upstream"] += 1
+        status, payload = await self._upstream(method, base, path, params, headers, body)
+        if method != "GET" and account is not None and parts[:2] in (["v2", "orders"], ["v2", "positions"]):
+            self.cache.invalidate(lambda k: k[0] in ("account", "positions") and k[1] == account)
+        return status, payload
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                request = await read_request(reader)
+                if request is None:
+                    break
+                method, path, params, headers = request
+                length = int(headers.get("content-length") or 0)
+                body = await reader.readexactly(length) if length else b""
+                try:
+                    status, payload = await self.request(method, path, params, headers, body)
+                except OSError as exc:
+                    status, payload = 502, {"message": f"upstream unreachable: {exc}"}
+                data = b"" if status == 204 else json.dumps(payload).encode("utf-8")
+                await send(writer, status, data, {"Content-Type": "application/json"})
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+
+# ── stub upstream ───────────────────────────────────────────────────────
+
+class StubFetcher:
+    """fetch_json() stand-in answering from an in-process alpaca_stub.AlpacaStub after a fixed round trip."""
+
+    def __init__(self, stub, round_trip=0.05):
+        self.stub = stub
+        self.round_trip = round_trip
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, method, url, headers, body=None):
+        time.sleep(self.round_trip)
+        parts = urllib.parse.urlsplit(url)
+        with self._lock:
+            self.calls += 1
+            _, status, payload = self.stub.dispatch(method, parts.path, urllib.parse.parse_qs(parts.query), body)
+        return status, payload
+
+
+class ManualClock:
+    def __init__(self, now=0.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def flow_burst(service, flow, symbols, minute):
+    """The calls one flow's per-minute injects make: positions, per-symbol positions, quotes and trades."""
+    headers = {"apca-api-key-id": "PKSTUB", "apca-api-secret-key": "stub-secret"}
+    a, b = symbols[(flow + minute) % len(symbols)], symbols[(flow + minute + 1) % len(symbols)]
+    return [
+        service.request("GET", "/v2/positions", {}, headers),
+        service.request("GET", f"/v2/positions/{a}", {}, headers),
+        service.request("GET", f"/v2/stocks/{a}/quotes/latest", {}, headers),
+        service.request("GET", f"/v2/stocks/{b}/trades/latest", {}, headers),
+        service.request("GET", "/v2/stocks/quotes/latest", {"symbols": [f"{a},{b}"]}, headers),
+        service.request("GET", "/v1beta3/crypto/us/latest/trades", {"symbols": ["BTC/USD"]}, headers),
+    ]
+
+
+async def run_stub(args):
+    import alpaca_stub
+    market = alpaca_stub.MarketReplay(seed=0)
+    broker = alpaca_stub.Broker(market)
+    symbols = ["SPY", "QQQ", "AAPL", "AMZN", "META", "NFLX"]
+    for symbol in symbols[:3]:
+        broker.submit({"symbol": symbol, "qty": 10, "side": "buy", "type": "market"})
+    fetcher = StubFetcher(alpaca_stub.AlpacaStub(market, broker, require_auth=False), args.round_trip)
+    clock = ManualClock()
+    service = SnapshotService(SnapshotCache(ttls=args.ttl, clock=clock), fetcher)
+
+    calls = 0
+    started = time.perf_counter()
+    for minute in range(args.minutes):
+        bursts = [c for flow in range(args.flows) for c in flow_burst(service, flow, symbols, minute)]
+        calls += len(bursts)
+        results = await asyncio.gather(*bursts)
+        bad = [status for status, _ in results if status not in (200, 404)]
+        if bad:
+            print(f"  Minute {minute}: {len(bad)} failed requests ({sorted(set(bad))})")
+        clock.now += 60.0
+    elapsed = time.perf_counter() - started
+
+    print(f"  {calls} requests from {args.flows} flows over {args.minutes} minutes -> "
+          f"{fetcher.calls} upstream calls ({elapsed:.2f}s at {args.round_trip * 1000:.0f} ms per call)\n")
+    print_cache_report(service.cache.report())
+    print(f"\nDone! {calls / max(fetcher.calls, 1):.1f} requests served per upstream call.")
+
+
+def print_cache_report(report):
+    print(f"  {'route':<16} {'requests':>9} {'hits':>7} {'coalesced':>10} {'misses':>7} {'upstream':>9} "
+          f"{'errors':>7} {'hit %':>7} {'p50 ms':>8}")
+    for route, m in report["routes"].items():
+        p50 = m["upstream_p50_ms"]
+        print(f"  {route:<16} {m['requests']:>9} {m['hits']:>7} {m['coalesced']:>10} {m['misses']:>7} "
+              f"{m['upstream']:>9} {m['errors']:>7} {m['hit_ratio'] * 100:>6.1f}% "
+              f"{'' if p50 is None else f'{p50:.1f}':>8}")
+
+
+async def serve(args):
+    service = SnapshotService(SnapshotCache(ttls=args.ttl), trading_url=args.trading_url, data_url=args.data_url)
+    server = await asyncio.start_server(service.handle, args.host, args.port)
+    print(f"Snapshot cache on http://{args.host}:{args.port} (trading {args.trading_url}, data {args.data_url}); "
+          f"metrics at {METRICS_PATH}")
+    try:
+        async with server:
+            while True:
+                await asyncio.sleep(args.report_every)
+                if service.cache.counters:
+                    print_cache_report(service.cache.report())
+    finally:
+        print_cache_report(service.cache.report())
+
+
+def parse_ttl(value):
+    route, _, seconds = value.partition("=")
+    if route not in ROUTE_TTLS or not seconds:
+        raise argparse.ArgumentTypeError(f"expected ROUTE=SECONDS with ROUTE one of {', '.join(ROUTE_TTLS)}")
+    return route, float(seconds)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Shared Alpaca quote and position snapshot cache.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8093)
+    parser.add_argument("--trading-url", default=TRADING_URL, help="upstream for /v2/account, positions, orders")
+    parser.add_argument("--data-url", default=DATA_URL, help="upstream for latest quotes and trades")
+    parser.add_argument("--ttl", type=parse_ttl, action="append", default=[], metavar="ROUTE=SECONDS",
+                        help="override a route's TTL, e.g. positions=10 (repeatable)")
+    parser.add_argument("--report-every", type=float, default=60.0, help="seconds between metrics printouts")
+    parser.add_argument("--stub", action="store_true", help="simulate per-minute flow bursts against alpaca_stub")
+    parser.add_argument("--flows", type=int, default=8, help="flows firing together each minute (--stub)")
+    parser.add_argument("--minutes", type=int, default=3, help="minutes to simulate (--stub)")
+    parser.add_argument("--round-trip", type=float, default=0.05, help="simulated upstream seconds (--stub)")
+    args = parser.parse_args()
+    args.ttl = dict(args.ttl)
+    try:
+        asyncio.run(run_stub(args) if args.stub else serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
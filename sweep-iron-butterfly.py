@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+Parallel parameter sweep for the iron butterfly settings documented on
+strategies/iron-butterfly.html (ib.json wing width, entry time, profit target,
+stop loss and scheduled exit).
+
+Chain snapshots and the underlying path are loaded once in the parent and handed
+to each worker process a single time; per-snapshot price grids are memoized per
+wing width inside each worker. Every finished configuration is appended to a
+JSONL stream as it completes and a ranked CSV is refreshed alongside it, so an
+interrupted overnight run can be resumed where it stopped.
+
+Usage:
+    python sweep-iron-butterfly.py underlying.csv chains/ --out sweep.jsonl
+    python sweep-iron-butterfly.py underlying.csv chains/ --random 2000 --workers 8
+"""
+
+import argparse
+import bisect
+import itertools
+import json
+import os
+import random
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import options_backtester as ob
+
+WORKSPACE = os.path.dirname(os.path.abspath(__file__))
+
+# ── search space (defaults from ib.json / monitoring_flow.json) ─────────
+PARAM_GRID = {
+    "wing_width": [5.0, 10.0, 15.0, 20.0],
+    "entry_weekday": [0, 1],
+    "entry_time": ["09:35", "10:00", "10:30", "11:30"],
+    "profit_target": [None, 0.25, 0.5, 0.75, 0.9],
+    "stop_loss": [None, 0.5, 0.8, 1.0],
+    "exit_weekday": [3, 4],
+    "exit_time": ["14:40", "15:30"],
+}
+
+RANK_KEYS = ("total_pnl", "return_on_capital", "win_rate", "avg_pnl")
+
+# Per-worker state, filled once by _init_worker
+_DATA = {}
+
+
+def grid_configs():
+    """Every combination of PARAM_GRID."""
+    keys = list(PARAM_GRID)
+    for values in itertools.product(*(PARAM_GRID[k] for k in keys)):
+        yield dict(zip(keys, values))
+
+
+def random_configs(n, seed=0):
+    """n distinct random draws from PARAM_GRID."""
+    rng = random.Random(seed)
+    total = 1
+    for values in PARAM_GRID.values():
+        total *= len(values)
+    seen = set()
+    while len(seen) < min(n, total):
+        config = {k: rng.choice(v) for k, v in PARAM_GRID.items()}
+        key = config_key(config)
+        if key not in seen:
+            seen.add(key)
+            yield config
+
+
+def config_key(config):
+    return json.dumps(config, sort_keys=True)
+
+
+def _init_worker(snapshots, stamps, prices):
+    _DATA["snapshots"] = snapshots
+    _DATA["stamps"] = stamps
+    _DATA["prices"] = prices
+    _DATA["grid_caches"] = {}    # wing width -> shared per-snapshot grids
+    _DATA["entries"] = {}        # (weekday, time) -> snapshot indexes
+
+
+def evaluate(config):
+    """Run one iron butterfly configuration against the worker's shared data."""
+    snapshots, stamps, prices = _DATA["snapshots"], _DATA["stamps"], _DATA["prices"]
+    legs = ob.STRATEGY_LEGS["iron-butterfly"]
+    wing = config["wing_width"]
+    cache = _DATA["grid_caches"].setdefault(wing, {})
+
+    entry_rule = {"weekday": config["entry_weekday"], "time": config["entry_time"]}
+    entry_key = (config["entry_weekday"], config["entry_time"])
+    if entry_key not in _DATA["entries"]:
+        _DATA["entries"][entry_key] = ob.find_entries(snapshots, entry_rule)
+
+    exit_rule = {"exit_weekday": config["exit_weekday"], "exit_time": config["exit_time"]}
+    if config["profit_target"] is not None:
+        exit_rule["profit_target"] = config["profit_target"]
+    if config["stop_loss"] is not None:
+        exit_rule["stop_loss"] = config["stop_loss"]
+
+    trades = []
+    for start in _DATA["entries"][entry_key]:
+        trade = ob.simulate_trade(snapshots, stamps, prices, start, legs, wing, entry_rule, exit_rule, cache)
+        if trade:
+            trades.append(trade)
+    return config, ob.summarize(trades)
+
+
+def evaluate_batch(configs):
+    return [evaluate(c) for c in configs]
+
+
+def load_done(path):
+    """Configurations already present in a previous run's JSONL stream.
+
+    A run killed mid-write leaves a partial last line; it is cut off the file
+    so resumed records append after the last complete one.
+    """
+    done = []
+    if not os.path.exists(path):
+        return done
+    with open(path, "rb+") as f:
+        data = f.read()
+        complete = data[:data.rfind(b"\n") + 1]
+        if len(complete) < len(data):
+            f.truncate(len(complete))
+    for line in complete.decode("utf-8").splitlines():
+        line = line.strip()
+        if line:
+            done.append(json.loads(line))
+    return done
+
+
+def write_ranked(path, ranked):
+    """Rewrite the ranked CSV from the (score, key, record) list, best first."""
+    fields = list(PARAM_GRID) + ["trades", "wins", "win_rate", "total_pnl", "avg_pnl",
+                                 "max_drawdown", "return_on_capital"]
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write("rank," + ",".join(fields) + "\n")
+        for i, (_, _, record) in enumerate(reversed(ranked), 1):
+            row = {**record["config"], **record["stats"]}
+            values = ["" if row[k] is None else (f"{row[k]:.2f}" if isinstance(row[k], float) else str(row[k]))
+                      for k in fields]
+            f.write(f"{i}," + ",".join(values) + "\n")
+    os.replace(tmp, path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parallel parameter sweep for the iron butterfly strategy.")
+    parser.add_argument("underlying", help="underlying price CSV (timestamp,price)")
+    parser.add_argument("chains", help="directory of option-chain snapshot JSON files")
+    parser.add_argument("--out", default="sweep_iron_butterfly.jsonl", help="JSONL stream of finished configs")
+    parser.add_argument("--ranked", help="ranked CSV (default: <out>.ranked.csv)")
+    parser.add_argument("--rank-by", choices=RANK_KEYS, default="total_pnl")
+    parser.add_argument("--random", type=int, help="random search with this many configs instead of the full grid")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--batch", type=int, default=16, help="configs per task")
+    args = parser.parse_args()
+    ranked_path = args.ranked or os.path.splitext(args.out)[0] + ".ranked.csv"
+
+    stamps, prices = ob.load_underlying(args.underlying)
+    snapshots = ob.load_chain_snapshots(args.chains)
+    print(f"Loaded {len(prices)} underlying prices and {len(snapshots)} chain snapshots.")
+
+    configs = list(random_configs(args.random, args.seed) if args.random else grid_configs())
+    ranked = []
+    done_keys = set()
+    for record in load_done(args.out):
+        key = config_key(record["config"])
+        done_keys.add(key)
+        bisect.insort(ranked, (record["stats"][args.rank_by], key, record))
+    todo = [c for c in configs if config_key(c) not in done_keys]
+    print(f"{len(configs)} configurations, {len(configs) - len(todo)} already done, {len(todo)} to run.\n")
+
+    batches = [todo[i:i + args.batch] for i in range(0, len(todo), args.batch)]
+    t0 = time.perf_counter()
+    finished = 0
+    with open(args.out, "a", encoding="utf-8") as stream, ProcessPoolExecutor(
+        max_workers=args.workers, initializer=_init_worker, initargs=(snapshots, stamps, prices)
+    ) as pool:
+        pending = {pool.submit(evaluate_batch, b) for b in batches}
+        while pending:
+            complete, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in complete:
+                for config, stats in future.result():
+                    record = {"config": config, "stats": stats}
+                    stream.write(json.dumps(record) + "\n")
+                    bisect.insort(ranked, (stats[args.rank_by], config_key(config), record))
+                    finished += 1
+            stream.flush()
+            write_ranked(ranked_path, ranked)
+            rate = finished / max(time.perf_counter() - t0, 1e-9)
+            print(f"  {finished}/{len(todo)} done ({rate:.1f}/s), best {args.rank_by} = {ranked[-1][0]:.2f}")
+
+    write_ranked(ranked_path, ranked)
+    if ranked:
+        best = ranked[-1][2]
+        print(f"\nBest by {args.rank_by}: {json.dumps(best['config'])}")
+    print(f"\nDone! Results streamed to {args.out}, ranking in {ranked_path}")
+
+
+if __name__ == "__main__":
+    main()